@@ -51,6 +51,11 @@ def follow_path(path, delay=0.1):
         time.sleep(delay)
 
 # ---------------- Main Loop ----------------
-while True:
+def step():
+    """One pass over the path, then the pause before the next one."""
     follow_path(path, delay=0.1)
     time.sleep(5)
+
+if __name__ == "__main__":
+    while True:
+        step()
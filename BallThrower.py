@@ -36,27 +36,36 @@ def run_motor(pwm_val, duration=1.0):
     motorB.duty(0)
     print("Motor stopped.\n")
 
+# ---------------- Throw ----------------
+def throw(target_distance):
+    """Predict the PWM for a target distance (inches) and run the motor at it."""
+    pwm_needed = predict_pwm_interp(target_distance)
+    print("Predicted PWM ≈", pwm_needed)
+    run_motor(pwm_needed)
+    return pwm_needed
+
 # ---------------- Interactive Loop ----------------
-print("Linear Interpolation PWM Predictor — type target distance in inches ('q' to quit)")
-
-try:
-    while True:
-        user_input = input("Enter target distance: ")
-        if user_input.lower() == 'q':
-            break
-        try:
-            target_distance = float(user_input)
-        except ValueError:
-            print("Invalid input. Enter a number.")
-            continue
-
-        pwm_needed = predict_pwm_interp(target_distance)
-        print("Predicted PWM ≈", pwm_needed)
-
-        run = input("Run motor at predicted PWM? (y/n): ")
-        if run.lower() == 'y':
-            run_motor(pwm_needed)
-
-except KeyboardInterrupt:
-    motorB.duty(0)
-    print("Stopped by user.")
+if __name__ == "__main__":
+    print("Linear Interpolation PWM Predictor — type target distance in inches ('q' to quit)")
+
+    try:
+        while True:
+            user_input = input("Enter target distance: ")
+            if user_input.lower() == 'q':
+                break
+            try:
+                target_distance = float(user_input)
+            except ValueError:
+                print("Invalid input. Enter a number.")
+                continue
+
+            pwm_needed = predict_pwm_interp(target_distance)
+            print("Predicted PWM ≈", pwm_needed)
+
+            run = input("Run motor at predicted PWM? (y/n): ")
+            if run.lower() == 'y':
+                run_motor(pwm_needed)
+
+    except KeyboardInterrupt:
+        motorB.duty(0)
+        print("Stopped by user.")
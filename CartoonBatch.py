@@ -0,0 +1,174 @@
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from Cartoonify import cartoonify
+from CartoonTiles import cartoonify_tiled
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+MANIFEST = ".cartoonify.json"  # {output name: parameters key} for every output written here
+
+
+# ---------------- Input discovery ----------------
+def glob_root(pattern):
+    """The leading directories of a glob that contain no wildcard ("photos/**/*.png" -> "photos")."""
+    parts = []
+    for part in pattern.replace("\\", "/").split("/"):
+        if any(ch in part for ch in "*?["):
+            break
+        parts.append(part)
+    return "/".join(parts) or "."
+
+
+def collect_inputs(patterns):
+    """
+    Expand files, directories (recursively) and globs into [(input_path, relative_output_name)].
+
+    Directory and glob inputs keep their sub-folder layout (below the glob's
+    wildcard-free root) under the output directory. Two inputs that would
+    write the same output name raise ValueError.
+    """
+    found = []
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, files in os.walk(pattern):
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTS):
+                        path = os.path.join(root, name)
+                        found.append((path, os.path.relpath(path, pattern)))
+        else:
+            is_glob = any(ch in pattern for ch in "*?[")
+            matches = sorted(glob.glob(pattern, recursive=True)) if is_glob else [pattern]
+            for path in matches:
+                if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTS):
+                    rel = os.path.relpath(path, glob_root(pattern)) if is_glob else os.path.basename(path)
+                    found.append((path, rel))
+
+    unique = []
+    outputs = {}
+    for path, rel in found:
+        key = os.path.abspath(path)
+        if key in seen:
+            continue
+        seen.add(key)
+        other = outputs.setdefault(os.path.normcase(rel), path)
+        if other != path:
+            raise ValueError("%s and %s would both be written to %s" % (other, path, rel))
+        unique.append((path, rel))
+    return unique
+
+
+def params_key(params):
+    return json.dumps(params, sort_keys=True)
+
+
+def is_up_to_date(src, dst, made_with, key):
+    """Output exists, is newer than its input and was made with the same parameters."""
+    return (made_with == key and os.path.exists(dst)
+            and os.path.getmtime(dst) >= os.path.getmtime(src))
+
+
+# ---------------- Worker ----------------
+def _init_worker():
+    # One process per core already; stop OpenCV from spawning its own threads on top
+    cv2.setNumThreads(1)
+
+
+def process_image(src, dst, params, tile_rows=None):
+    """Cartoonify one file (in strips when tile_rows is set). Returns (src, pixels, error or None)."""
+    try:
+        return _process_image(src, dst, params, tile_rows)
+    except Exception as e:  # cv2.error from bad parameters, corrupt files, full disks...
+        lines = str(e).strip().splitlines()  # cv2.error puts the useful part on the last line
+        return src, 0, "%s: %s" % (type(e).__name__, lines[-1] if lines else "")
+
+
+def _process_image(src, dst, params, tile_rows):
+    if tile_rows:
+        os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+        width, height, _ = cartoonify_tiled(src, dst, params, tile_rows)
+        return src, width * height, None
+
+    img = cv2.imread(src)
+    if img is None:
+        return src, 0, "could not read image"
+    cartoon = cartoonify(img, **params)
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+    # Write to a temp name first so an interrupted run never leaves a half file that looks up to date
+    root, ext = os.path.splitext(dst)
+    tmp = root + ".partial" + ext
+    if not cv2.imwrite(tmp, cartoon):
+        return src, 0, "could not write " + dst
+    os.replace(tmp, dst)
+    return src, img.shape[0] * img.shape[1], None
+
+
+# ---------------- Batch engine ----------------
+def run_batch(patterns, out_dir, params, workers=None, force=False, tile_rows=None):
+    """Cartoonify every input into out_dir using a process pool; returns a stats dict."""
+    inputs = collect_inputs(patterns)
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Outputs made with other parameters are stale even if they are newer than the input
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    key = params_key(params)
+
+    jobs = []
+    skipped = 0
+    for src, rel in inputs:
+        dst = os.path.join(out_dir, rel)
+        if not force and is_up_to_date(src, dst, manifest.get(rel), key):
+            skipped += 1
+            continue
+        jobs.append((src, dst, rel))
+
+    workers = workers or os.cpu_count() or 1
+    print("Batch: %d inputs, %d up to date, %d to process on %d workers"
+          % (len(inputs), skipped, len(jobs), workers))
+
+    done = failed = pixels = 0
+    start = time.perf_counter()
+    try:
+        if jobs:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                futures = {pool.submit(process_image, src, dst, params, tile_rows): rel for src, dst, rel in jobs}
+                for future in as_completed(futures):
+                    src, px, error = future.result()
+                    if error:
+                        failed += 1
+                        print("Failed:", src, "-", error)
+                    else:
+                        done += 1
+                        pixels += px
+                        manifest[futures[future]] = key
+                    if (done + failed) % 100 == 0:
+                        elapsed = time.perf_counter() - start
+                        print("  %d/%d  %.1f images/s" % (done + failed, len(jobs), (done + failed) / elapsed))
+    finally:
+        # Keep what finished even if the pool broke or the run was interrupted
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=0)
+
+    elapsed = time.perf_counter() - start
+
+    stats = {
+        "inputs": len(inputs),
+        "skipped": skipped,
+        "processed": done,
+        "failed": failed,
+        "elapsed_s": elapsed,
+        "images_per_s": done / elapsed if elapsed else 0.0,
+        "megapixels_per_s": pixels / 1e6 / elapsed if elapsed else 0.0,
+    }
+    print("Done: %d processed, %d failed, %d skipped in %.2f s  (%.1f images/s, %.1f MP/s)"
+          % (done, failed, skipped, elapsed, stats["images_per_s"], stats["megapixels_per_s"]))
+    return stats
@@ -0,0 +1,187 @@
+import argparse
+import hashlib
+import itertools
+import os
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from Cartoonify import DEFAULT_PARAMS, cartoonify
+
+
+def content_hash(img):
+    """Digest of the pixels and shape, so equal images share cache entries whatever their origin."""
+    h = hashlib.sha1(str(img.shape).encode())
+    h.update(np.ascontiguousarray(img).data)
+    return h.hexdigest()
+
+
+# ---------------- LRU store with a memory budget ----------------
+class StageCache:
+    """
+    LRU of numpy arrays keyed by tuples, limited to budget_bytes.
+
+    With spill_dir set, evicted entries are saved as .npy files and loaded
+    back (and re-promoted) on the next hit instead of being recomputed.
+    """
+
+    def __init__(self, budget_bytes=256 * 1024 * 1024, spill_dir=None):
+        self.budget = budget_bytes
+        self.spill_dir = spill_dir
+        self.entries = OrderedDict()
+        self.used = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def _spill_path(self, key):
+        name = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.spill_dir, name + ".npy")
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+        if self.spill_dir:
+            path = self._spill_path(key)
+            if os.path.exists(path):
+                value = np.load(path)
+                self.disk_hits += 1
+                self.put(key, value)
+                return value
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        if key in self.entries:
+            self.used -= self.entries.pop(key).nbytes
+        if value.nbytes > self.budget:
+            self._spill(key, value)  # never fits in memory; keep it on disk only
+            return
+        self.entries[key] = value
+        self.used += value.nbytes
+        while self.used > self.budget:
+            old_key, old_value = self.entries.popitem(last=False)
+            self.used -= old_value.nbytes
+            self.evictions += 1
+            self._spill(old_key, old_value)
+
+    def _spill(self, key, value):
+        if self.spill_dir:
+            path = self._spill_path(key)
+            if not os.path.exists(path):
+                np.save(path, value)
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "used_mb": self.used / 1e6,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# ---------------- Memoized stage graph ----------------
+# Each stage lists the parameters it depends on; its key is
+# (stage, image hash, those parameter values), so changing an edge
+# parameter never invalidates the bilateral result and vice versa.
+#
+#   image -> gray -> median -> edges --+
+#   image -> bilateral ----------------+-> cartoon
+STAGE_PARAMS = {
+    "gray": (),
+    "median": ("median_ksize",),
+    "edges": ("median_ksize", "block_size", "c"),
+    "bilateral": ("d", "sigma_color", "sigma_space"),
+}
+
+
+class CachedCartoonifier:
+    """cartoonify() with every intermediate stage memoized in a StageCache."""
+
+    def __init__(self, cache=None):
+        self.cache = cache or StageCache()
+        self.computed = dict.fromkeys(STAGE_PARAMS, 0)
+
+    def _stage(self, name, image_hash, params, compute):
+        key = (name, image_hash) + tuple(params[p] for p in STAGE_PARAMS[name])
+        value = self.cache.get(key)
+        if value is None:
+            value = compute()
+            self.computed[name] += 1
+            self.cache.put(key, value)
+        return value
+
+    def cartoonify(self, img, **params):
+        p = dict(DEFAULT_PARAMS, **params)
+        # Hashed every call: a reused capture buffer or an in-place edit is the same object
+        # with new pixels (a SHA-1 pass costs far less than any of the filters)
+        image_hash = content_hash(img)
+
+        gray = self._stage("gray", image_hash, p, lambda: cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+        median = self._stage("median", image_hash, p, lambda: cv2.medianBlur(gray, p["median_ksize"]))
+        edges = self._stage("edges", image_hash, p, lambda: cv2.adaptiveThreshold(
+            median, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY,
+            blockSize=p["block_size"], C=p["c"]))
+        color = self._stage("bilateral", image_hash, p, lambda: cv2.bilateralFilter(
+            img, d=p["d"], sigmaColor=p["sigma_color"], sigmaSpace=p["sigma_space"]))
+        return cv2.bitwise_and(color, color, mask=edges)
+
+
+# ---------------- Sweep benchmark ----------------
+def sweep_grid(spec):
+    """'block_size=7,9,11 c=5,9' -> list of parameter dicts (cartesian product)."""
+    names, values = [], []
+    for part in spec.split():
+        name, vals = part.split("=")
+        cast = type(DEFAULT_PARAMS[name])
+        names.append(name)
+        values.append([cast(v) for v in vals.split(",")])
+    return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parameter sweep with and without the stage cache")
+    parser.add_argument("image")
+    parser.add_argument("--sweep", default="block_size=5,7,9,11,15 c=3,5,9,13",
+                        help="space separated name=v1,v2,... lists")
+    parser.add_argument("--base", default="d=9", help="fixed parameters, same syntax (single values)")
+    parser.add_argument("--budget-mb", type=float, default=256)
+    parser.add_argument("--spill", help="directory for evicted entries")
+    args = parser.parse_args()
+
+    img = cv2.imread(args.image)
+    if img is None:
+        print("Could not read", args.image)
+        return
+    base = sweep_grid(args.base)[0] if args.base else {}
+    grid = [dict(base, **g) for g in sweep_grid(args.sweep)]
+    print("Sweeping %d parameter sets on %dx%d" % (len(grid), img.shape[1], img.shape[0]))
+
+    t0 = time.perf_counter()
+    plain = [cartoonify(img, **dict(DEFAULT_PARAMS, **g)) for g in grid]
+    t_plain = time.perf_counter() - t0
+
+    cached = CachedCartoonifier(StageCache(int(args.budget_mb * 1e6), args.spill))
+    t0 = time.perf_counter()
+    results = [cached.cartoonify(img, **g) for g in grid]
+    t_cached = time.perf_counter() - t0
+
+    same = all(np.array_equal(a, b) for a, b in zip(plain, results))
+    print("uncached %.2f s | cached %.2f s (%.1fx) | identical: %s"
+          % (t_plain, t_cached, t_plain / t_cached if t_cached else 0.0, same))
+    print("stages computed:", cached.computed)
+    print("cache:", cached.cache.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import os
+import struct
+import zlib
+
+import cv2
+import numpy as np
+
+from Cartoonify import DEFAULT_PARAMS, cartoonify
+
+
+# ---------------- Halo size ----------------
+def halo_rows(params):
+    """
+    Rows of context a strip needs above and below so its output matches the whole-image result.
+
+    bilateralFilter looks d//2 pixels away (or 1.5 * sigmaSpace when d <= 0);
+    the edge path is a median blur followed by a blockSize box mean.
+    """
+    d = params["d"]
+    bilateral = max(d // 2, 1) if d > 0 else int(round(params["sigma_space"] * 1.5))
+    edges = params["median_ksize"] // 2 + params["block_size"] // 2
+    return max(bilateral, edges)
+
+
+# ---------------- Strip readers ----------------
+class ArrayReader:
+    """Fallback for compressed formats: OpenCV has to decode the whole image at once."""
+
+    bounded = False
+
+    def __init__(self, path):
+        self.img = cv2.imread(path)
+        if self.img is None:
+            raise IOError("could not read " + path)
+        self.height, self.width = self.img.shape[:2]
+
+    def read_rows(self, y0, y1):
+        return self.img[y0:y1]
+
+
+class PnmReader:
+    """Binary PPM (P6) / PGM (P5), 8-bit; rows are read on demand with seek + read."""
+
+    bounded = True
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            head = f.read(512)
+        fields = []
+        pos = 0
+        while len(fields) < 4:
+            while pos < len(head) and head[pos:pos + 1].isspace():
+                pos += 1
+            if head[pos:pos + 1] == b"#":
+                pos = head.find(b"\n", pos) + 1 or len(head)
+                continue
+            end = pos
+            while end < len(head) and not head[end:end + 1].isspace():
+                end += 1
+            # Every field, maxval included, ends in whitespace inside the first 512 bytes
+            if end >= len(head):
+                raise ValueError("truncated or oversized PNM header")
+            fields.append(head[pos:end])
+            pos = end
+        magic, width, height, maxval = fields[0], int(fields[1]), int(fields[2]), int(fields[3])
+        if magic not in (b"P5", b"P6") or maxval != 255:
+            raise ValueError("only 8-bit binary P5/P6 files can be streamed")
+        self.width, self.height = width, height
+        self.channels = 3 if magic == b"P6" else 1
+        # Exactly one whitespace byte separates maxval from the pixel data
+        self.offset = pos + 1
+        self.row_bytes = width * self.channels
+        self.path = path
+
+    def read_rows(self, y0, y1):
+        # Plain reads rather than np.memmap: touched memmap pages stay resident and
+        # would grow the process to the size of the file
+        with open(self.path, "rb") as f:
+            f.seek(self.offset + y0 * self.row_bytes)
+            rows = np.fromfile(f, np.uint8, (y1 - y0) * self.row_bytes)
+        rows = rows.reshape(y1 - y0, self.width, self.channels)
+        if self.channels == 1:
+            return cv2.cvtColor(rows, cv2.COLOR_GRAY2BGR)
+        return cv2.cvtColor(rows, cv2.COLOR_RGB2BGR)
+
+
+class BmpReader:
+    """Uncompressed 24-bit BMP read on demand (rows are stored bottom-up unless height < 0)."""
+
+    bounded = True
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            header = f.read(54)
+        if header[:2] != b"BM":
+            raise ValueError("not a BMP file")
+        offset = struct.unpack_from("<I", header, 10)[0]
+        width, height = struct.unpack_from("<ii", header, 18)
+        bpp, compression = struct.unpack_from("<HI", header, 28)
+        if bpp != 24 or compression != 0:
+            raise ValueError("only uncompressed 24-bit BMP files can be streamed")
+        self.top_down = height < 0
+        self.width, self.height = width, abs(height)
+        self.stride = (width * 3 + 3) // 4 * 4
+        self.offset = offset
+        self.path = path
+
+    def read_rows(self, y0, y1):
+        first = y0 if self.top_down else self.height - y1
+        with open(self.path, "rb") as f:
+            f.seek(self.offset + first * self.stride)
+            rows = np.fromfile(f, np.uint8, (y1 - y0) * self.stride).reshape(y1 - y0, self.stride)
+        if not self.top_down:
+            rows = rows[::-1]
+        return np.ascontiguousarray(rows[:, :self.width * 3]).reshape(y1 - y0, self.width, 3)
+
+
+def open_reader(path):
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        if ext in (".ppm", ".pgm", ".pnm"):
+            return PnmReader(path)
+        if ext == ".bmp":
+            return BmpReader(path)
+    except ValueError as e:
+        print("Cannot stream %s (%s); loading it whole" % (path, e))
+    return ArrayReader(path)
+
+
+# ---------------- Incremental writers ----------------
+class PnmWriter:
+    def __init__(self, path, width, height):
+        self.f = open(path, "wb")
+        self.f.write(b"P6\n%d %d\n255\n" % (width, height))
+
+    def write_rows(self, rows):
+        self.f.write(np.ascontiguousarray(rows[:, :, ::-1]).tobytes())
+
+    def close(self):
+        self.f.close()
+
+
+class PngWriter:
+    """8-bit RGB PNG written strip by strip through one zlib stream."""
+
+    def __init__(self, path, width, height, level=1):
+        self.f = open(path, "wb")
+        self.f.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        self.z = zlib.compressobj(level)
+
+    def _chunk(self, kind, data):
+        self.f.write(struct.pack(">I", len(data)))
+        self.f.write(kind)
+        self.f.write(data)
+        self.f.write(struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+    def write_rows(self, rows):
+        h, w = rows.shape[:2]
+        raw = np.zeros((h, 1 + w * 3), np.uint8)  # leading 0 = filter type "None"
+        raw[:, 1:] = rows[:, :, ::-1].reshape(h, w * 3)
+        data = self.z.compress(raw.tobytes())
+        if data:
+            self._chunk(b"IDAT", data)
+
+    def close(self):
+        self._chunk(b"IDAT", self.z.flush())
+        self._chunk(b"IEND", b"")
+        self.f.close()
+
+
+class ArrayWriter:
+    """Fallback for other formats: collect rows and let cv2.imwrite encode at the end."""
+
+    def __init__(self, path, width, height):
+        self.path = path
+        self.img = np.empty((height, width, 3), np.uint8)
+        self.y = 0
+
+    def write_rows(self, rows):
+        self.img[self.y:self.y + len(rows)] = rows
+        self.y += len(rows)
+
+    def close(self):
+        if not cv2.imwrite(self.path, self.img):
+            raise IOError("could not write " + self.path)
+
+
+def open_writer(path, width, height):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".ppm", ".pnm"):
+        return PnmWriter(path, width, height)
+    if ext == ".png":
+        return PngWriter(path, width, height)
+    print("Note: %s output is encoded in one piece; use .png or .ppm for bounded memory" % ext)
+    return ArrayWriter(path, width, height)
+
+
+# ---------------- Tiled cartoonify ----------------
+def cartoonify_tiled(src, dst, params=None, tile_rows=256):
+    """
+    Cartoonify src into dst one horizontal strip at a time.
+
+    Each strip is read with halo_rows() extra rows above and below, filtered,
+    and only its core rows are written, so the result is identical to
+    cartoonify() on the whole image while memory is bounded by the strip size
+    (for streamable inputs/outputs: PPM/PGM/BMP in, PNG/PPM out).
+    Returns (width, height, strips).
+    """
+    params = dict(DEFAULT_PARAMS, **(params or {}))
+    halo = halo_rows(params)
+    reader = open_reader(src)
+    width, height = reader.width, reader.height
+
+    root, ext = os.path.splitext(dst)
+    tmp = root + ".partial" + ext
+    writer = open_writer(tmp, width, height)
+    strips = 0
+    try:
+        for y0 in range(0, height, tile_rows):
+            y1 = min(height, y0 + tile_rows)
+            top, bottom = max(0, y0 - halo), min(height, y1 + halo)
+            strip = reader.read_rows(top, bottom)
+            out = cartoonify(strip, **params)
+            writer.write_rows(out[y0 - top:y1 - top])
+            strips += 1
+    finally:
+        writer.close()
+    os.replace(tmp, dst)
+    return width, height, strips
@@ -0,0 +1,292 @@
+import queue
+import threading
+import time
+
+import cv2
+
+from Cartoonify import DEFAULT_PARAMS, edge_mask, fast_bilateral
+from FramePipeline import LatestQueue, StageStats
+
+
+# ---------------- Stage queues ----------------
+class BlockingQueue:
+    """
+    FIFO with the LatestQueue interface that blocks the producer instead of
+    dropping (for files). abort() unblocks both ends for good: puts are
+    discarded and gets return None, so a stage whose neighbour died can exit.
+    """
+
+    POLL_S = 0.1
+
+    def __init__(self, maxsize=2):
+        self.q = queue.Queue(maxsize)
+        self.dropped = 0
+        self.aborted = False
+
+    def put(self, item):
+        while not self.aborted:
+            try:
+                self.q.put(item, timeout=self.POLL_S)
+                return
+            except queue.Full:
+                pass
+
+    def get(self, timeout=None):
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while not self.aborted:
+            wait = self.POLL_S if deadline is None else min(self.POLL_S, deadline - time.perf_counter())
+            if wait <= 0:
+                return None
+            try:
+                return self.q.get(timeout=wait)
+            except queue.Empty:
+                pass
+        return None
+
+    def close(self):
+        self.put(None)
+
+    def abort(self):
+        self.aborted = True
+        while True:
+            try:
+                self.q.get_nowait()
+            except queue.Empty:
+                break
+
+
+def open_source(source):
+    """A digit string is a camera index; anything else is a video file or stream URL."""
+    live = str(source).isdigit()
+    cap = cv2.VideoCapture(int(source) if live else source)
+    if not cap.isOpened():
+        raise IOError("Could not open %s" % source)
+    return cap, live
+
+
+# ---------------- capture -> bilateral | edges -> combine + encode ----------------
+class CartoonVideo:
+    """
+    Cartoonify a video stream with the three stages on their own threads.
+
+    The bilateral thread hands each frame to the edge thread before filtering
+    it, so both halves of a frame run at the same time; the combine thread
+    pairs them up in order, applies the mask and writes the encoded frame.
+    Camera input uses drop-oldest queues so the output stays live; file input
+    blocks instead so every frame is written.
+
+    If any stage raises (e.g. the output file cannot be opened), every queue
+    is aborted so the other stages exit, and join() / run() re-raise the error.
+    """
+
+    def __init__(self, source, out_path=None, params=None, bilateral_scale=1.0,
+                 fourcc="mp4v", queue_size=2, on_frame=None):
+        self.params = dict(DEFAULT_PARAMS, **(params or {}))
+        self.bilateral_scale = bilateral_scale
+        self.cap, self.live = open_source(source)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.out_path = out_path
+        self.fourcc = fourcc
+        self.writer = None
+        self.on_frame = on_frame  # optional hook (e.g. preview) called with each finished frame
+
+        self.frame_q = LatestQueue(queue_size) if self.live else BlockingQueue(queue_size)
+        self.edge_in_q = BlockingQueue(queue_size)
+        self.color_q = BlockingQueue(queue_size)
+        self.edge_q = BlockingQueue(queue_size)
+        self.stats = StageStats()
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.error = None
+
+        self.frames_read = 0
+        self.frames_written = 0
+        self.start_time = None
+        self.end_time = None
+
+    # ---------- Stage threads ----------
+    def _fail(self, exc):
+        """A stage died: keep the first error, stop capture and unblock every other stage."""
+        if self.error is None:
+            self.error = exc
+        self.stop_event.set()
+        for q in (self.frame_q, self.edge_in_q, self.color_q, self.edge_q):
+            if isinstance(q, BlockingQueue):
+                q.abort()
+            else:
+                q.close()
+
+    def _capture_loop(self):
+        seq = 0
+        try:
+            while not self.stop_event.is_set():
+                t0 = time.perf_counter()
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+                t_capture = time.perf_counter()
+                self.stats.record("capture", t_capture - t0)
+                self.frame_q.put((seq, t_capture, frame))
+                self.frames_read += 1
+                seq += 1
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self.cap.release()
+            self.frame_q.close()
+
+    def _bilateral_loop(self):
+        p = self.params
+        try:
+            while True:
+                item = self.frame_q.get()
+                if item is None:
+                    break
+                self.edge_in_q.put(item)
+                seq, t_capture, frame = item
+                t0 = time.perf_counter()
+                color = fast_bilateral(frame, p["d"], p["sigma_color"], p["sigma_space"], self.bilateral_scale)
+                self.stats.record("bilateral", time.perf_counter() - t0)
+                self.color_q.put((seq, color))
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self.edge_in_q.close()
+            self.color_q.close()
+
+    def _edge_loop(self):
+        p = self.params
+        try:
+            while True:
+                item = self.edge_in_q.get()
+                if item is None:
+                    break
+                seq, t_capture, frame = item
+                t0 = time.perf_counter()
+                edges = edge_mask(frame, p["median_ksize"], p["block_size"], p["c"])
+                self.stats.record("edges", time.perf_counter() - t0)
+                self.edge_q.put((seq, t_capture, edges))
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self.edge_q.close()
+
+    def _combine_loop(self):
+        try:
+            while True:
+                color_item = self.color_q.get()
+                edge_item = self.edge_q.get()
+                if color_item is None or edge_item is None:
+                    break
+                seq, color = color_item
+                edge_seq, t_capture, edges = edge_item
+                if seq != edge_seq:
+                    raise RuntimeError("bilateral and edge stages out of step (%d vs %d)" % (seq, edge_seq))
+                t0 = time.perf_counter()
+                cartoon = cv2.bitwise_and(color, color, mask=edges)
+                if self.out_path:
+                    if self.writer is None:
+                        h, w = cartoon.shape[:2]
+                        self.writer = cv2.VideoWriter(self.out_path, cv2.VideoWriter_fourcc(*self.fourcc),
+                                                      self.fps, (w, h))
+                        if not self.writer.isOpened():
+                            raise IOError("could not open %s for writing" % self.out_path)
+                    self.writer.write(cartoon)
+                t_done = time.perf_counter()
+                self.stats.record("combine_encode", t_done - t0)
+                self.stats.record("end_to_end", t_done - t_capture)
+                self.frames_written += 1
+                if self.on_frame is not None:
+                    self.on_frame(seq, cartoon)
+        except Exception as e:
+            self._fail(e)
+        finally:
+            # Upstream stages exit on their own at end of stream; after an error they were aborted above
+            if self.writer is not None:
+                self.writer.release()
+
+    # ---------- Lifecycle ----------
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.threads = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self._bilateral_loop, name="bilateral", daemon=True),
+            threading.Thread(target=self._edge_loop, name="edges", daemon=True),
+            threading.Thread(target=self._combine_loop, name="combine", daemon=True),
+        ]
+        for t in self.threads:
+            t.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def running(self):
+        return any(t.is_alive() for t in self.threads)
+
+    def join(self):
+        """Wait for every stage; re-raises the first error a stage hit."""
+        for t in self.threads:
+            t.join()
+        self.end_time = time.perf_counter()
+        if self.error is not None:
+            raise self.error
+
+    def run(self):
+        self.start()
+        try:
+            self.join()
+        except KeyboardInterrupt:
+            self.stop()
+            self.join()
+        return self.report()
+
+    # ---------- Reporting ----------
+    def report(self):
+        end = self.end_time or time.perf_counter()
+        elapsed = end - self.start_time if self.start_time else 0.0
+        return {
+            "elapsed_s": elapsed,
+            "frames_read": self.frames_read,
+            "frames_written": self.frames_written,
+            "frames_dropped": self.frame_q.dropped,
+            "fps": self.frames_written / elapsed if elapsed else 0.0,
+            "stages": self.stats.summary(),
+        }
+
+
+def print_report(report):
+    print("\n---------------- Video report ----------------")
+    print("Elapsed: %.2f s | read %d | written %d (%.1f fps) | dropped %d"
+          % (report["elapsed_s"], report["frames_read"], report["frames_written"],
+             report["fps"], report["frames_dropped"]))
+    print("%-16s %7s %9s %9s %9s %9s" % ("stage", "count", "p50 ms", "p95 ms", "p99 ms", "max ms"))
+    for stage, s in report["stages"].items():
+        print("%-16s %7d %9.2f %9.2f %9.2f %9.2f"
+              % (stage, s["count"], s["p50_ms"], s["p95_ms"], s["p99_ms"], s["max_ms"]))
+
+
+def run_video(source, out_path=None, params=None, bilateral_scale=1.0, show=False):
+    """Run CartoonVideo, optionally previewing on the main thread (HighGUI is not thread-safe)."""
+    preview = LatestQueue(1) if show else None
+    video = CartoonVideo(source, out_path, params, bilateral_scale,
+                         on_frame=(lambda seq, frame: preview.put(frame)) if show else None)
+    if not show:
+        report = video.run()
+    else:
+        video.start()
+        try:
+            while video.running():
+                frame = preview.get(timeout=0.1)
+                if frame is not None:
+                    cv2.imshow("Cartoon", frame)
+                if cv2.waitKey(1) & 0xFF == ord("q"):
+                    video.stop()
+        except KeyboardInterrupt:
+            video.stop()
+        try:
+            video.join()
+        finally:
+            cv2.destroyAllWindows()
+        report = video.report()
+    print_report(report)
+    return report
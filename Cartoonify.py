@@ -1,28 +1,144 @@
+import argparse
+
 import cv2
 import numpy as np
 
-# Load image
-img = cv2.imread(r'C:\Users\steve\Desktop\Screenshot 2025-11-09 154424.png')
-
-# --- Step 1: Cartoon effect (same as before) ---
-color = cv2.bilateralFilter(img,
-    d=3, # Diameter of neighborhood in pixels: smaller = more detail
-    sigmaColor=100, # Color Variation: smaller = preserved color detail
-    sigmaSpace=100 # Pixel distance influence: smaller = local smoothing
-)
-gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-gray = cv2.medianBlur(gray, 1) # Kernel size: Larger = stronger blur
-edges = cv2.adaptiveThreshold(
-    gray, 255,
-    cv2.ADAPTIVE_THRESH_MEAN_C,
-    cv2.THRESH_BINARY,
-    blockSize=9, # Size to calculate threshold: smaller = more small edges
-    C=9 # Constant subtracted from mean: Higher = more black
-)
-cartoon = cv2.bitwise_and(color, color, mask=edges)
-
-# Show results
-cv2.imshow("Original", img)
-cv2.imshow("Cartoon", cartoon)
-cv2.waitKey(0)
-cv2.destroyAllWindows()
+# Default effect parameters (see cartoonify for what each one does)
+DEFAULT_PARAMS = {
+    "d": 3,
+    "sigma_color": 100,
+    "sigma_space": 100,
+    "median_ksize": 1,
+    "block_size": 9,
+    "c": 9,
+}
+
+
+def cartoonify(img, d=3, sigma_color=100, sigma_space=100, median_ksize=1, block_size=9, c=9):
+    """Return the cartoon version of a BGR image."""
+    # --- Step 1: Cartoon effect (same as before) ---
+    color = cv2.bilateralFilter(img,
+        d=d, # Diameter of neighborhood in pixels: smaller = more detail
+        sigmaColor=sigma_color, # Color Variation: smaller = preserved color detail
+        sigmaSpace=sigma_space # Pixel distance influence: smaller = local smoothing
+    )
+    edges = edge_mask(img, median_ksize, block_size, c)
+    cartoon = cv2.bitwise_and(color, color, mask=edges)
+    return cartoon
+
+
+def edge_mask(img, median_ksize=1, block_size=9, c=9):
+    """255 where the image is flat, 0 on the dark cartoon outlines."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    gray = cv2.medianBlur(gray, median_ksize) # Kernel size: Larger = stronger blur
+    return cv2.adaptiveThreshold(
+        gray, 255,
+        cv2.ADAPTIVE_THRESH_MEAN_C,
+        cv2.THRESH_BINARY,
+        blockSize=block_size, # Size to calculate threshold: smaller = more small edges
+        C=c # Constant subtracted from mean: Higher = more black
+    )
+
+
+def fast_bilateral(img, d=3, sigma_color=100, sigma_space=100, scale=0.5, edge_thresh=20):
+    """
+    Approximate bilateralFilter: filter a downscaled copy, scale it back up,
+    and keep the full-resolution pixels where the upscale smeared an edge.
+
+    The neighborhood (d, sigma_space) shrinks with the image so the smoothing
+    covers the same area. A bilinear upscale blurs across boundaries, which
+    the bilateral filter is meant to keep; wherever the upscaled result is
+    more than edge_thresh gray levels off the original frame, the original
+    pixel is used instead (a bilateral filter leaves edge pixels close to
+    their input anyway). scale >= 1 runs the exact full-resolution filter.
+    """
+    if scale >= 1:
+        return cv2.bilateralFilter(img, d=d, sigmaColor=sigma_color, sigmaSpace=sigma_space)
+    h, w = img.shape[:2]
+    small = cv2.resize(img, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    small_d = max(1, int(round(d * scale))) if d > 0 else d
+    small = cv2.bilateralFilter(small, d=small_d, sigmaColor=sigma_color, sigmaSpace=sigma_space * scale)
+    color = cv2.resize(small, (w, h), interpolation=cv2.INTER_LINEAR)
+    diff = cv2.cvtColor(cv2.absdiff(color, img), cv2.COLOR_BGR2GRAY)
+    _, smeared = cv2.threshold(diff, edge_thresh, 255, cv2.THRESH_BINARY)
+    cv2.copyTo(img, smeared, color)
+    return color
+
+
+def add_param_args(parser):
+    """Expose the effect parameters as command line options."""
+    group = parser.add_argument_group("effect parameters")
+    group.add_argument("--d", type=int, default=DEFAULT_PARAMS["d"], help="bilateral neighborhood diameter")
+    group.add_argument("--sigma-color", type=float, default=DEFAULT_PARAMS["sigma_color"])
+    group.add_argument("--sigma-space", type=float, default=DEFAULT_PARAMS["sigma_space"])
+    group.add_argument("--median-ksize", type=int, default=DEFAULT_PARAMS["median_ksize"],
+                       help="median blur kernel (odd)")
+    group.add_argument("--block-size", type=int, default=DEFAULT_PARAMS["block_size"],
+                       help="adaptive threshold block size (odd, >= 3)")
+    group.add_argument("--c", type=float, default=DEFAULT_PARAMS["c"], help="adaptive threshold constant")
+
+
+def params_from_args(args):
+    return {name: getattr(args, name) for name in DEFAULT_PARAMS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cartoon effect for one image or a whole batch")
+    parser.add_argument("inputs", nargs="*",
+                        default=[r'C:\Users\steve\Desktop\Screenshot 2025-11-09 154424.png'],
+                        help="image file, directory or glob (several allowed)")
+    parser.add_argument("--out", help="output directory; enables batch mode (no windows)")
+    parser.add_argument("--workers", type=int, help="batch worker processes (default: one per core)")
+    parser.add_argument("--force", action="store_true", help="batch: redo outputs that are up to date")
+    parser.add_argument("--save", help="single image: write the result here instead of showing it")
+    parser.add_argument("--tiled", action="store_true",
+                        help="process in strips with bounded memory (needs --save or --out)")
+    parser.add_argument("--tile-rows", type=int, default=256, help="rows per strip in --tiled mode")
+    parser.add_argument("--video", action="store_true",
+                        help="treat the input as a video file or camera index; --save writes the output video")
+    parser.add_argument("--fast-bilateral", type=float, default=1.0, metavar="SCALE",
+                        help="video: run the bilateral filter at this fraction of full resolution (e.g. 0.5; "
+                             "default 1.0 = exact full-resolution filter)")
+    parser.add_argument("--show", action="store_true", help="video: preview while processing")
+    add_param_args(parser)
+    args = parser.parse_args()
+    params = params_from_args(args)
+
+    if args.out:
+        from CartoonBatch import run_batch
+        run_batch(args.inputs, args.out, params, workers=args.workers, force=args.force,
+                  tile_rows=args.tile_rows if args.tiled else None)
+        return
+
+    if args.video:
+        from CartoonVideo import run_video
+        run_video(args.inputs[0], args.save, params, args.fast_bilateral, show=args.show or not args.save)
+        return
+
+    if args.tiled:
+        if not args.save:
+            parser.error("--tiled writes its result incrementally; give --save PATH")
+        from CartoonTiles import cartoonify_tiled
+        width, height, strips = cartoonify_tiled(args.inputs[0], args.save, params, args.tile_rows)
+        print("Wrote %s (%dx%d) in %d strips" % (args.save, width, height, strips))
+        return
+
+    # Load image
+    img = cv2.imread(args.inputs[0])
+    if img is None:
+        print("Could not read", args.inputs[0])
+        return
+    cartoon = cartoonify(img, **params)
+    if args.save:
+        cv2.imwrite(args.save, cartoon)
+        return
+
+    # Show results
+    cv2.imshow("Original", img)
+    cv2.imshow("Cartoon", cartoon)
+    cv2.waitKey(0)
+    cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,100 +1,344 @@
+import argparse
+import threading
+
 import cv2
 import numpy as np
-import paho.mqtt.client as mqtt
-import json
-import secrets_CS  # Make sure you have your secrets_CS file with MQTT credentials
+
+from FramePipeline import FramePipeline, LatestQueue, print_report
+from MaskLUT import HsvMaskLUT
+from me35codec import Encoder
 
 # MQTT Setup
-MQTT_BROKER = secrets_CS.mqtt_url
 MQTT_PORT = 8883
-MQTT_USERNAME = secrets_CS.mqtt_username
-MQTT_PASSWORD = secrets_CS.mqtt_password
 CLIENT_ID = "opencv_tracker"
 TOPIC_PUB = "/ME35/1"  # Same topic as your ESP32, or change as needed
 
-# MQTT Connection
-client = mqtt.Client(client_id=CLIENT_ID)
-client.username_pw_set(MQTT_USERNAME, MQTT_PASSWORD)
-client.tls_set()  # Enable SSL/TLS
+# Define green color range in HSV
+LOWER_GREEN = np.array([40, 100, 50])
+UPPER_GREEN = np.array([85, 255, 255])
+MIN_AREA = 100
+
+
+def mqtt_connect():
+    """Connect to the broker in secrets_CS and start paho's network thread."""
+    import paho.mqtt.client as mqtt
+    import secrets_CS  # Make sure you have your secrets_CS file with MQTT credentials
 
-try:
-    client.connect(MQTT_BROKER, MQTT_PORT, 60)
+    client = mqtt.Client(client_id=CLIENT_ID)
+    client.username_pw_set(secrets_CS.mqtt_username, secrets_CS.mqtt_password)
+    client.tls_set()  # Enable SSL/TLS
+    client.connect(secrets_CS.mqtt_url, MQTT_PORT, 60)
     client.loop_start()  # Start background thread for MQTT
-    print("MQTT Connected!")
-except Exception as e:
-    print(f"MQTT Connection failed: {e}")
-    exit()
-
-# Open camera
-cam = cv2.VideoCapture(0)
-if not cam.isOpened():
-    print("Error: Could not open camera")
-    exit()
-
-while True:
-    ret, frame = cam.read()
-    if not ret:
-        print("Error: Failed to capture frame")
-        break
-    
-    # Convert frame to HSV color space
-    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-    
-    # Define green color range in HSV
-    lower_green = np.array([40, 100, 50])
-    upper_green = np.array([85, 255, 255])
-    
-    # Create mask for green regions
-    green_mask = cv2.inRange(hsv, lower_green, upper_green)
-    
+    return client
+
+
+# ---------------- Green marker detection ----------------
+def green_mask_of(frame, lut=None):
+    """HSV threshold + cleanup for the green marker (lut: optional HsvMaskLUT for the threshold)."""
+    if lut is not None:
+        green_mask = lut.mask(frame)
+    else:
+        # Convert frame to HSV color space
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+
+        # Create mask for green regions
+        green_mask = cv2.inRange(hsv, LOWER_GREEN, UPPER_GREEN)
+
     # Clean up mask
     kernel = np.ones((1, 1), np.uint8)
     green_mask = cv2.morphologyEx(green_mask, cv2.MORPH_OPEN, kernel)
     green_mask = cv2.morphologyEx(green_mask, cv2.MORPH_CLOSE, kernel)
-    
-    # Apply mask: only green visible
-    green_only = cv2.bitwise_and(frame, frame, mask=green_mask)
-    
+    return green_mask
+
+
+def biggest_blob(green_mask, offset=(0, 0)):
+    """Return mqtt_data for the biggest green contour, or None if nothing passes MIN_AREA."""
     # Find contours for green regions
     contours, _ = cv2.findContours(green_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    
-    if contours:
-        biggest_contour = max(contours, key=cv2.contourArea)
-        area = cv2.contourArea(biggest_contour)
-        
-        if area > 100:
-            x, y, w, h = cv2.boundingRect(biggest_contour)
-            cx = x + w // 2
-            cy = y + h // 2
-            
-            # Draw bounding box and center
-            cv2.rectangle(green_only, (x, y), (x + w, y + h), (255, 255, 255), 2)
-            cv2.circle(green_only, (cx, cy), 5, (255, 255, 255), -1)
-            cv2.putText(green_only, f"({cx}, {cy})", (x, y - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
-            cv2.putText(green_only, f"Area: {int(area)}", (x, y + h + 20),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
-            
-            # Send data via MQTT
-            mqtt_data = {
-                "center": [cx, cy],
-                "area": int(area),
-                "width": w,
-                "height": h
-            }
-            mqtt_message = json.dumps(mqtt_data)
+    if not contours:
+        return None
+
+    biggest_contour = max(contours, key=cv2.contourArea)
+    area = cv2.contourArea(biggest_contour)
+    if area <= MIN_AREA:
+        return None
+
+    x, y, w, h = cv2.boundingRect(biggest_contour)
+    x += offset[0]
+    y += offset[1]
+    return {
+        "center": [x + w // 2, y + h // 2],
+        "area": int(area),
+        "width": w,
+        "height": h
+    }
+
+
+def detect_green(frame, lut=None):
+    """Return (mqtt_data or None, green_mask) for the biggest green blob in a BGR frame."""
+    green_mask = green_mask_of(frame, lut)
+    return biggest_blob(green_mask), green_mask
+
+
+class GreenTracker:
+    """
+    Incremental version of detect_green().
+
+    Once the marker is found only a window around its last bounding box is
+    searched. The window grows by `margin` (fraction of the box size) plus the
+    recent per-frame motion times `velocity_gain`. A full-frame scan runs when
+    the blob is lost, when it touches the window's border (the window cut it,
+    so its box, area and center would be wrong), when the window would cover
+    most of the frame anyway, or every `full_every` frames so a second, bigger
+    marker can't be missed for long.
+    """
+
+    def __init__(self, margin=0.5, velocity_gain=2.0, full_every=30, min_pad=16, lut=None):
+        self.lut = lut
+        self.margin = margin
+        self.velocity_gain = velocity_gain
+        self.full_every = full_every
+        self.min_pad = min_pad
+
+        self.last = None       # last mqtt_data
+        self.velocity = (0.0, 0.0)
+        self.since_full = 0
+        self.roi = None        # (x0, y0, x1, y1) searched on the last frame, None = full frame
+
+        self.full_scans = 0
+        self.roi_scans = 0
+        self.roi_misses = 0
+        self.roi_clipped = 0
+
+    def reset(self):
+        """Forget the track (on loss, or when the video source changes): the next frame is a full scan."""
+        self.last = None
+        self.velocity = (0.0, 0.0)
+
+    def _window(self, shape):
+        h_img, w_img = shape[:2]
+        cx, cy = self.last["center"]
+        w, h = self.last["width"], self.last["height"]
+        vx, vy = self.velocity
+        pad_x = max(self.min_pad, int(self.margin * w + self.velocity_gain * abs(vx)))
+        pad_y = max(self.min_pad, int(self.margin * h + self.velocity_gain * abs(vy)))
+        # Center the window where the blob should be now, not where it was
+        cx += int(vx)
+        cy += int(vy)
+        x0 = max(0, cx - w // 2 - pad_x)
+        y0 = max(0, cy - h // 2 - pad_y)
+        x1 = min(w_img, cx + (w + 1) // 2 + pad_x)
+        y1 = min(h_img, cy + (h + 1) // 2 + pad_y)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        # Not worth cropping when the window is most of the frame
+        if (x1 - x0) * (y1 - y0) > 0.6 * w_img * h_img:
+            return None
+        return x0, y0, x1, y1
+
+    @staticmethod
+    def _clipped(data, window, shape):
+        """True if the blob's box touches a window edge that is not also a frame edge."""
+        x0, y0, x1, y1 = window
+        h_img, w_img = shape[:2]
+        x = data["center"][0] - data["width"] // 2
+        y = data["center"][1] - data["height"] // 2
+        return ((x <= x0 and x0 > 0) or (y <= y0 and y0 > 0)
+                or (x + data["width"] >= x1 and x1 < w_img) or (y + data["height"] >= y1 and y1 < h_img))
+
+    def _update(self, data):
+        if data is None:
+            self.reset()
+            return
+        if self.last is not None:
+            px, py = self.last["center"]
+            cx, cy = data["center"]
+            # Light smoothing so one noisy frame doesn't blow the window up
+            vx = 0.5 * self.velocity[0] + 0.5 * (cx - px)
+            vy = 0.5 * self.velocity[1] + 0.5 * (cy - py)
+            self.velocity = (vx, vy)
+        self.last = data
+
+    def detect(self, frame):
+        """Return (mqtt_data or None, green_mask); the mask covers only self.roi when one was used."""
+        window = None
+        if self.last is not None and self.since_full < self.full_every:
+            window = self._window(frame.shape)
+
+        if window is not None:
+            x0, y0, x1, y1 = window
+            mask = green_mask_of(frame[y0:y1, x0:x1], self.lut)
+            data = biggest_blob(mask, offset=(x0, y0))
+            self.roi_scans += 1
+            self.since_full += 1
+            if data is not None and not self._clipped(data, window, frame.shape):
+                self.roi = window
+                self._update(data)
+                return data, mask
+            # Lost it inside the window, or the window cut it: fall back to a full scan this frame
+            if data is None:
+                self.roi_misses += 1
+            else:
+                self.roi_clipped += 1
+
+        mask = green_mask_of(frame, self.lut)
+        data = biggest_blob(mask)
+        self.full_scans += 1
+        self.since_full = 0
+        self.roi = None
+        self._update(data)
+        return data, mask
+
+
+def draw_detection(frame, green_mask, data, roi=None):
+    """Build the 'only green visible' debug view with box, center and area."""
+    if roi is not None:
+        # Tracker masks only cover the search window
+        x0, y0, x1, y1 = roi
+        full_mask = np.zeros(frame.shape[:2], np.uint8)
+        full_mask[y0:y1, x0:x1] = green_mask
+        green_mask = full_mask
+    green_only = cv2.bitwise_and(frame, frame, mask=green_mask)
+    if roi is not None:
+        cv2.rectangle(green_only, (roi[0], roi[1]), (roi[2] - 1, roi[3] - 1), (0, 255, 255), 1)
+    if data is not None:
+        cx, cy = data["center"]
+        w, h = data["width"], data["height"]
+        x, y = cx - w // 2, cy - h // 2
+        cv2.rectangle(green_only, (x, y), (x + w, y + h), (255, 255, 255), 2)
+        cv2.circle(green_only, (cx, cy), 5, (255, 255, 255), -1)
+        cv2.putText(green_only, f"({cx}, {cy})", (x, y - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+        cv2.putText(green_only, f"Area: {data['area']}", (x, y + h + 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+    return green_only
+
+
+# ---------------- Main ----------------
+def parse_args():
+    parser = argparse.ArgumentParser(description="Green marker tracker -> MQTT")
+    parser.add_argument("--source", default="0",
+                        help="camera index or video file (default: camera 0)")
+    parser.add_argument("--headless", action="store_true",
+                        help="no preview window (for benchmarking on a plain Linux box)")
+    parser.add_argument("--no-mqtt", action="store_true",
+                        help="don't connect to the broker; messages are only serialized")
+    parser.add_argument("--workers", type=int, default=1, help="detector worker threads")
+    parser.add_argument("--queue-size", type=int, default=1,
+                        help="depth of the drop-oldest queues between stages")
+    parser.add_argument("--no-pace", action="store_true",
+                        help="read video files as fast as possible instead of at their native fps")
+    parser.add_argument("--track", action="store_true",
+                        help="search only a window around the last marker position (ROI tracking)")
+    parser.add_argument("--roi-margin", type=float, default=0.5,
+                        help="tracking window padding as a fraction of the marker size")
+    parser.add_argument("--full-every", type=int, default=30,
+                        help="force a full-frame scan every N frames while tracking")
+    parser.add_argument("--lut", action="store_true",
+                        help="threshold with a cached BGR lookup table instead of cvtColor+inRange")
+    parser.add_argument("--lut-bits", type=int, default=6, help="LUT quantization bits per channel")
+    parser.add_argument("--verbose", action="store_true", help="print every MQTT message")
+    parser.add_argument("--wire", choices=("binary", "json"), default="json",
+                        help="payload format; binary blob frames need a consumer that decodes TYPE_BLOB "
+                             "(FollowMeeReceiver does not)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    source = int(args.source) if args.source.isdigit() else args.source
+
+    client = None
+    if not args.no_mqtt:
+        try:
+            client = mqtt_connect()
+            print("MQTT Connected!")
+        except Exception as e:
+            print(f"MQTT Connection failed: {e}")
+            exit()
+
+    # Open camera
+    cam = cv2.VideoCapture(source)
+    if not cam.isOpened():
+        print("Error: Could not open camera")
+        exit()
+
+    # Live cameras pace themselves; video files are replayed at their recorded rate
+    source_fps = None
+    if isinstance(source, str) and not args.no_pace:
+        source_fps = cam.get(cv2.CAP_PROP_FPS) or 30.0
+
+    cam_lock = threading.Lock()
+
+    def read_frame():
+        with cam_lock:
+            ret, frame = cam.read()
+        return frame if ret else None
+
+    lut = HsvMaskLUT(LOWER_GREEN, UPPER_GREEN, bits=args.lut_bits) if args.lut else None
+
+    # The tracker carries state between frames, so it needs frames in order (one worker)
+    tracker = None
+    if args.track:
+        tracker = GreenTracker(margin=args.roi_margin, full_every=args.full_every, lut=lut)
+        args.workers = 1
+
+    def detect(frame):
+        if tracker is not None:
+            data, mask = tracker.detect(frame)
+            roi = tracker.roi
+        else:
+            data, mask = detect_green(frame, lut)
+            roi = None
+        if not args.headless:
+            display_q.put(draw_detection(frame, mask, data, roi))
+        return data
+
+    encoder = Encoder(args.wire)
+
+    def publish(data):
+        mqtt_message = encoder.blob(data)
+        if client is not None:
             client.publish(TOPIC_PUB, mqtt_message)
-            print(f"MQTT sent: {mqtt_message}")
-    
-    # Show result window
-    cv2.imshow("green Marker Detection", green_only)
-    
-    # Press 'q' to quit
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
-
-# Cleanup
-client.loop_stop()
-client.disconnect()
-cam.release()
-cv2.destroyAllWindows()
+        if args.verbose:
+            print(f"MQTT sent: {data}")
+
+    display_q = LatestQueue(1)
+    pipeline = FramePipeline(read_frame, detect, publish, workers=args.workers,
+                             queue_size=args.queue_size, source_fps=source_fps)
+    pipeline.start()
+
+    try:
+        if args.headless:
+            pipeline.join()
+        else:
+            # imshow/waitKey must stay on the main thread
+            while pipeline.running():
+                green_only = display_q.get(timeout=0.05)
+                if green_only is not None:
+                    cv2.imshow("green Marker Detection", green_only)
+                # Press 'q' to quit
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    pipeline.stop()
+                    break
+            pipeline.join()
+    except KeyboardInterrupt:
+        pipeline.stop()
+        pipeline.join()
+
+    print_report(pipeline.report())
+    if tracker is not None:
+        print("Tracking: %d window scans (%d misses, %d clipped), %d full scans"
+              % (tracker.roi_scans, tracker.roi_misses, tracker.roi_clipped, tracker.full_scans))
+
+    # Cleanup
+    if client is not None:
+        client.loop_stop()
+        client.disconnect()
+    cam.release()
+    if not args.headless:
+        cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()
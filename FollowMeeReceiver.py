@@ -1,10 +1,15 @@
-import network
 import time
-import json
-from umqtt.simple import MQTTClient
 import secrets_CS
 from machine import Pin, PWM
 import math
+from fastmsg import FastDecoder, FIELD_DIST, FIELD_POS, mem_free
+from mqttconn import MQTTConnection
+
+# Control loop timing
+CONTROL_HZ = 100          # fixed PI update rate
+SAMPLE_HOLD_MS = 150      # a sample is used at full weight for this long
+SAMPLE_TIMEOUT_MS = 500   # ...then fades out linearly and is dropped after this
+REPORT_MS = 1000          # loop statistics print interval
 
 
 class Motor:
@@ -34,43 +39,24 @@ class Follower:
         self.left_motor = Motor(27, 14)
         self.right_motor = Motor(12, 13)
 
-        # Wi-Fi credentials
-        self.SSID = secrets_CS.SSID
-        self.PASSWORD = secrets_CS.PWD
-        self.wifi_connect()
-
-        # MQTT config
-        self.MQTT_BROKER = secrets_CS.mqtt_url
+        # MQTT config (Wi-Fi and broker connect in the background of run())
         self.MQTT_PORT = 8883
-        self.MQTT_USERNAME = secrets_CS.mqtt_username
-        self.MQTT_PASSWORD = secrets_CS.mqtt_password
         self.CLIENT_ID = "ESP32_Reader"
         self.TOPIC_SUB = "/ME35/1"
-
-        print("Connecting to MQTT...")
-        self.client = MQTTClient(
-            client_id=self.CLIENT_ID,
-            server=self.MQTT_BROKER,
-            port=self.MQTT_PORT,
-            user=self.MQTT_USERNAME,
-            password=self.MQTT_PASSWORD,
-            ssl=True,
-            ssl_params={'server_hostname': self.MQTT_BROKER}
-        )
-        self.client.set_callback(self.message_callback)
-        self.client.connect()
-        print("MQTT Connected!")
-        self.client.subscribe(self.TOPIC_SUB)
-        print(f"Subscribed to: {self.TOPIC_SUB}")
-        print("\nListening for messages...\n")
+        self.mqtt = MQTTConnection(
+            self.CLIENT_ID, secrets_CS.mqtt_url, port=self.MQTT_PORT,
+            user=secrets_CS.mqtt_username, password=secrets_CS.mqtt_password,
+            ssid=secrets_CS.SSID, wifi_password=secrets_CS.PWD,
+            callback=self.message_callback)
+        self.mqtt.subscribe(self.TOPIC_SUB)
 
         # PID variables
         self.TARGET_SIZE = 1 / 25
-        self.FREQ = 100  # sample rate in Hz
+        self.FREQ = CONTROL_HZ  # control rate in Hz
 
         # Distance control gains
         self.kp_D = 2000
-        self.ki_D = 0.5
+        self.ki_D = 0.5 * self.FREQ  # tuned as 0.5 per sample at 100 samples/s; integral now uses dt
 
         # Position control gains
         self.kp_P = 0.4
@@ -80,44 +66,78 @@ class Follower:
         self.total_dist_e = 0
         self.total_pos_e = 0
 
-    def wifi_connect(self):
-        """Connect to Wi-Fi network."""
-        wlan = network.WLAN(network.STA_IF)
-        wlan.active(True)
-        wlan.connect(self.SSID, self.PASSWORD)
-        print("Connecting to Wi-Fi...", end="")
-        while not wlan.isconnected():
-            print(".", end="")
-            time.sleep(0.5)
-        print("\nWi-Fi connected:", wlan.ifconfig())
+        # Latest sample from MQTT (the control loop reads it, the callback only writes it)
+        self.decoder = FastDecoder()
+        self.bad_messages = 0
+        self.dist_e = 0
+        self.pos_e = 0
+        self.sample_ticks = None
+        self.samples = 0
+        self.timed_out = True
+
+        # Loop statistics
+        self.steps = 0
+        self.overruns = 0
+        self.missed_ticks = 0
+        self.worst_loop_us = 0
+        self.worst_dt_us = 0
 
     def get_direction(self, num):
         """Return direction (1 for forward, 0 for backward)."""
         return 1 if num >= 0 else 0
 
     def message_callback(self, topic, msg):
-        """Handle incoming MQTT messages."""
-        try:
-            data = json.loads(msg)
-            dist_e = data.get("distance_error", 0)
-            pos_e = data.get("position_error", 0)
-            self.calc_motion(dist_e, pos_e)
-        except Exception as e:
-            print("Error parsing message:", e)
-
-    def calc_motion(self, dist_e, pos_e):
+        """Store the latest error sample; the control loop picks it up on its next tick."""
+        found = self.decoder.decode(msg)
+        if not found & (FIELD_DIST | FIELD_POS):
+            self.bad_messages += 1
+            return
+        self.dist_e = self.decoder.dist_e if found & FIELD_DIST else 0
+        self.pos_e = self.decoder.pos_e if found & FIELD_POS else 0
+        self.sample_ticks = time.ticks_ms()
+        self.samples += 1
+
+    def sample_weight(self, now_ms):
+        """1.0 for a fresh sample, fading to 0.0 between SAMPLE_HOLD_MS and SAMPLE_TIMEOUT_MS."""
+        if self.sample_ticks is None:
+            return 0.0
+        age = time.ticks_diff(now_ms, self.sample_ticks)
+        if age <= SAMPLE_HOLD_MS:
+            return 1.0
+        if age >= SAMPLE_TIMEOUT_MS:
+            return 0.0
+        return (SAMPLE_TIMEOUT_MS - age) / (SAMPLE_TIMEOUT_MS - SAMPLE_HOLD_MS)
+
+    def control_step(self, dt):
+        """One fixed-rate PI update using the latest (possibly decayed) sample and the measured dt."""
+        weight = self.sample_weight(time.ticks_ms())
+        if weight == 0.0:
+            # No target for too long: stop and forget the integrators so we don't lurch on reacquire
+            if not self.timed_out:
+                print("Sample timed out - stopping")
+                self.timed_out = True
+            self.total_dist_e = 0
+            self.total_pos_e = 0
+            self.left_motor.stop()
+            self.right_motor.stop()
+            return
+        self.timed_out = False
+        self.calc_motion(self.dist_e * weight, self.pos_e * weight, dt)
+
+    def calc_motion(self, dist_e, pos_e, dt=None):
         """Compute PI control for distance and position and drive motors."""
-        print(f"Object Size: {dist_e} | Center: {pos_e}")
+        if dt is None:
+            dt = 1 / self.FREQ
 
         # Distance PI
         kp_D_term = self.kp_D * dist_e
-        self.total_dist_e += dist_e
+        self.total_dist_e += dist_e * dt
         ki_D_term = self.ki_D * self.total_dist_e
         speed = kp_D_term + ki_D_term
 
         # Position PI
         kp_P_term = self.kp_P * pos_e
-        self.total_pos_e += pos_e * (1 / self.FREQ)
+        self.total_pos_e += pos_e * dt
         ki_P_term = self.ki_P * self.total_pos_e
         turn_rate = kp_P_term + ki_P_term
 
@@ -126,12 +146,75 @@ class Follower:
         # Clamp speed
         speed = max(min(speed, 70), -70)
 
-        print(f"Dist -> kp: {kp_D_term:.2f}, ki: {ki_D_term:.2f}, speed: {speed:.2f}")
-        print(f"Pos  -> kp: {kp_P_term:.2f}, ki: {ki_P_term:.2f}, turn_rate: {turn_rate:.2f}")
-
         # Motor commands
         left_motor = speed - turn_rate
         right_motor = speed + turn_rate
 
         self.left_motor.start(self.get_direction(left_motor), abs(left_motor))
         self.right_motor.start(self.get_direction(right_motor), abs(right_motor))
+        return speed, turn_rate
+
+    def print_stats(self):
+        age = time.ticks_diff(time.ticks_ms(), self.sample_ticks) if self.sample_ticks is not None else -1
+        print("Loop: %d steps | overruns %d (%d ticks missed) | worst loop %d us | worst dt %d us | "
+              "samples %d (%d bad) | last sample %d ms ago | dist %.4f pos %.1f | mem_free %d"
+              % (self.steps, self.overruns, self.missed_ticks, self.worst_loop_us, self.worst_dt_us,
+                 self.samples, self.bad_messages, age, self.dist_e, self.pos_e, mem_free()))
+        self.worst_loop_us = 0
+        self.worst_dt_us = 0
+
+    def start(self):
+        """Start the control schedule from now (run() does this; call it before driving step() by hand)."""
+        self.period_us = 1000000 // CONTROL_HZ
+        self.last = time.ticks_us()
+        self.next_due = time.ticks_add(self.last, self.period_us)
+        self.next_report = time.ticks_add(time.ticks_ms(), REPORT_MS)
+
+    def step(self):
+        """
+        One pass of the loop: poll MQTT, then either wait (at most 1 ms) or run the due PI step.
+
+        A step that starts more than one period late counts as an overrun; the
+        schedule then restarts from now instead of firing a burst of catch-up steps.
+        """
+        self.mqtt.poll()  # reconnects with backoff; never blocks while the broker is down
+        self.mqtt.check_msg()
+
+        now = time.ticks_us()
+        wait = time.ticks_diff(self.next_due, now)
+        if wait > 0:
+            time.sleep_us(min(wait, 1000))  # keep polling MQTT while we wait
+            return
+
+        period_us = self.period_us
+        dt_us = time.ticks_diff(now, self.last)
+        self.last = now
+        self.control_step(dt_us / 1000000)
+        self.steps += 1
+
+        loop_us = time.ticks_diff(time.ticks_us(), now) - wait  # lateness + step time
+        self.worst_loop_us = max(self.worst_loop_us, loop_us)
+        self.worst_dt_us = max(self.worst_dt_us, dt_us)
+        if -wait >= period_us:
+            self.overruns += 1
+            self.missed_ticks += -wait // period_us
+            self.next_due = time.ticks_add(now, period_us)
+        else:
+            self.next_due = time.ticks_add(self.next_due, period_us)
+
+        if time.ticks_diff(time.ticks_ms(), self.next_report) >= 0:
+            self.print_stats()
+            self.mqtt.print_metrics()
+            self.next_report = time.ticks_add(self.next_report, REPORT_MS)
+
+    def run(self):
+        """Run the PI loop at CONTROL_HZ on a ticks_us() schedule, polling MQTT in between."""
+        self.start()
+        while True:
+            self.step()
+
+
+# ---------- MAIN ----------
+if __name__ == "__main__":
+    follower = Follower()
+    follower.run()
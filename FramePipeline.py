@@ -0,0 +1,243 @@
+import threading
+import time
+from collections import deque
+
+
+# ---------------- Bounded drop-oldest queue ----------------
+class LatestQueue:
+    """Bounded queue that throws away the oldest item when full, so readers always see fresh data."""
+
+    def __init__(self, maxsize=1):
+        self.items = deque(maxlen=maxsize)
+        self.cond = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self.cond:
+            if len(self.items) == self.items.maxlen:
+                self.dropped += 1  # deque(maxlen) evicts the oldest on append
+            self.items.append(item)
+            self.cond.notify()
+
+    def get(self, timeout=None):
+        """Return the oldest queued item, or None once the queue is closed and empty."""
+        with self.cond:
+            while not self.items and not self.closed:
+                if not self.cond.wait(timeout):
+                    return None
+            if self.items:
+                return self.items.popleft()
+            return None
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+# ---------------- Per-stage timing ----------------
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = int(round(pct / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[k]
+
+
+class StageStats:
+    """Collects latency samples (seconds) per named stage."""
+
+    def __init__(self):
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self.lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    def summary(self):
+        """Return {stage: {count, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}}."""
+        out = {}
+        with self.lock:
+            for stage, values in self.samples.items():
+                values = sorted(values)
+                out[stage] = {
+                    "count": len(values),
+                    "mean_ms": 1000 * sum(values) / len(values),
+                    "p50_ms": 1000 * percentile(values, 50),
+                    "p95_ms": 1000 * percentile(values, 95),
+                    "p99_ms": 1000 * percentile(values, 99),
+                    "max_ms": 1000 * values[-1],
+                }
+        return out
+
+
+# ---------------- Capture -> detect -> publish pipeline ----------------
+class FramePipeline:
+    """
+    Runs capture, detection and publishing on separate threads.
+
+    read_frame() -> frame or None (None ends the stream)
+    detect(frame) -> result or None (None means nothing to publish)
+    publish(result) -> sends the result (MQTT, sink, ...)
+
+    Stages are joined by LatestQueues so a slow stage drops stale frames instead
+    of stalling capture. Latencies are recorded per stage and end-to-end
+    (capture timestamp to publish completion).
+    """
+
+    def __init__(self, read_frame, detect, publish, workers=1, queue_size=1,
+                 source_fps=None, on_result=None):
+        self.read_frame = read_frame
+        self.detect = detect
+        self.publish = publish
+        self.workers = max(1, workers)
+        self.source_fps = source_fps  # pace capture like a live camera when set
+        self.on_result = on_result    # optional hook (e.g. display) called from the workers
+
+        self.frame_q = LatestQueue(queue_size)
+        self.result_q = LatestQueue(queue_size)
+        self.stats = StageStats()
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.detect_threads = []
+        self.publish_thread = None
+
+        self.frames_captured = 0
+        self.frames_detected = 0
+        self.published = 0
+        self.stale_results = 0
+        self.last_published_seq = -1
+        self.seq_lock = threading.Lock()
+        self.start_time = None
+        self.end_time = None
+
+    # ---------- Stage threads ----------
+    def _capture_loop(self):
+        seq = 0
+        period = 1.0 / self.source_fps if self.source_fps else 0
+        next_due = time.perf_counter()
+        try:
+            while not self.stop_event.is_set():
+                t0 = time.perf_counter()
+                frame = self.read_frame()
+                t_capture = time.perf_counter()
+                if frame is None:
+                    break
+                self.stats.record("capture", t_capture - t0)
+                self.frame_q.put((seq, t_capture, frame))
+                self.frames_captured += 1
+                seq += 1
+                if period:
+                    next_due += period
+                    delay = next_due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        next_due = time.perf_counter()
+        finally:
+            self.frame_q.close()
+
+    def _detect_loop(self):
+        while True:
+            item = self.frame_q.get()
+            if item is None:
+                break
+            seq, t_capture, frame = item
+            t_start = time.perf_counter()
+            self.stats.record("capture_to_detect", t_start - t_capture)
+            result = self.detect(frame)
+            t_done = time.perf_counter()
+            self.stats.record("detect", t_done - t_start)
+            self.frames_detected += 1
+            if self.on_result is not None:
+                self.on_result(seq, frame, result)
+            if result is not None:
+                self.result_q.put((seq, t_capture, t_done, result))
+
+    def _publish_loop(self):
+        while True:
+            item = self.result_q.get()
+            if item is None:
+                break
+            seq, t_capture, t_detected, result = item
+            # With several detector workers results can finish out of order;
+            # never publish a center older than one already sent.
+            with self.seq_lock:
+                if seq <= self.last_published_seq:
+                    self.stale_results += 1
+                    continue
+                self.last_published_seq = seq
+            t_start = time.perf_counter()
+            self.stats.record("detect_to_publish", t_start - t_detected)
+            self.publish(result)
+            t_done = time.perf_counter()
+            self.stats.record("publish", t_done - t_start)
+            self.stats.record("end_to_end", t_done - t_capture)
+            self.published += 1
+
+    # ---------- Lifecycle ----------
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.threads = [threading.Thread(target=self._capture_loop, name="capture", daemon=True)]
+        self.detect_threads = [
+            threading.Thread(target=self._detect_loop, name="detect-%d" % i, daemon=True)
+            for i in range(self.workers)
+        ]
+        self.publish_thread = threading.Thread(target=self._publish_loop, name="publish", daemon=True)
+        for t in self.threads + self.detect_threads + [self.publish_thread]:
+            t.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def join(self):
+        """Wait for the stream to end and every queued result to be published."""
+        for t in self.threads + self.detect_threads:
+            t.join()
+        self.result_q.close()
+        self.publish_thread.join()
+        self.end_time = time.perf_counter()
+
+    def running(self):
+        return any(t.is_alive() for t in self.threads + self.detect_threads)
+
+    def run(self):
+        self.start()
+        try:
+            self.join()
+        except KeyboardInterrupt:
+            self.stop()
+            self.join()
+        return self.report()
+
+    # ---------- Reporting ----------
+    def report(self):
+        end = self.end_time or time.perf_counter()
+        elapsed = end - self.start_time if self.start_time else 0.0
+        return {
+            "elapsed_s": elapsed,
+            "frames_captured": self.frames_captured,
+            "frames_detected": self.frames_detected,
+            "frames_dropped": self.frame_q.dropped,
+            "results_dropped": self.result_q.dropped,
+            "stale_results": self.stale_results,
+            "published": self.published,
+            "detect_fps": self.frames_detected / elapsed if elapsed else 0.0,
+            "stages": self.stats.summary(),
+        }
+
+
+def print_report(report):
+    """Pretty-print a FramePipeline.report() dict."""
+    print("\n---------------- Pipeline report ----------------")
+    print("Elapsed: %.2f s | captured %d | detected %d (%.1f fps) | published %d"
+          % (report["elapsed_s"], report["frames_captured"], report["frames_detected"],
+             report["detect_fps"], report["published"]))
+    print("Dropped frames: %d | dropped results: %d | stale results: %d"
+          % (report["frames_dropped"], report["results_dropped"], report["stale_results"]))
+    print("%-18s %7s %9s %9s %9s %9s" % ("stage", "count", "p50 ms", "p95 ms", "p99 ms", "max ms"))
+    for stage, s in report["stages"].items():
+        print("%-18s %7d %9.2f %9.2f %9.2f %9.2f"
+              % (stage, s["count"], s["p50_ms"], s["p95_ms"], s["p99_ms"], s["max_ms"]))
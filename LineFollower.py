@@ -54,54 +54,59 @@ base_speed = 150
 slow_search_speed = 100 # Very slow speed for searching
 # Faster measurement loop with reduced sleep time
 measurement_interval = 0.01  # 10ms instead of 20ms for more responsive control
-print("Starting line following with 40ms color sensor integration time...")
-while True:
-    try:
-        c = color_sensor.read()[3]
-        now = time.ticks_ms()
-        if is_on_line():
-            # Reset and go straight
-            state = None
-            set_motor_dir(base_speed, base_speed)
-            motor_status = "On line, going straight"
-        else:
-            # Lost line - enter search pattern
-            if state is None:
-                # Just lost the line, start searching right
-                state = "searching_right"
-                state_start_time = now
-                print("*** STARTING SEARCH - GOING RIGHT FIRST ***")
-            # Check if we need to switch search direction
-            time_in_state = time.ticks_diff(now, state_start_time)
-            # Use different durations based on current state
-            current_search_duration = right_search_duration if state == "searching_right" else left_search_duration
-            if time_in_state >= current_search_duration:
-                # Switch search direction
-                if state == "searching_right":
-                    state = "searching_left"
-                    print("*** SWITCHING TO SEARCH LEFT ***")
-                elif state == "searching_left":
-                    state = "searching_right"
-                    print("*** SWITCHING TO SEARCH RIGHT ***")
-                state_start_time = now
-                time_in_state = 0  # Reset for immediate use
-            # Execute search movement
+def step():
+    """One iteration of the main loop: read the sensor, update the search state, drive."""
+    global state, state_start_time
+    c = color_sensor.read()[3]
+    now = time.ticks_ms()
+    if is_on_line():
+        # Reset and go straight
+        state = None
+        set_motor_dir(base_speed, base_speed)
+        motor_status = "On line, going straight"
+    else:
+        # Lost line - enter search pattern
+        if state is None:
+            # Just lost the line, start searching right
+            state = "searching_right"
+            state_start_time = now
+            print("*** STARTING SEARCH - GOING RIGHT FIRST ***")
+        # Check if we need to switch search direction
+        time_in_state = time.ticks_diff(now, state_start_time)
+        # Use different durations based on current state
+        current_search_duration = right_search_duration if state == "searching_right" else left_search_duration
+        if time_in_state >= current_search_duration:
+            # Switch search direction
             if state == "searching_right":
-                # Search right: left motor turns very slow, right motor stationary
-                left_motor = slow_search_speed
-                right_motor = 0
-                motor_status = f"Search right: left motor slow, right stationary | time in state: {time_in_state}ms / {right_search_duration}ms"
+                state = "searching_left"
+                print("*** SWITCHING TO SEARCH LEFT ***")
             elif state == "searching_left":
-                # Search left: right motor turns very slow, left motor stationary
-                left_motor = 0
-                right_motor = 130
-                motor_status = f"Search left: right motor slow, left stationary | time in state: {time_in_state}ms / {left_search_duration}ms"
-            set_motor_dir(left_motor, right_motor)
-        print(f"Sensor C={c} | State: {state} | Motor status: {motor_status}")
-        # Reduced sleep time for more frequent measurements
-        time.sleep(measurement_interval)
-    except KeyboardInterrupt:
-        # Stop motors when program is interrupted
-        print("Program stopped - stopping motors")
-        set_motor_dir(0, 0)
-        break
+                state = "searching_right"
+                print("*** SWITCHING TO SEARCH RIGHT ***")
+            state_start_time = now
+            time_in_state = 0  # Reset for immediate use
+        # Execute search movement
+        if state == "searching_right":
+            # Search right: left motor turns very slow, right motor stationary
+            left_motor = slow_search_speed
+            right_motor = 0
+            motor_status = f"Search right: left motor slow, right stationary | time in state: {time_in_state}ms / {right_search_duration}ms"
+        elif state == "searching_left":
+            # Search left: right motor turns very slow, left motor stationary
+            left_motor = 0
+            right_motor = 130
+            motor_status = f"Search left: right motor slow, left stationary | time in state: {time_in_state}ms / {left_search_duration}ms"
+        set_motor_dir(left_motor, right_motor)
+    print(f"Sensor C={c} | State: {state} | Motor status: {motor_status}")
+    # Reduced sleep time for more frequent measurements
+    time.sleep(measurement_interval)
+if __name__ == "__main__":
+    print("Starting line following with 40ms color sensor integration time...")
+    while True:
+        try:
+            step()
+        except KeyboardInterrupt:
+            # Stop motors when program is interrupted
+            print("Program stopped - stopping motors")
+            set_motor_dir(0, 0)
+            break
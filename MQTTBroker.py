@@ -0,0 +1,388 @@
+"""
+Local MQTT 3.1.1 stand-in for the hosted broker in secrets.
+
+Enough of the protocol for the /ME35 devices and host scripts: CONNECT,
+PUBLISH (QoS 0 and 1 in, QoS 0 out), SUBSCRIBE / UNSUBSCRIBE with + and #
+wildcards, retained messages, PINGREQ, DISCONNECT and keepalive timeouts.
+One thread per client; a publish is written to every matching subscriber
+before the publisher's next packet is read, so a slow subscriber slows its
+publishers down instead of growing an unbounded queue.
+
+    python MQTTBroker.py                    # plain TCP on 1883
+    python MQTTBroker.py --tls              # TLS on 8883 with a throwaway self-signed cert
+    python MQTTBroker.py --tls --certfile cert.pem --keyfile key.pem
+
+Devices with ssl=True need the TLS port; paho clients need
+tls_set(cert_reqs=ssl.CERT_NONE) (or the cert as ca_certs) for a self-signed cert.
+"""
+import argparse
+import os
+import socket
+import ssl
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+
+# Packet types (fixed header high nibble)
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK = 8, 9, 10, 11
+PINGREQ, PINGRESP, DISCONNECT = 12, 13, 14
+
+CONNACK_ACCEPTED = 0
+CONNACK_BAD_PROTOCOL = 1
+CONNACK_BAD_CREDENTIALS = 4
+
+
+class ProtocolError(Exception):
+    pass
+
+
+# ---------------- Wire helpers ----------------
+def encode_length(n):
+    out = bytearray()
+    while True:
+        byte = n % 128
+        n //= 128
+        out.append(byte | 0x80 if n else byte)
+        if not n:
+            return bytes(out)
+
+
+def encode_string(s):
+    if isinstance(s, str):
+        s = s.encode()
+    return struct.pack("!H", len(s)) + s
+
+
+def packet(ptype, body=b"", flags=0):
+    return bytes([(ptype << 4) | flags]) + encode_length(len(body)) + body
+
+
+def read_exact(sock, n):
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        buf += chunk
+    return bytes(buf)
+
+
+def read_packet(sock):
+    """Return (type, flags, body) of the next packet."""
+    first = read_exact(sock, 1)[0]
+    length, shift = 0, 0
+    for _ in range(4):
+        byte = read_exact(sock, 1)[0]
+        length |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            break
+        shift += 7
+    else:
+        raise ProtocolError("bad remaining length")
+    return first >> 4, first & 0x0F, read_exact(sock, length)
+
+
+def read_string(body, pos):
+    (n,) = struct.unpack_from("!H", body, pos)
+    return body[pos + 2:pos + 2 + n], pos + 2 + n
+
+
+def topic_matches(pattern, topic):
+    """MQTT filter matching with + (one level) and # (this level and below)."""
+    p_parts = pattern.split("/")
+    t_parts = topic.split("/")
+    for i, part in enumerate(p_parts):
+        if part == "#":
+            return True
+        if i >= len(t_parts):
+            return False
+        if part != "+" and part != t_parts[i]:
+            return False
+    return len(p_parts) == len(t_parts)
+
+
+# ---------------- Broker ----------------
+class Session:
+    """One connected client."""
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.client_id = None
+        self.subscriptions = set()
+        self.send_lock = threading.Lock()
+        self.open = True
+
+    def send(self, data):
+        with self.send_lock:
+            self.sock.sendall(data)
+
+    def close(self):
+        self.open = False
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class Broker:
+    def __init__(self, host="0.0.0.0", port=1883, ssl_context=None, username=None, password=None,
+                 verbose=False):
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.username = username
+        self.password = password
+        self.verbose = verbose
+
+        self.lock = threading.Lock()
+        self.sessions = {}  # client_id -> Session
+        self.retained = {}  # topic -> payload
+        self.listener = None
+        self.thread = None
+
+        # Counters
+        self.connections = 0
+        self.received = 0
+        self.delivered = 0
+
+    # ---------- Lifecycle ----------
+    def start(self):
+        """Listen and accept clients on a background thread; returns the bound port."""
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind((self.host, self.port))
+        self.listener.listen(64)
+        self.port = self.listener.getsockname()[1]
+        self.thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self.thread.start()
+        return self.port
+
+    def stop(self):
+        try:
+            self.listener.close()
+        except OSError:
+            pass
+        with self.lock:
+            sessions = list(self.sessions.values())
+        for session in sessions:
+            session.close()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                sock, address = self.listener.accept()
+            except OSError:
+                return  # listener closed
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._serve, args=(sock, address), daemon=True).start()
+
+    # ---------- Per-client ----------
+    def _serve(self, sock, address):
+        session = None
+        try:
+            if self.ssl_context is not None:
+                sock = self.ssl_context.wrap_socket(sock, server_side=True)
+            session = Session(sock, address)
+            if not self._handshake(session):
+                return
+            while session.open:
+                ptype, flags, body = read_packet(sock)
+                if ptype == PUBLISH:
+                    self._on_publish(session, flags, body)
+                elif ptype == SUBSCRIBE:
+                    self._on_subscribe(session, body)
+                elif ptype == UNSUBSCRIBE:
+                    self._on_unsubscribe(session, body)
+                elif ptype == PINGREQ:
+                    session.send(packet(PINGRESP))
+                elif ptype == DISCONNECT:
+                    break
+                elif ptype == PUBACK:
+                    pass  # only QoS 0 goes out, but tolerate stray acks
+                else:
+                    raise ProtocolError("unexpected packet type %d" % ptype)
+        except (ConnectionError, ProtocolError, OSError, ssl.SSLError, struct.error, IndexError) as e:
+            if self.verbose:
+                print("Client %s dropped: %s" % (session.client_id if session else address, e))
+        finally:
+            if session is not None:
+                self._remove(session)
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def _handshake(self, session):
+        ptype, _, body = read_packet(session.sock)
+        if ptype != CONNECT:
+            raise ProtocolError("first packet was not CONNECT")
+        name, pos = read_string(body, 0)
+        level, connect_flags = body[pos], body[pos + 1]
+        (keepalive,) = struct.unpack_from("!H", body, pos + 2)
+        pos += 4
+        if name not in (b"MQTT", b"MQIsdp") or level not in (3, 4):
+            session.send(packet(CONNACK, bytes([0, CONNACK_BAD_PROTOCOL])))
+            return False
+
+        client_id, pos = read_string(body, pos)
+        if connect_flags & 0x04:  # will topic + message: parsed past, not published
+            _, pos = read_string(body, pos)
+            _, pos = read_string(body, pos)
+        user = password = None
+        if connect_flags & 0x80:
+            user, pos = read_string(body, pos)
+        if connect_flags & 0x40:
+            password, pos = read_string(body, pos)
+        if self.username is not None and (user != self.username.encode()
+                                          or password != (self.password or "").encode()):
+            session.send(packet(CONNACK, bytes([0, CONNACK_BAD_CREDENTIALS])))
+            return False
+
+        session.client_id = client_id.decode() or "anon-%s:%d" % session.address[:2]
+        if keepalive:
+            session.sock.settimeout(1.5 * keepalive)  # spec: drop after 1.5 keepalive periods of silence
+        with self.lock:
+            previous = self.sessions.get(session.client_id)
+            self.sessions[session.client_id] = session
+            self.connections += 1
+        if previous is not None:
+            # Spec: a second CONNECT with the same client id takes the session over
+            print("Client id %s reconnected from %s, closing the old connection"
+                  % (session.client_id, session.address[0]))
+            previous.close()
+        session.send(packet(CONNACK, bytes([0, CONNACK_ACCEPTED])))
+        if self.verbose:
+            print("Client %s connected from %s:%d" % ((session.client_id,) + session.address[:2]))
+        return True
+
+    def _remove(self, session):
+        with self.lock:
+            if self.sessions.get(session.client_id) is session:
+                del self.sessions[session.client_id]
+        session.open = False
+
+    def _on_publish(self, session, flags, body):
+        qos = (flags >> 1) & 0x03
+        retain = flags & 0x01
+        topic, pos = read_string(body, 0)
+        if qos:
+            packet_id = body[pos:pos + 2]
+            pos += 2
+        payload = body[pos:]
+        topic = topic.decode()
+        with self.lock:  # one _serve thread per client
+            self.received += 1
+
+        if qos == 1:
+            session.send(packet(PUBACK, packet_id))
+        elif qos == 2:
+            raise ProtocolError("QoS 2 is not supported")
+        if retain:
+            with self.lock:
+                if payload:
+                    self.retained[topic] = payload
+                else:
+                    self.retained.pop(topic, None)
+        self._route(topic, payload)
+
+    def _route(self, topic, payload):
+        data = packet(PUBLISH, encode_string(topic) + payload)
+        with self.lock:
+            targets = [s for s in self.sessions.values()
+                       if any(topic_matches(f, topic) for f in s.subscriptions)]
+        sent = 0
+        for target in targets:
+            try:
+                target.send(data)
+                sent += 1
+            except OSError:
+                target.close()
+        with self.lock:
+            self.delivered += sent
+
+    def _on_subscribe(self, session, body):
+        packet_id = body[:2]
+        pos = 2
+        granted = bytearray()
+        new_filters = []
+        while pos < len(body):
+            topic_filter, pos = read_string(body, pos)
+            pos += 1  # requested QoS; everything is delivered at QoS 0
+            topic_filter = topic_filter.decode()
+            session.subscriptions.add(topic_filter)
+            new_filters.append(topic_filter)
+            granted.append(0)
+        session.send(packet(SUBACK, packet_id + bytes(granted)))
+
+        with self.lock:
+            retained = list(self.retained.items())
+        for topic, payload in retained:
+            if any(topic_matches(f, topic) for f in new_filters):
+                session.send(packet(PUBLISH, encode_string(topic) + payload, 0x01))
+
+    def _on_unsubscribe(self, session, body):
+        packet_id = body[:2]
+        pos = 2
+        while pos < len(body):
+            topic_filter, pos = read_string(body, pos)
+            session.subscriptions.discard(topic_filter.decode())
+        session.send(packet(UNSUBACK, packet_id))
+
+    def print_stats(self):
+        with self.lock:
+            stats = (len(self.sessions), self.connections, self.received, self.delivered)
+        print("Broker: %d client(s), %d connects, %d publishes in, %d deliveries out" % stats)
+
+
+# ---------------- TLS ----------------
+def self_signed_context(certfile=None, keyfile=None):
+    """Server SSL context; makes a throwaway self-signed cert with openssl when none is given."""
+    if certfile is None:
+        tmp = tempfile.mkdtemp(prefix="me35-broker-")
+        certfile = os.path.join(tmp, "cert.pem")
+        keyfile = os.path.join(tmp, "key.pem")
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "7",
+                        "-subj", "/CN=localhost", "-keyout", keyfile, "-out", certfile],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        print("Self-signed certificate:", certfile)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(certfile, keyfile)
+    return context
+
+
+# ---------------- MAIN ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Local MQTT 3.1.1 stand-in broker for the /ME35 topics")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, help="default 1883, or 8883 with --tls")
+    parser.add_argument("--tls", action="store_true", help="serve TLS (self-signed unless --certfile is given)")
+    parser.add_argument("--certfile")
+    parser.add_argument("--keyfile")
+    parser.add_argument("--username", help="require this username (and --password)")
+    parser.add_argument("--password")
+    parser.add_argument("--stats", type=float, default=10.0, help="seconds between counter prints (0: off)")
+    parser.add_argument("--verbose", action="store_true", help="print connects and disconnects")
+    args = parser.parse_args()
+
+    context = self_signed_context(args.certfile, args.keyfile or args.certfile) if args.tls else None
+    port = args.port if args.port is not None else (8883 if args.tls else 1883)
+    broker = Broker(args.host, port, context, args.username, args.password, args.verbose)
+    broker.start()
+    print("MQTT broker listening on %s:%d%s" % (args.host, broker.port, " (TLS)" if context else ""))
+    try:
+        while True:
+            time.sleep(args.stats or 3600)
+            if args.stats:
+                broker.print_stats()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        broker.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+End-to-end latency / throughput load test for the /ME35 topics.
+
+Starts MQTTBroker in-process (or targets --host), then for each topic runs
+one publisher and one subscriber as separate MQTT clients, like the devices:
+
+- payloads come from the senders' own code paths (me35codec.Encoder calls
+  as FollowMeSender / MissionControl_Controller make them, the "GOAL" text
+  MQTT_Goal publishes);
+- the subscriber runs a host copy of the device callback on FastDecoder,
+  the same decode the ESP32s do, and counts messages it would ignore.
+
+Two phases:
+    baseline  all topics at once at their real rates, latency percentiles per topic
+    ramp      one topic at a time at rising rates; the highest rate with every
+              message delivered, the publisher keeping up and p99 under
+              --max-p99-ms is the topic's max sustainable rate
+
+Latency runs from just before the payload is encoded to the end of the
+subscriber callback. Results go to --out; --compare prints the change
+against an earlier results file, which is how protocol / batching changes
+should be judged.
+
+    python MQTTLoadTest.py
+    python MQTTLoadTest.py --wire json --out json.json --compare loadtest_results.json
+    python MQTTLoadTest.py --tls --topics /ME35/17 --rates 100 1000 5000
+"""
+import argparse
+import json
+import socket
+import ssl
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+
+from FramePipeline import percentile
+from MQTTBroker import Broker, self_signed_context
+from fastmsg import FastDecoder, FIELD_DIST, FIELD_POS, FIELD_ACCEL_X, FIELD_COLOR, FIELD_BUZZER
+from me35codec import Encoder
+
+
+# ---------------- Publisher code paths ----------------
+def followme_payload(encoder, k):
+    """FollowMeSender.publish(): a blob detection moving across the frame."""
+    data = {"center": [200 + k % 240, 233], "area": 5310 + k % 50, "width": 81, "height": 72}
+    return encoder.blob(data)
+
+
+def controller_payload(encoder, k):
+    """MissionControl_Controller: accel batches (BATCH_SIZE 10 at 20 ms), a button press every 10th message."""
+    if k % 10 == 9:
+        return encoder.color(0, 0, 225) if k % 20 == 19 else encoder.buzzer(True)
+    tilt = (k % 100) - 50
+    return encoder.accel_batch([tilt * 10, -21, 981] * 10, 20)
+
+
+def button_payload(encoder, k):
+    """Color / buzzer commands for the controller's NeoPixel and buzzer."""
+    return encoder.color(0, 0, 225) if k % 2 else encoder.buzzer(True)
+
+
+def goal_payload(encoder, k):
+    """MQTT_Goal.BallDetectorMQTT.publish_goal()."""
+    return "GOAL"
+
+
+# ---------------- Host copies of the device callbacks ----------------
+# Each returns True when the device would act on the message
+def followme_callback(decoder, msg):
+    """FollowMeeReceiver.message_callback."""
+    return bool(decoder.decode(msg) & (FIELD_DIST | FIELD_POS))
+
+
+def motor_callback(decoder, msg):
+    """MissionControl_Receiver.sub_cb."""
+    found = decoder.decode(msg)
+    return bool(found & (FIELD_ACCEL_X | FIELD_COLOR) or (found & FIELD_BUZZER and decoder.buzzer))
+
+
+def controller_callback(decoder, msg):
+    """MissionControl_Controller.sub_cb."""
+    found = decoder.decode(msg)
+    return bool(found & FIELD_COLOR or (found & FIELD_BUZZER and decoder.buzzer))
+
+
+def goal_callback(decoder, msg):
+    """Robotics_Final/Auto_ESP._mqtt_cb."""
+    try:
+        text = msg.decode().strip().upper()
+    except UnicodeError:
+        text = ""
+    return text == "GOAL"
+
+
+# topic: (publisher, subscriber callback, real rate in messages/s)
+TOPICS = {
+    "/ME35/1": (followme_payload, followme_callback, 30.0),       # camera frame rate
+    "/ME35/17": (controller_payload, motor_callback, 5.5),        # 50 Hz / 10 per batch + buttons
+    "/ME35/18": (button_payload, controller_callback, 2.0),
+    "/ME35/goal": (goal_payload, goal_callback, 1.0),
+}
+
+
+# ---------------- Clients ----------------
+def make_client(client_id, args):
+    try:
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=client_id)
+    except AttributeError:  # paho-mqtt 1.x
+        client = mqtt.Client(client_id=client_id)
+    if args.username:
+        client.username_pw_set(args.username, args.password)
+    if args.tls:
+        client.tls_set(cert_reqs=ssl.CERT_NONE)  # the stand-in's certificate is self-signed
+        client.tls_insecure_set(True)
+    return client
+
+
+class TopicRun:
+    """One publisher + one subscriber on a topic for a fixed number of messages."""
+
+    def __init__(self, topic, rate, duration, args, tag):
+        self.topic = topic
+        self.rate = rate
+        self.count = max(1, int(rate * duration))
+        self.args = args
+        self.payload, self.callback, _ = TOPICS[topic]
+        self.encoder = Encoder(args.wire)
+        self.decoder = FastDecoder()
+
+        self.sent_at = []
+        self.latencies = []
+        self.ignored = 0
+        self.done = threading.Event()
+        self.publish_elapsed = 0.0
+
+        self.subscribed = threading.Event()
+        self.pub_connected = threading.Event()
+        self.sub = make_client("load-sub-%s%s" % (tag, topic), args)
+        self.sub.on_message = self._on_message
+        self.sub.on_subscribe = lambda *a: self.subscribed.set()
+        self.pub = make_client("load-pub-%s%s" % (tag, topic), args)
+        self.pub.on_connect = lambda *a: self.pub_connected.set()
+
+    def connect(self):
+        for client in (self.sub, self.pub):
+            client.connect(self.args.host, self.args.port, 60)
+            # Without this Nagle holds back the 2nd small publish until the 1st is ACKed (~40 ms)
+            client.socket().setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client.loop_start()
+        self.sub.subscribe(self.topic)
+        # Publishing before CONNACK only queues in paho; that would show up as latency
+        if not (self.subscribed.wait(5) and self.pub_connected.wait(5)):
+            raise RuntimeError("no SUBACK / CONNACK for %s" % self.topic)
+
+    def _on_message(self, client, userdata, message):
+        handled = self.callback(self.decoder, message.payload)
+        now = time.perf_counter()
+        index = len(self.latencies)
+        if index < len(self.sent_at):
+            self.latencies.append(now - self.sent_at[index])
+        if not handled:
+            self.ignored += 1
+        if len(self.latencies) >= self.count:
+            self.done.set()
+
+    def publish(self):
+        """Publish self.count messages paced at self.rate (catching up, never bursting ahead)."""
+        start = time.perf_counter()
+        for k in range(self.count):
+            due = start + k / self.rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self.sent_at.append(time.perf_counter())
+            self.pub.publish(self.topic, self.payload(self.encoder, k))
+        self.publish_elapsed = time.perf_counter() - start
+
+    def finish(self, grace):
+        self.done.wait(grace)
+        for client in (self.pub, self.sub):
+            client.loop_stop()
+            client.disconnect()
+
+    def result(self):
+        values = sorted(self.latencies)
+        achieved = self.rate
+        if self.count > 1 and self.publish_elapsed:
+            achieved = min(self.rate, (self.count - 1) / self.publish_elapsed)
+        return {
+            "topic": self.topic,
+            "offered_hz": self.rate,
+            "published_hz": achieved,
+            "sent": self.count,
+            "delivered": len(values),
+            "ignored": self.ignored,
+            "p50_ms": 1000 * percentile(values, 50),
+            "p95_ms": 1000 * percentile(values, 95),
+            "p99_ms": 1000 * percentile(values, 99),
+            "max_ms": 1000 * values[-1] if values else 0.0,
+        }
+
+
+def run_topics(topics, rates, duration, args, tag):
+    """Run the given topics concurrently; returns one result dict per topic."""
+    runs = [TopicRun(topic, rate, duration, args, tag) for topic, rate in zip(topics, rates)]
+    for run in runs:
+        run.connect()
+    threads = [threading.Thread(target=run.publish, daemon=True) for run in runs]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for run in runs:
+        run.finish(args.grace)
+    return [run.result() for run in runs]
+
+
+def sustainable(result, max_p99_ms):
+    return (result["delivered"] == result["sent"]
+            and result["published_hz"] >= 0.95 * result["offered_hz"]
+            and result["p99_ms"] <= max_p99_ms)
+
+
+# ---------------- Report ----------------
+def print_row(r, mark=""):
+    print("%-11s %9.1f %9.1f %7d %7d %7d %8.2f %8.2f %8.2f %8.2f %s"
+          % (r["topic"], r["offered_hz"], r["published_hz"], r["sent"], r["delivered"], r["ignored"],
+             r["p50_ms"], r["p95_ms"], r["p99_ms"], r["max_ms"], mark))
+
+
+def print_header():
+    print("%-11s %9s %9s %7s %7s %7s %8s %8s %8s %8s"
+          % ("topic", "offer/s", "pub/s", "sent", "recv", "ignored", "p50 ms", "p95 ms", "p99 ms", "max ms"))
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        old = json.load(f)
+    print("\n---------------- Compared with %s ----------------" % baseline_path)
+    old_base = {r["topic"]: r for r in old.get("baseline", [])}
+    for r in results["baseline"]:
+        o = old_base.get(r["topic"])
+        if o is None:
+            print("%-11s no baseline" % r["topic"])
+            continue
+        print("%-11s p50 %.2f -> %.2f ms  p99 %.2f -> %.2f ms  max %.2f -> %.2f ms"
+              % (r["topic"], o["p50_ms"], r["p50_ms"], o["p99_ms"], r["p99_ms"], o["max_ms"], r["max_ms"]))
+    old_max = old.get("max_rate_hz", {})
+    for topic, rate in results["max_rate_hz"].items():
+        if topic in old_max:
+            print("%-11s max sustainable %.0f -> %.0f msg/s" % (topic, old_max[topic], rate))
+
+
+# ---------------- MAIN ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Latency / throughput load test for the /ME35 MQTT topics")
+    parser.add_argument("--host", help="use this broker instead of starting MQTTBroker in-process")
+    parser.add_argument("--port", type=int, help="broker port (default 1883, 8883 with --tls)")
+    parser.add_argument("--tls", action="store_true", help="TLS (in-process broker uses a self-signed cert)")
+    parser.add_argument("--username")
+    parser.add_argument("--password")
+    parser.add_argument("--wire", choices=["binary", "json"], default="binary", help="payload format of the publishers")
+    parser.add_argument("--topics", nargs="+", default=sorted(TOPICS), choices=sorted(TOPICS))
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of the baseline phase")
+    parser.add_argument("--rates", nargs="+", type=float, default=[50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000],
+                        help="ramp phase rates in messages/s")
+    parser.add_argument("--step", type=float, default=2.0, help="seconds per ramp rate")
+    parser.add_argument("--max-p99-ms", type=float, default=50.0, help="ramp: p99 latency limit")
+    parser.add_argument("--grace", type=float, default=2.0, help="seconds to wait for stragglers after publishing")
+    parser.add_argument("--no-ramp", action="store_true", help="baseline phase only")
+    parser.add_argument("--out", default="loadtest_results.json")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    args = parser.parse_args()
+
+    broker = None
+    if args.port is None:
+        args.port = 8883 if args.tls else 1883
+    if args.host is None:
+        context = self_signed_context() if args.tls else None
+        broker = Broker("127.0.0.1", 0, context)
+        args.port = broker.start()
+        args.host = "127.0.0.1"
+    print("Broker %s:%d%s, %s payloads" % (args.host, args.port, " (TLS)" if args.tls else "", args.wire))
+
+    results = {"created": time.strftime("%Y-%m-%d %H:%M:%S"), "options": vars(args).copy(),
+               "baseline": [], "ramp": {}, "max_rate_hz": {}}
+    try:
+        print("\n---------------- Baseline: all topics at their real rates for %.0f s ----------------" % args.duration)
+        print_header()
+        results["baseline"] = run_topics(args.topics, [TOPICS[t][2] for t in args.topics],
+                                         args.duration, args, "base")
+        for r in results["baseline"]:
+            print_row(r)
+
+        if not args.no_ramp:
+            print("\n---------------- Ramp: one topic at a time, %.0f s per rate ----------------" % args.step)
+            print_header()
+            for topic in args.topics:
+                best = 0.0
+                steps = []
+                for rate in args.rates:
+                    r = run_topics([topic], [rate], args.step, args, "ramp%d" % rate)[0]
+                    steps.append(r)
+                    ok = sustainable(r, args.max_p99_ms)
+                    print_row(r, "" if ok else "<- not sustained")
+                    if not ok:
+                        break
+                    best = rate
+                results["ramp"][topic] = steps
+                results["max_rate_hz"][topic] = best
+            print()
+            for topic, rate in results["max_rate_hz"].items():
+                if not rate:
+                    text = "below %.0f msg/s" % args.rates[0]
+                elif rate == args.rates[-1]:
+                    text = ">= %.0f msg/s (every rate passed; add higher --rates)" % rate
+                else:
+                    text = "%.0f msg/s" % rate
+                print("%-11s max sustainable rate: %s" % (topic, text))
+    finally:
+        if broker is not None:
+            broker.print_stats()
+            broker.stop()
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=1)
+    print("Results written to", args.out)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
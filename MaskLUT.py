@@ -0,0 +1,202 @@
+import argparse
+import hashlib
+import os
+import time
+
+import cv2
+import numpy as np
+
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "me35_lut")
+
+
+# ---------------- Table construction ----------------
+def exact_mask_table(lower, upper):
+    """inRange(cvtColor(BGR2HSV)) evaluated once for all 2^24 BGR colors, indexed b | g<<8 | r<<16."""
+    codes = np.arange(1 << 24, dtype=np.uint32)
+    bgr = np.empty((1 << 24, 3), np.uint8)
+    bgr[:, 0] = codes & 0xFF
+    bgr[:, 1] = (codes >> 8) & 0xFF
+    bgr[:, 2] = codes >> 16
+    hsv = cv2.cvtColor(bgr.reshape(4096, 4096, 3), cv2.COLOR_BGR2HSV)
+    return cv2.inRange(hsv, np.asarray(lower), np.asarray(upper)).reshape(-1)
+
+
+def quantize_table(exact, bits):
+    """Collapse the exact table to 2^bits levels per channel (majority vote per bin)."""
+    if bits == 8:
+        return exact.copy()
+    n, step = 1 << bits, 1 << (8 - bits)
+    # Index layout is r (slowest), g, b (fastest)
+    cube = exact.reshape(n, step, n, step, n, step)
+    votes = cube.mean(axis=(1, 3, 5), dtype=np.float32)
+    return np.where(votes >= 127.5, 255, 0).astype(np.uint8).reshape(-1)
+
+
+def sparse_table(table, bits):
+    """
+    Lay a quantized table out so it can be indexed directly by a packed BGRA word.
+
+    After each channel is shifted down to `bits` bits the word b | g<<8 | r<<16
+    ranges over 2^bits * 65536 entries, but only the first 2^bits bytes of each
+    256-byte row are used, so the rows a frame touches stay cache friendly.
+    """
+    n = 1 << bits
+    out = np.zeros((n, 256, 256), np.uint8)
+    out[:, :n, :n] = table.reshape(n, n, n)
+    return out.reshape(-1)
+
+
+def mixed_bins(exact, bits):
+    """Boolean table (quantized index) marking bins whose colors fall on both sides of the bounds."""
+    n, step = 1 << bits, 1 << (8 - bits)
+    cube = exact.reshape(n, step, n, step, n, step)
+    return (cube.min(axis=(1, 3, 5)) != cube.max(axis=(1, 3, 5))).reshape(-1)
+
+
+# ---------------- Mask engine ----------------
+class HsvMaskLUT:
+    """
+    Drop-in replacement for cv2.inRange(cv2.cvtColor(frame, COLOR_BGR2HSV), lower, upper).
+
+    The answer for every (quantized) BGR color is computed once with OpenCV and
+    cached on disk keyed by the bounds. Each frame then costs a BGR->BGRA copy,
+    a per-channel cv2.LUT that quantizes the color and clears alpha, and a
+    single table gather.
+    """
+
+    def __init__(self, lower, upper, bits=6, cache_dir=CACHE_DIR):
+        if not 1 <= bits <= 8:
+            raise ValueError("bits must be between 1 and 8")
+        self.lower = [int(v) for v in lower]
+        self.upper = [int(v) for v in upper]
+        self.bits = bits
+        self.cache_dir = cache_dir
+        self.table = sparse_table(self._load_or_build(), bits)
+        # Per-channel quantizer applied to BGRA: b, g, r >> (8 - bits), alpha -> 0
+        self.quantizer = np.zeros((1, 256, 4), np.uint8)
+        for channel in range(3):
+            self.quantizer[0, :, channel] = np.arange(256) >> (8 - bits)
+
+    def cache_key(self):
+        raw = "bgr2hsv|%s|%s|%d|cv%s" % (self.lower, self.upper, self.bits, cv2.__version__)
+        return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+    def cache_path(self):
+        return os.path.join(self.cache_dir, "hsv_lut_%s.npy" % self.cache_key())
+
+    def _load_or_build(self):
+        path = self.cache_path() if self.cache_dir else None
+        if path and os.path.exists(path):
+            try:
+                table = np.load(path)
+                if table.shape == (1 << (3 * self.bits),):
+                    return table
+            except (OSError, ValueError):
+                pass  # corrupt cache file, rebuild it
+        table = quantize_table(exact_mask_table(self.lower, self.upper), self.bits)
+        if path:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = path + ".tmp.npy"
+            np.save(tmp, table)
+            os.replace(tmp, path)
+        return table
+
+    def mask(self, frame):
+        """Binary mask (uint8 0/255) for a BGR uint8 frame."""
+        bgra = cv2.LUT(cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA), self.quantizer)
+        # Little-endian view of each pixel: b | g<<8 | r<<16 (alpha is now 0)
+        return self.table.take(bgra.view(np.uint32).reshape(frame.shape[:2]))
+
+
+# ---------------- Benchmark + agreement check ----------------
+def reference_mask(frame, lower, upper):
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    return cv2.inRange(hsv, np.asarray(lower), np.asarray(upper))
+
+
+def check_agreement(lut, frame, exact=None):
+    """
+    Compare the LUT mask with the cvtColor+inRange mask.
+
+    Returns (mismatch_fraction, unexplained) where unexplained counts mismatching
+    pixels whose quantization bin is NOT split by the HSV bounds - that number
+    must be 0; everything else is quantization error.
+    """
+    if exact is None:
+        exact = exact_mask_table(lut.lower, lut.upper)
+    ref = reference_mask(frame, lut.lower, lut.upper)
+    got = lut.mask(frame)
+    diff = ref != got
+    mismatches = int(diff.sum())
+    if mismatches == 0 or lut.bits == 8:
+        return mismatches / diff.size, mismatches
+    shift = 8 - lut.bits
+    px = frame[diff].astype(np.uint32) >> shift
+    bins = (px[:, 2] << (2 * lut.bits)) | (px[:, 1] << lut.bits) | px[:, 0]
+    unexplained = int((~mixed_bins(exact, lut.bits)[bins]).sum())
+    return mismatches / diff.size, unexplained
+
+
+def time_ms(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def synthetic_frame(width, height, seed=0):
+    """Smooth color gradients plus noise and a few saturated blobs - roughly camera-like."""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (9, 16, 3), dtype=np.uint8)
+    frame = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    frame = cv2.add(frame, rng.integers(0, 24, frame.shape, dtype=np.uint8))
+    for _ in range(6):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        cv2.circle(frame, center, int(min(width, height) * 0.08), color, -1)
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HsvMaskLUT against cvtColor+inRange")
+    parser.add_argument("--video", help="take the test frame from this video instead of a synthetic one")
+    parser.add_argument("--bits", type=int, nargs="+", default=[5, 6, 8])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    # Bounds used by FollowMeSender.py and Robotics_Final/MQTT_Goal.py
+    bounds = {
+        "FollowMe green": ([40, 100, 50], [85, 255, 255]),
+        "Goal ball": ([66, 60, 150], [76, 155, 230]),
+    }
+    resolutions = [(320, 240), (640, 480), (1280, 720), (1920, 1080)]
+
+    base = None
+    if args.video:
+        ret, base = cv2.VideoCapture(args.video).read()
+        if not ret:
+            print("Could not read", args.video)
+            return
+
+    for name, (lower, upper) in bounds.items():
+        print("\n== %s  lower=%s upper=%s ==" % (name, lower, upper))
+        exact = exact_mask_table(lower, upper)
+        for bits in args.bits:
+            t0 = time.perf_counter()
+            lut = HsvMaskLUT(lower, upper, bits=bits)
+            load_ms = (time.perf_counter() - t0) * 1000
+            print("bits=%d  table load/build %.0f ms (%s)" % (bits, load_ms, lut.cache_path()))
+            print("  %-10s %12s %10s %8s %10s %12s"
+                  % ("size", "cv2 ms", "lut ms", "speedup", "mismatch", "unexplained"))
+            for w, h in resolutions:
+                frame = cv2.resize(base, (w, h)) if base is not None else synthetic_frame(w, h)
+                ref_ms = time_ms(lambda: reference_mask(frame, lower, upper), args.repeat)
+                lut_ms = time_ms(lambda: lut.mask(frame), args.repeat)
+                frac, unexplained = check_agreement(lut, frame, exact)
+                print("  %-10s %12.3f %10.3f %7.2fx %9.4f%% %12d"
+                      % ("%dx%d" % (w, h), ref_ms, lut_ms, ref_ms / lut_ms, 100 * frac, unexplained))
+
+
+if __name__ == "__main__":
+    main()
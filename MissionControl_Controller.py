@@ -1,26 +1,125 @@
-import network
 import time
-import json
-from umqtt.simple import MQTTClient
+from array import array
 from machine import Pin, PWM
 import neopixel
 import secrets
+from effects import EffectScheduler, Effects
+from fastmsg import FastDecoder, FIELD_COLOR, FIELD_BUZZER, mem_report
+from me35codec import Encoder, MAX_BATCH
+from mqttconn import MQTTConnection
+import micropython
 from lis3dh import H3LIS331DL  # your accelerometer class file
 
+# Accelerometer sampling / publishing
+SAMPLE_HZ = 50            # accelerometer read rate
+BATCH_SIZE = 10           # "batch" mode: samples per message (50 Hz / 10 = 5 messages/s)
+PUBLISH_MODE = "batch"    # "batch": every BATCH_SIZE samples | "change": only when the tilt moves
+CHANGE_THRESHOLD_G = 0.05 # "change" mode: publish when any axis moved this much since the last message
+CHANGE_MIN_MS = 50        # "change" mode: at most 20 messages/s
+HEARTBEAT_MS = 1000       # "change" mode: resend the latest samples this often even when still
+
+# Button events
+EVENT_LED = 0
+EVENT_BUZZER = 1
+EVENT_CAPACITY = 16       # presses buffered between two main-loop drains
+DEBOUNCE_MS = 200         # presses of the same button closer than this are bounce
+STATS_MS = 10000          # event / sampler statistics print interval
+
+micropython.alloc_emergency_exception_buf(100)  # lets an exception inside an IRQ be reported
+
+
+class AccelRing:
+    """Preallocated ring of the newest (x, y, z) samples in milli-g."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buf = array('h', [0] * (3 * capacity))
+        self.head = 0  # next slot to write
+        self.count = 0
+        self.overwritten = 0
+
+    def push(self, x, y, z):
+        i = 3 * self.head
+        self.buf[i] = max(-32768, min(32767, int(x * 1000)))
+        self.buf[i + 1] = max(-32768, min(32767, int(y * 1000)))
+        self.buf[i + 2] = max(-32768, min(32767, int(z * 1000)))
+        self.head = (self.head + 1) % self.capacity
+        if self.count == self.capacity:
+            self.overwritten += 1
+        else:
+            self.count += 1
+
+    def newest(self, axis):
+        return self.buf[3 * ((self.head - 1) % self.capacity) + axis]
+
+    def take(self):
+        """Return the buffered samples flat and oldest first, and empty the ring."""
+        out = []
+        start = (self.head - self.count) % self.capacity
+        for k in range(self.count):
+            i = 3 * ((start + k) % self.capacity)
+            out.append(self.buf[i])
+            out.append(self.buf[i + 1])
+            out.append(self.buf[i + 2])
+        self.count = 0
+        return out
+
+
+class EventRing:
+    """
+    Fixed-size queue of (event, ticks_us, ticks_ms) written from pin IRQs, read by the main loop.
+
+    push() only stores small ints into preallocated arrays, so it is safe in
+    interrupt context. Only the IRQ moves head and only the main loop moves
+    tail; a full ring drops the new event and counts it.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.kind = array('B', [0] * capacity)
+        self.stamp = array('i', [0] * capacity)
+        self.stamp_ms = array('i', [0] * capacity)
+        self.head = 0
+        self.tail = 0
+        self.dropped = 0
+
+    def push(self, kind, stamp, stamp_ms):
+        nxt = (self.head + 1) % self.capacity
+        if nxt == self.tail:
+            self.dropped += 1
+            return
+        self.kind[self.head] = kind
+        self.stamp[self.head] = stamp
+        self.stamp_ms[self.head] = stamp_ms
+        self.head = nxt
+
+    def pending(self):
+        return self.head != self.tail
+
+    def pop_into(self, out):
+        """Move the oldest event into out[0], out[1], out[2] (kind, ticks_us, ticks_ms)."""
+        out[0] = self.kind[self.tail]
+        out[1] = self.stamp[self.tail]
+        out[2] = self.stamp_ms[self.tail]
+        self.tail = (self.tail + 1) % self.capacity
+
+
 class MQTTDevice:
     def __init__(self):
-        # Wi-Fi credentials
-        self.SSID = secrets.SSID
-        self.PASSWORD = secrets.PWD
-
         # MQTT config
-        self.MQTT_BROKER = secrets.mqtt_url
         self.MQTT_PORT = 8883
-        self.MQTT_USERNAME = secrets.mqtt_username
-        self.MQTT_PASSWORD = secrets.mqtt_password
         self.CLIENT_ID = "Liam_2"
         self.TOPIC_PUB = "/ME35/17"
         self.TOPIC_SUB = "/ME35/18"
+        self.mqtt = MQTTConnection(
+            self.CLIENT_ID, secrets.mqtt_url, port=self.MQTT_PORT,
+            user=secrets.mqtt_username, password=secrets.mqtt_password,
+            ssid=secrets.SSID, wifi_password=secrets.PWD, callback=self.sub_cb)
+        self.mqtt.subscribe(self.TOPIC_SUB)
+        self.VERBOSE = False  # per-message prints allocate on every message; debug only
+        self.decoder = FastDecoder()
+        self.WIRE_FORMAT = "binary"  # "json" for receivers without me35codec
+        self.encoder = Encoder(self.WIRE_FORMAT)
 
         # Hardware setup
         self.button_led = Pin(35, Pin.IN, Pin.PULL_UP)
@@ -29,122 +128,201 @@ class MQTTDevice:
         self.buzzer.duty(0)
         self.buzzer.freq(1000)
         self.np = neopixel.NeoPixel(Pin(15), 2)
+        self.scheduler = EffectScheduler()
+        self.effects = Effects(self.scheduler, self.np, self.buzzer)
 
-        # Debounce tracking
-        self.last_press_btn1 = 0
-        self.last_press_btn2 = 0
+        # Button events: IRQs queue them, drain_events() debounces and publishes
+        self.events = EventRing(EVENT_CAPACITY)
+        self.event = [0, 0, 0]
+        # ticks_ms of the last accepted press per event kind; ticks_us wraps every ~18 min,
+        # so it is only used for latency
+        self.last_accepted = [None, None]
+        self.events_published = 0
+        self.events_debounced = 0
+        self.latency_max_us = 0
+        self.latency_total_us = 0
+        self.next_stats = time.ticks_add(time.ticks_ms(), STATS_MS)
 
         # Initialize accelerometer
         print("Initializing accelerometer...")
         self.accel = H3LIS331DL(sda_pin=21, scl_pin=22)
         print("Accelerometer ready!")
 
+        # Accelerometer sampler
+        self.sample_period_ms = 1000 // SAMPLE_HZ
+        # Room for every sample between two messages: a batch, or a whole heartbeat in "change" mode
+        # (MAX_BATCH caps it; should_publish() sends early if the ring still fills up)
+        per_message = BATCH_SIZE if PUBLISH_MODE == "batch" else HEARTBEAT_MS * SAMPLE_HZ // 1000
+        self.ring = AccelRing(min(MAX_BATCH, max(2 * per_message, 1)))
+        self.next_sample = time.ticks_ms()
+        self.last_publish = time.ticks_ms()
+        self.last_sent = [0, 0, 0]  # milli-g of the newest sample in the last message
+        self.samples_read = 0
+        self.sample_overruns = 0
+        self.messages_sent = 0
+
         # Button interrupts
         self.button_led.irq(trigger=Pin.IRQ_RISING, handler=self.button_led_pressed)
         self.button_buzzer.irq(trigger=Pin.IRQ_RISING, handler=self.button_buzzer_pressed)
 
-    # ---------- Button Handlers ----------
+    # ---------- Button Handlers (IRQ context: record only) ----------
     def button_led_pressed(self, pin):
-        now = time.ticks_ms()
-        if time.ticks_diff(now, self.last_press_btn1) < 200:
-            return
-        self.last_press_btn1 = now
-
-        msg = b'{"color":[0,0,225]}'
-        self.client.publish(self.TOPIC_PUB, msg)
-        print("Button 1 pressed → sent LED color message")
+        self.events.push(EVENT_LED, time.ticks_us(), time.ticks_ms())
 
     def button_buzzer_pressed(self, pin):
-        now = time.ticks_ms()
-        if time.ticks_diff(now, self.last_press_btn2) < 200:
+        self.events.push(EVENT_BUZZER, time.ticks_us(), time.ticks_ms())
+
+    # ---------- Button Events (main loop) ----------
+    def drain_events(self):
+        """Debounce everything the IRQs queued, then publish one message per button that fired."""
+        if not self.events.pending():
             return
-        self.last_press_btn2 = now
+        wanted_led = False
+        wanted_buzzer = False
+        oldest = [0, 0]  # ticks_us of the first accepted press per kind, for latency
+        event = self.event
+        while self.events.pending():
+            self.events.pop_into(event)
+            kind, stamp = event[0], event[1]
+            last = self.last_accepted[kind]
+            # A negative difference means the clock wrapped past the last press: long ago, not bounce
+            if last is not None and 0 <= time.ticks_diff(event[2], last) < DEBOUNCE_MS:
+                self.events_debounced += 1
+                continue
+            self.last_accepted[kind] = event[2]
+            if kind == EVENT_LED:
+                if not wanted_led:
+                    oldest[EVENT_LED] = stamp
+                wanted_led = True
+            else:
+                if not wanted_buzzer:
+                    oldest[EVENT_BUZZER] = stamp
+                wanted_buzzer = True
+
+        if wanted_led:
+            self.mqtt.publish(self.TOPIC_PUB, self.encoder.color(0, 0, 225))
+            self._event_published(oldest[EVENT_LED])
+            if self.VERBOSE:
+                print("Button 1 pressed → sent LED color message")
+        if wanted_buzzer:
+            self.mqtt.publish(self.TOPIC_PUB, self.encoder.buzzer(True))
+            self._event_published(oldest[EVENT_BUZZER])
+            if self.VERBOSE:
+                print("Button 2 pressed → sent buzzer message")
+
+    def _event_published(self, stamp):
+        latency = time.ticks_diff(time.ticks_us(), stamp)
+        self.events_published += 1
+        self.latency_total_us += latency
+        if latency > self.latency_max_us:
+            self.latency_max_us = latency
 
-        msg = b'{"Buzzer":true}'
-        self.client.publish(self.TOPIC_PUB, msg)
-        print("Button 2 pressed → sent buzzer message")
+    def print_stats(self):
+        avg = self.latency_total_us // self.events_published if self.events_published else 0
+        print("Buttons: %d published, %d debounced, %d dropped | IRQ->publish avg %d us max %d us"
+              % (self.events_published, self.events_debounced, self.events.dropped, avg, self.latency_max_us))
+        print("Accel: %d samples, %d overruns, %d messages" % (self.samples_read, self.sample_overruns, self.messages_sent))
+        self.mqtt.print_metrics()
+
+    def poll_stats(self):
+        if time.ticks_diff(time.ticks_ms(), self.next_stats) >= 0:
+            self.print_stats()
+            self.next_stats = time.ticks_add(self.next_stats, STATS_MS)
 
     # ---------- MQTT Callback ----------
     def sub_cb(self, topic, msg):
-        print(f"Message received on {topic.decode()}: {msg.decode()}")
-        try:
-            data = json.loads(msg)
-            if "color" in data:
-                color = data["color"]
-                self.np[0] = color
-                self.np.write()
-                print(f"LED color updated to {color}")
-            if "Buzzer" in data and data["Buzzer"]:
+        found = self.decoder.decode(msg)
+        if self.VERBOSE:
+            print("Message received on", topic, msg)
+        if found & FIELD_COLOR:
+            self.np[0] = self.decoder.color
+            self.np.write()
+            if self.VERBOSE:
+                print("LED color updated to", self.decoder.color)
+        if found & FIELD_BUZZER and self.decoder.buzzer:
+            if self.VERBOSE:
                 print("Activating buzzer...")
-                self.buzzer.duty(512)
-                time.sleep(0.5)
-                self.buzzer.duty(0)
-                print("Buzzer off")
-        except Exception as e:
-            print("Error handling message:", e)
-
-    # ---------- Connection Methods ----------
-    def connect_wifi(self):
-        wlan = network.WLAN(network.STA_IF)
-        wlan.active(True)
-        if not wlan.isconnected():
-            print("Connecting to WiFi...")
-            wlan.connect(self.SSID, self.PASSWORD)
-            timeout = 10
-            while not wlan.isconnected() and timeout > 0:
-                time.sleep(1)
-                timeout -= 1
-        if wlan.isconnected():
-            print("WiFi Connected! IP:", wlan.ifconfig()[0])
-            return True
-        else:
-            print("WiFi connection failed!")
-            return False
+            self.effects.beep(500)
 
-    def mqtt_connect(self):
+    # ---------- Accelerometer Sampling + Publishing ----------
+    def sample_accel(self):
+        """Read the accelerometer into the ring when the next sample is due; returns True if it did."""
+        now = time.ticks_ms()
+        late = time.ticks_diff(now, self.next_sample)
+        if late < 0:
+            return False
+        if late >= self.sample_period_ms:
+            self.sample_overruns += 1
+            self.next_sample = time.ticks_add(now, self.sample_period_ms)
+        else:
+            self.next_sample = time.ticks_add(self.next_sample, self.sample_period_ms)
         try:
-            self.client = MQTTClient(
-                client_id=self.CLIENT_ID,
-                server=self.MQTT_BROKER,
-                port=self.MQTT_PORT,
-                user=self.MQTT_USERNAME,
-                password=self.MQTT_PASSWORD,
-                ssl=True,
-                ssl_params={'server_hostname': self.MQTT_BROKER}
-            )
-            self.client.set_callback(self.sub_cb)
-            self.client.connect()
-            print("MQTT Connected successfully!")
-            self.client.subscribe(self.TOPIC_SUB)
-            print(f"Subscribed to topic: {self.TOPIC_SUB}")
-            return self.client
+            data = self.accel.read_accl_g()
         except Exception as e:
-            print("MQTT Connection failed:", e)
-            return None
+            print("Error reading accelerometer:", e)
+            return False
+        self.ring.push(data["x"], data["y"], data["z"])
+        self.samples_read += 1
+        return True
+
+    def should_publish(self):
+        if self.ring.count == 0:
+            return False
+        if self.ring.count == self.ring.capacity:
+            return True  # the next sample would overwrite one that was never sent
+        if PUBLISH_MODE == "batch":
+            return self.ring.count >= BATCH_SIZE
+        since = time.ticks_diff(time.ticks_ms(), self.last_publish)
+        if since >= HEARTBEAT_MS:
+            return True
+        if since < CHANGE_MIN_MS:
+            return False
+        threshold = int(CHANGE_THRESHOLD_G * 1000)
+        for axis in range(3):
+            if abs(self.ring.newest(axis) - self.last_sent[axis]) > threshold:
+                return True
+        return False
 
-    # ---------- Accelerometer Publishing Loop ----------
     def send_accel_data(self):
+        """Publish everything buffered since the last message as one batch."""
+        for axis in range(3):
+            self.last_sent[axis] = self.ring.newest(axis)
+        samples = self.ring.take()
         try:
-            data = self.accel.read_accl_g()
-            msg = json.dumps({"accel": data})
-            self.client.publish(self.TOPIC_PUB, msg)
-            print("Accel data sent:", msg)
+            msg = self.encoder.accel_batch(samples, self.sample_period_ms)
+            self.mqtt.publish(self.TOPIC_PUB, msg)
+            self.messages_sent += 1
+            if self.VERBOSE:
+                print("Accel batch sent:", len(samples) // 3, "samples")
         except Exception as e:
-            print("Error reading/publishing accelerometer:", e)
+            print("Error publishing accelerometer:", e)
+        self.last_publish = time.ticks_ms()
+
+    def poll_accel(self):
+        if self.sample_accel() and self.should_publish():
+            self.send_accel_data()
+
+    # ---------- Main Loop ----------
+    def step(self):
+        """One main-loop iteration."""
+        self.mqtt.poll()  # (re)connects in the background, sends queued messages
+        self.mqtt.check_msg()  # handle incoming messages
+        self.drain_events()  # publish button presses queued by the IRQs
+        self.poll_accel()  # sample at SAMPLE_HZ, publish batches / changes
+        self.scheduler.poll()  # buzzer off steps
+        self.poll_stats()
+        time.sleep_ms(1)
 
 
 # ---------- MAIN ----------
-mqtt_obj = MQTTDevice()
-
-if mqtt_obj.connect_wifi():
-    client = mqtt_obj.mqtt_connect()
-
-# Continuous loop
-while True:
-    try:
-        client.check_msg()  # handle incoming messages
-        mqtt_obj.send_accel_data()  # publish accelerometer data
-        time.sleep(0.5)  # adjust frequency (5 Hz)
-    except Exception as e:
-        print("Error in main loop:", e)
-        time.sleep(1)
+if __name__ == "__main__":
+    mqtt_obj = MQTTDevice()
+    mem_report("Startup")
+
+    # Continuous loop
+    while True:
+        try:
+            mqtt_obj.step()
+        except Exception as e:
+            print("Error in main loop:", e)
+            time.sleep(1)
@@ -1,30 +1,46 @@
-import network
 import time
-import json
-from umqtt.simple import MQTTClient
 from machine import Pin, PWM
 import neopixel
 import secrets
+from effects import EffectScheduler, Effects
+from fastmsg import FastDecoder, FIELD_ACCEL_X, FIELD_COLOR, FIELD_BUZZER, mem_report
+from mqttconn import MQTTConnection
+
+
+MAX_DRAIN = 32    # messages handled per main-loop tick at most
+STATS_MS = 10000  # message counter print interval
 
 
 class MotorReceiver:
     def __init__(self):
         # Wi-Fi & MQTT configuration
-        self.SSID = secrets.SSID
-        self.PASSWORD = secrets.PWD
-        self.MQTT_BROKER = secrets.mqtt_url
         self.MQTT_PORT = 8883
-        self.MQTT_USERNAME = secrets.mqtt_username
-        self.MQTT_PASSWORD = secrets.mqtt_password
         self.CLIENT_ID = "ESP32_MotorReceiver"
         self.TOPIC_SUB = "/ME35/17"  # listens for accelerometer and control messages
         self.TOPIC_PUB = "/ME35/18"  # can respond with status or debug info
+        self.VERBOSE = False  # per-message prints allocate on every message; debug only
+        self.decoder = FastDecoder()
+        self.mqtt = MQTTConnection(
+            self.CLIENT_ID, secrets.mqtt_url, port=self.MQTT_PORT,
+            user=secrets.mqtt_username, password=secrets.mqtt_password,
+            ssid=secrets.SSID, wifi_password=secrets.PWD, callback=self.sub_cb)
+        self.mqtt.subscribe(self.TOPIC_SUB)
+
+        # Tilt commands are coalesced: the callback keeps only the newest, drain() applies it once
+        self.pending_tilt = False
+        self.tilt_x = 0.0
+        self.received = 0
+        self.coalesced = 0
+        self.applied = 0
+        self.next_stats = time.ticks_add(time.ticks_ms(), STATS_MS)
 
         # NeoPixel and buzzer
         self.np = neopixel.NeoPixel(Pin(15), 2)
         self.buzzer = PWM(Pin(23, Pin.OUT))
         self.buzzer.duty(0)
         self.buzzer.freq(1000)
+        self.scheduler = EffectScheduler()
+        self.effects = Effects(self.scheduler, self.np, self.buzzer)
 
         # Motor PWM frequency and current limiting
         self.MAX_DUTY = 300  # limit PWM output to reduce current draw
@@ -71,90 +87,83 @@ class MotorReceiver:
 
         self.set_motor('A', raw_speed)
         self.set_motor('B', raw_speed)
-        print(f"Motors set with x={x_val:.2f} → speed={raw_speed}")
+        if self.VERBOSE:
+            print(f"Motors set with x={x_val:.2f} → speed={raw_speed}")
 
     # ---------- MQTT CALLBACK ----------
     def sub_cb(self, topic, msg):
-        try:
-            message = msg.decode()
-            data = json.loads(message)
-            print(f"Received on {topic.decode()}: {message}")
-
-            # --- Check for accelerometer data ---
-            if "accel" in data:
-                x = data["accel"]["x"]
-                self.drive_from_tilt(x)
-
-            # --- LED flash command ---
-            if "color" in data:
-                color = data["color"]
-                self.np[0] = color
-                self.np.write()
-                print(f"LED color updated to {color}")
-                time.sleep(0.5)  # flash duration
-                self.np[0] = [0, 0, 0]
-                self.np.write()
-
-            # --- Optional buzzer command ---
-            if "Buzzer" in data and data["Buzzer"]:
+        self.received += 1
+        found = self.decoder.decode(msg)
+        if self.VERBOSE:
+            print("Received on", topic, msg)
+        if not found:
+            print("Unrecognized message:", msg)
+            return
+
+        # --- Check for accelerometer data (a batch decodes to its newest sample) ---
+        # Only remembered here; drain() drives from the newest one after the backlog is read
+        if found & FIELD_ACCEL_X:
+            if self.pending_tilt:
+                self.coalesced += 1
+            self.tilt_x = self.decoder.accel_x
+            self.pending_tilt = True
+
+        # One-shot commands are applied as they arrive, exactly once each
+        # --- LED flash command (turned off later by the scheduler) ---
+        if found & FIELD_COLOR:
+            self.applied += 1
+            self.effects.flash(self.decoder.color, 500)  # flash duration
+            if self.VERBOSE:
+                print("LED color updated to", self.decoder.color)
+
+        # --- Optional buzzer command ---
+        if found & FIELD_BUZZER and self.decoder.buzzer:
+            self.applied += 1
+            if self.VERBOSE:
                 print("Activating buzzer...")
-                self.buzzer.duty(512)
-                time.sleep(0.5)
-                self.buzzer.duty(0)
+            self.effects.beep(500)
+
+    def drain(self):
+        """
+        Read every queued message (up to MAX_DRAIN), then apply the newest tilt once.
+
+        umqtt's check_msg() returns None either way, so the callback's
+        received counter tells us whether it actually delivered a message.
+        """
+        for _ in range(MAX_DRAIN):
+            before = self.received
+            if not self.mqtt.check_msg() or self.received == before:
+                break
+        if self.pending_tilt:
+            self.pending_tilt = False
+            self.applied += 1
+            self.drive_from_tilt(self.tilt_x)
+
+    def poll_stats(self):
+        if time.ticks_diff(time.ticks_ms(), self.next_stats) >= 0:
+            print("Messages: %d received, %d tilt coalesced, %d applied"
+                  % (self.received, self.coalesced, self.applied))
+            self.mqtt.print_metrics()
+            self.next_stats = time.ticks_add(self.next_stats, STATS_MS)
+
+
+    def step(self):
+        """One main-loop iteration."""
+        self.mqtt.poll()  # (re)connects in the background
+        self.drain()  # whole backlog, newest tilt only
+        self.scheduler.poll()  # LED / buzzer off steps
+        self.poll_stats()
+        time.sleep(0.01)  # check for messages ~100Hz
 
-        except Exception as e:
-            print("Error parsing message:", e)
-
-    # ---------- CONNECTION ----------
-    def connect_wifi(self):
-        wlan = network.WLAN(network.STA_IF)
-        wlan.active(True)
-        if not wlan.isconnected():
-            print("Connecting to WiFi...")
-            wlan.connect(self.SSID, self.PASSWORD)
-            timeout = 10
-            while not wlan.isconnected() and timeout > 0:
-                time.sleep(1)
-                timeout -= 1
-        if wlan.isconnected():
-            print("WiFi connected! IP:", wlan.ifconfig()[0])
-            return True
-        else:
-            print("WiFi connection failed!")
-            return False
 
-    def mqtt_connect(self):
+# ---------- MAIN ----------
+if __name__ == "__main__":
+    receiver = MotorReceiver()
+    mem_report("Startup")
+
+    while True:
         try:
-            self.client = MQTTClient(
-                client_id=self.CLIENT_ID,
-                server=self.MQTT_BROKER,
-                port=self.MQTT_PORT,
-                user=self.MQTT_USERNAME,
-                password=self.MQTT_PASSWORD,
-                ssl=True,
-                ssl_params={'server_hostname': self.MQTT_BROKER}
-            )
-            self.client.set_callback(self.sub_cb)
-            self.client.connect()
-            print("MQTT connected successfully!")
-            self.client.subscribe(self.TOPIC_SUB)
-            print(f"Subscribed to topic: {self.TOPIC_SUB}")
-            return self.client
+            receiver.step()
         except Exception as e:
-            print("MQTT connection failed:", e)
-            return None
-
-
-# ---------- MAIN ----------
-receiver = MotorReceiver()
-
-if receiver.connect_wifi():
-    client = receiver.mqtt_connect()
-
-while True:
-    try:
-        client.check_msg()
-        time.sleep(0.05)  # check for messages ~20Hz
-    except Exception as e:
-        print("Error in main loop:", e)
-        time.sleep(1)
+            print("Error in main loop:", e)
+            time.sleep(1)
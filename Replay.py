@@ -0,0 +1,252 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+
+import cv2
+
+from FramePipeline import percentile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "Robotics_Final"))
+
+IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+
+# ---------------- Frame sources ----------------
+def iter_frames(source, max_frames=None):
+    """
+    Yield (index, timestamp_s, frame) from a video file, an image directory or an image glob.
+
+    Timestamps come from the video's fps (or 30 fps for image sequences) so
+    time-based logic such as the goal cooldown behaves as it did live.
+    """
+    if os.path.isdir(source):
+        paths = sorted(p for p in glob.glob(os.path.join(source, "*")) if p.lower().endswith(IMAGE_EXTS))
+    elif any(ch in source for ch in "*?["):
+        paths = sorted(glob.glob(source))
+    else:
+        paths = None
+
+    count = 0
+    if paths is not None:
+        for path in paths:
+            if max_frames is not None and count >= max_frames:
+                return
+            frame = cv2.imread(path)
+            if frame is None:
+                print("Skipping unreadable image:", path)
+                continue
+            yield count, count / 30.0, frame
+            count += 1
+        return
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise IOError("Could not open %s" % source)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    try:
+        while max_frames is None or count < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield count, count / fps, frame
+            count += 1
+    finally:
+        cap.release()
+
+
+# ---------------- In-process MQTT stand-in ----------------
+class MemorySink:
+    """Records publish() calls instead of sending them to a broker."""
+
+    def __init__(self):
+        self.messages = []
+        self.frame = None  # set by the replay loop so messages can be tied to frames
+
+    def publish(self, topic, payload, *args, **kwargs):
+        if isinstance(payload, bytes):
+            payload = payload.decode("utf-8", "replace")
+        self.messages.append({"frame": self.frame, "topic": topic, "payload": payload})
+
+
+def disable_gui():
+    """Turn the HighGUI calls into no-ops so detector code can run headless."""
+    cv2.imshow = lambda *args, **kwargs: None
+    cv2.waitKey = lambda *args, **kwargs: -1
+    cv2.namedWindow = lambda *args, **kwargs: None
+    cv2.setMouseCallback = lambda *args, **kwargs: None
+    cv2.destroyAllWindows = lambda *args, **kwargs: None
+
+
+# ---------------- Detector adapters ----------------
+# Each adapter is built once per run and returns a callable
+#   step(frame, t) -> JSON-serializable detection output for that frame
+def make_followme(args, sink):
+    import FollowMeSender
+
+    lut = None
+    if args.lut:
+        from MaskLUT import HsvMaskLUT
+        lut = HsvMaskLUT(FollowMeSender.LOWER_GREEN, FollowMeSender.UPPER_GREEN)
+    tracker = FollowMeSender.GreenTracker(lut=lut) if args.track else None
+
+    def step(frame, t):
+        if tracker is not None:
+            data, _ = tracker.detect(frame)
+        else:
+            data, _ = FollowMeSender.detect_green(frame, lut)
+        if data is not None:
+            sink.publish(FollowMeSender.TOPIC_PUB, json.dumps(data))
+        return data
+    return step
+
+
+def make_goal(args, sink):
+    import MQTT_Goal
+
+    if args.pyramid is not None:
+        MQTT_Goal.PYRAMID_LEVELS = args.pyramid
+    if args.lut:
+        from MaskLUT import HsvMaskLUT
+        MQTT_Goal.mask_lut = HsvMaskLUT(MQTT_Goal.lower_color, MQTT_Goal.upper_color)
+    MQTT_Goal.last_goal_time = float("-inf")  # replay time starts at 0, not at the epoch
+    device = MQTT_Goal.BallDetectorMQTT(client=sink)
+    box = tuple(int(v) for v in args.goal_box.split(",")) if args.goal_box else None
+
+    def step(frame, t):
+        balls, _ = MQTT_Goal.detect_balls(frame)
+        ball_center = balls[-1][0] if balls else None
+        inside = MQTT_Goal.ball_in_box(ball_center, box)
+        goal = MQTT_Goal.check_goal(device, inside, t)
+        return {"balls": [[list(c), r] for c, r in balls], "in_box": inside, "goal": goal}
+    return step
+
+
+def make_cartoon(args, sink):
+    import Cartoonify
+
+    def step(frame, t):
+        cartoon = Cartoonify.cartoonify(frame)
+        # Whole images are too big for the results file; a digest still catches any change
+        return {"shape": list(cartoon.shape), "sha1": hashlib.sha1(cartoon.tobytes()).hexdigest()}
+    return step
+
+
+DETECTORS = {
+    "followme": make_followme,
+    "goal": make_goal,
+    "cartoon": make_cartoon,
+}
+
+
+# ---------------- Replay + report ----------------
+def summarize(times_s):
+    values = sorted(times_s)
+    if not values:
+        return {}
+    return {
+        "count": len(values),
+        "mean_ms": 1000 * sum(values) / len(values),
+        "p50_ms": 1000 * percentile(values, 50),
+        "p95_ms": 1000 * percentile(values, 95),
+        "p99_ms": 1000 * percentile(values, 99),
+        "max_ms": 1000 * values[-1],
+    }
+
+
+def replay(detector, source, args):
+    sink = MemorySink()
+    step = DETECTORS[detector](args, sink)
+
+    frame_times = []
+    outputs = []
+    start = time.perf_counter()
+    for index, t, frame in iter_frames(source, args.max_frames):
+        sink.frame = index
+        t0 = time.perf_counter()
+        output = step(frame, t)
+        frame_times.append(time.perf_counter() - t0)
+        outputs.append(output)
+    elapsed = time.perf_counter() - start
+
+    detect_total = sum(frame_times)
+    return {
+        "detector": detector,
+        "source": source,
+        "options": {k: v for k, v in vars(args).items() if k not in ("source", "detectors", "out", "compare")},
+        "frames": len(outputs),
+        "elapsed_s": elapsed,
+        "fps": len(outputs) / detect_total if detect_total else 0.0,
+        "timing": summarize(frame_times),
+        "frame_ms": [1000 * t for t in frame_times],
+        "outputs": outputs,
+        "messages": sink.messages,
+    }
+
+
+def print_result(result):
+    timing = result["timing"]
+    print("%-9s %5d frames  %8.1f fps  p50 %7.2f ms  p95 %7.2f ms  p99 %7.2f ms  max %7.2f ms  %d msgs"
+          % (result["detector"], result["frames"], result["fps"], timing.get("p50_ms", 0),
+             timing.get("p95_ms", 0), timing.get("p99_ms", 0), timing.get("max_ms", 0),
+             len(result["messages"])))
+
+
+def compare(results, baseline_path):
+    """Print timing deltas and the frames whose detection output changed since a previous run."""
+    with open(baseline_path) as f:
+        baseline = {r["detector"]: r for r in json.load(f)["results"]}
+    print("\n---------------- Compared with %s ----------------" % baseline_path)
+    for result in results:
+        old = baseline.get(result["detector"])
+        if old is None:
+            print("%-9s no baseline" % result["detector"])
+            continue
+        changed = [i for i, (a, b) in enumerate(zip(old["outputs"], result["outputs"])) if a != b]
+        changed += list(range(min(len(old["outputs"]), len(result["outputs"])),
+                              max(len(old["outputs"]), len(result["outputs"]))))
+        line = "%-9s fps %8.1f -> %8.1f (%+.1f%%)" % (
+            result["detector"], old["fps"], result["fps"],
+            100 * (result["fps"] / old["fps"] - 1) if old["fps"] else 0.0)
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            line += "  %s %.2f -> %.2f" % (key[:3], old["timing"].get(key, 0), result["timing"].get(key, 0))
+        print(line)
+        if changed:
+            print("          outputs differ on %d frame(s), first: %s" % (len(changed), changed[:10]))
+        else:
+            print("          outputs identical")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded video/images through the OpenCV detectors")
+    parser.add_argument("source", help="video file, image directory or image glob")
+    parser.add_argument("--detectors", nargs="+", default=["followme", "goal"], choices=sorted(DETECTORS))
+    parser.add_argument("--out", default="replay_results.json", help="results file to write")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    parser.add_argument("--max-frames", type=int)
+    parser.add_argument("--track", action="store_true", help="followme: ROI tracking mode")
+    parser.add_argument("--lut", action="store_true", help="followme/goal: lookup-table masks")
+    parser.add_argument("--pyramid", type=int, help="goal: PYRAMID_LEVELS override")
+    parser.add_argument("--goal-box", help="goal: x1,y1,x2,y2 of the goal box (the mouse-drawn box live)")
+    args = parser.parse_args()
+
+    disable_gui()
+    results = []
+    for detector in args.detectors:
+        result = replay(detector, args.source, args)
+        print_result(result)
+        results.append(result)
+
+    with open(args.out, "w") as f:
+        json.dump({"created": time.strftime("%Y-%m-%d %H:%M:%S"), "results": results}, f)
+    print("Results written to", args.out)
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
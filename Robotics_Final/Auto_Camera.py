@@ -3,6 +3,7 @@
 
 import sensor, time
 from pyb import UART
+from camlink import OPCODES, MAX_FRAME, encode_into  # upload camlink.py next to this file
 
 # --- USER SETTINGS ---
 FIRST_COLOR   = "green"    # starting color
@@ -11,6 +12,10 @@ MIN_AREA      = 50         # minimum blob area to consider valid
 NEAR_AREA     = 4000       # area threshold for "CLOSE"
 DEADBAND_PCT  = 0.06       # center deadband as % of image width
 COOLDOWN_SEC  = 0.5        # min time between UART sends
+LINK_MODE     = "binary"   # "binary": CRC'd frames with seq + timestamp + blob; "text": "LEFT_FAR\n" lines
+CONTROL_MODE  = "discrete"  # "discrete": LEFT/CENTER/RIGHT x FAR/CLOSE; "continuous": stream the blob's
+                            # offset + area every frame for the ESP's PI steering (binary link only;
+                            # its gains are only tuned in SteeringSim so far, check them on the robot first)
 # ----------------------
 
 # NOTE: These LAB thresholds are *starting points*.
@@ -73,13 +78,18 @@ clock = time.clock()
 # --- UART setup ---
 # On many OpenMV boards, UART(3) is P4 (TX) / P5 (RX).
 uart = UART(3, 115200, timeout_char=1000)
+frame_buf = bytearray(MAX_FRAME)
+link_seq = 0  # frame sequence number, mod 256
 
 print("Tracking FIRST color:", FIRST_COLOR, "then SECOND color:", SECOND_COLOR)
 
 last_msg = None
 last_send_ms = 0  # ms since boot
 
-while True:
+def step():
+    """One camera frame: find the blob, advance the state machine, send the command."""
+    global tracking_color, searching_second_color, goal_mode, goal_start_ms, last_msg, last_send_ms, link_seq
+
     clock.tick()
     img = sensor.snapshot()
     img_w = img.width()
@@ -163,6 +173,8 @@ while True:
                 goal_mode = True
                 goal_start_ms = now_ms
                 print("GOAL_FOUND - entering GOAL HOLD for 5 seconds.")
+            elif have_blob and CONTROL_MODE == "continuous" and LINK_MODE == "binary":
+                msg = "TRACK"
             else:
                 msg = "%s_%s" % (dir_cmd, dist_cmd)
 
@@ -171,12 +183,27 @@ while True:
                 ui_text += " | GOAL FOUND (CENTER)"
 
     # --- UART Publish (with cooldown / dedupe) ---
+    # (TRACK goes out every frame: the geometry changes even when the command does not)
     if (msg is not None) and (
-        (msg != last_msg) or (time.ticks_diff(now_ms, last_send_ms) > int(COOLDOWN_SEC * 1000))
+        (msg == "TRACK") or (msg != last_msg) or (time.ticks_diff(now_ms, last_send_ms) > int(COOLDOWN_SEC * 1000))
     ):
         try:
-            uart.write(msg + "\n")
-            print("Sent:", msg, "(area:", blob_area, ", tracking:", tracking_color, ")")
+            if LINK_MODE == "binary":
+                # Stamped with the frame's capture time, so the ESP sees image -> command latency
+                if msg == "TRACK":
+                    n = encode_into(frame_buf, OPCODES[msg], link_seq, now_ms,
+                                    (cx - img_w // 2) * 2000 // img_w, (cy - img_h // 2) * 2000 // img_h,
+                                    blob_area * 1000 // NEAR_AREA)
+                elif have_blob:
+                    n = encode_into(frame_buf, OPCODES[msg], link_seq, now_ms, cx, cy, blob_area)
+                else:
+                    n = encode_into(frame_buf, OPCODES[msg], link_seq, now_ms)
+                uart.write(memoryview(frame_buf)[:n])
+                link_seq = (link_seq + 1) & 0xFF
+            else:
+                uart.write(msg + "\n")
+            if msg != last_msg:
+                print("Sent:", msg, "(area:", blob_area, ", tracking:", tracking_color, ")")
         except Exception as e:
             print("UART write failed:", e)
         last_msg = msg
@@ -193,4 +220,9 @@ while True:
     # --- Debug text overlay ---
     img.draw_string(2, 2, ui_text, mono_space=False, color=(255, 255, 0))
     if blob_area is not None:
-        img.draw_string(2, 14, "Area: %d" % blob_area, mono_space=False, color=(0, 255, 0))
\ No newline at end of file
+        img.draw_string(2, 14, "Area: %d" % blob_area, mono_space=False, color=(0, 255, 0))
+
+
+if __name__ == "__main__":
+    while True:
+        step()
\ No newline at end of file
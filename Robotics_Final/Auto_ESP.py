@@ -1,9 +1,23 @@
 import time
-import network
 from machine import Pin, PWM, UART
 import neopixel
-from umqtt.simple import MQTTClient
 import secrets
+from mqttconn import MQTTConnection  # upload mqttconn.py next to this file
+from sequencer import Sequencer      # and sequencer.py
+from camlink import COMMANDS, OPCODES, LinkReceiver  # and camlink.py
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+# "async": UART, MQTT and the goal timeout run as uasyncio tasks and a command is
+# handled as soon as its line arrives. "poll": the original 300 ms loop (for comparison).
+RUNTIME = "async"
+
+RED = (255, 0, 0)
+GREEN = (0, 255, 0)
+BLUE = (0, 0, 255)
+OFF = (0, 0, 0)
 
 class RobotDevice:
     def __init__(self):
@@ -25,21 +39,26 @@ class RobotDevice:
 
         # --- UART setup (from camera/OpenMV) ---
         # Example: UART(1) on GPIO16 (RX) and GPIO17 (TX).
-        self.uart = UART(1, baudrate=115200, tx=Pin(17), rx=Pin(16), timeout=100)
-
-        # --- WiFi + MQTT setup ---
-        self.SSID = secrets.SSID
-        self.PASSWORD = secrets.PWD
-
-        self.MQTT_BROKER = secrets.mqtt_url
+        # timeout=0: reads return what has arrived; camlink.LinkReceiver reassembles
+        # frames / lines across reads, so nothing has to wait for a whole line.
+        self.uart = UART(1, baudrate=115200, tx=Pin(17), rx=Pin(16), timeout=0)
+        self.rx_buf = bytearray(64)
+        # Binary frames or text lines (Auto_Camera's LINK_MODE), told apart byte by byte;
+        # stale / repeated / out-of-order frames are dropped here
+        self.LINK_STALE_MS = 250
+        self.link = LinkReceiver(stale_ms=self.LINK_STALE_MS)
+
+        # --- WiFi + MQTT setup (connects and reconnects from loop()) ---
         self.MQTT_PORT = 8883
-        self.MQTT_USERNAME = secrets.mqtt_username
-        self.MQTT_PASSWORD = secrets.mqtt_password
         self.MQTT_CLIENT_ID = "Liam_goal_bot"
         # Topic where we listen for "GOAL"
         self.TOPIC_GOAL = b"/ME35/goal"
 
-        self.mqtt_client = None
+        self.mqtt = MQTTConnection(
+            self.MQTT_CLIENT_ID, secrets.mqtt_url, port=self.MQTT_PORT,
+            user=secrets.mqtt_username, password=secrets.mqtt_password,
+            ssid=secrets.SSID, wifi_password=secrets.PWD, callback=self._mqtt_cb)
+        self.mqtt.subscribe(self.TOPIC_GOAL)
 
         # --- State machine ---
         # SEARCHING: normal UART control
@@ -50,44 +69,87 @@ class RobotDevice:
         self.GOAL_RESET_TIMEOUT = 20.0  # seconds
         self.goal_found_time = None     # timestamp when GOAL_FOUND was received
 
-        print("RobotDevice initialized. Waiting for UART + MQTT commands...")
+        # --- Async runtime periods ---
+        self.MQTT_POLL_MS = 50
+        self.GOAL_CHECK_MS = 100
+        self.SEQ_TICK_MS = 10   # longest a due motion step waits for the sequencer task
+
+        # --- Motions: (fn, arg, hold_ms) steps run by the sequencer, never sleeping ---
+        # Movement commands preempt each other; GOAL_FOUND and the celebration
+        # run to the end and anything that arrives meanwhile queues (the newest
+        # movement command only; a queued celebration is never dropped for one).
+        # Movement actions are prebuilt ((L_IN1, L_IN2, R_IN1, R_IN2) duties, LED colors or None) tuples.
+        self.seq = Sequencer(queue_size=1)
+        S = self.SPEED
+        SPIN_LEFT, SPIN_RIGHT, FORWARD, STOP = (S, 0, 0, S), (0, S, S, 0), (S, 0, S, 0), (0, 0, 0, 0)
+        self.SEQ_LEFT_FAR = [(self.apply, (SPIN_LEFT, (RED, OFF)), 0)]          # red
+        self.SEQ_LEFT_CLOSE = [(self.apply, (SPIN_LEFT, (RED, BLUE)), 0)]       # red + blue
+        self.SEQ_RIGHT_FAR = [(self.apply, (SPIN_RIGHT, (RED, OFF)), 0)]        # red
+        self.SEQ_RIGHT_CLOSE = [(self.apply, (SPIN_RIGHT, (RED, BLUE)), 0)]     # red + blue
+        self.SEQ_CENTER_FAR = [(self.apply, (FORWARD, (GREEN, OFF)), 0)]        # green
+        self.SEQ_CENTER_CLOSE = [(self.apply, (FORWARD, (GREEN, BLUE)), 2000),  # green + blue, forward 2 s
+                                 (self.apply, (STOP, None), 0)]
+        self.SEQ_NONE = [(self.apply, (STOP, (OFF, OFF)), 0)]                   # off
+        self.SEQ_SHOOT = [
+            (self._shooter, (0, 1), 250),  # spin forward
+            (self._shooter, (0, 0), 500),  # stop
+            (self._shooter, (1, 0), 250),  # spin backward
+            (self._shooter, (0, 0), 0),    # final stop
+        ]
+        self.SEQ_GOAL_FOUND = ([(self._leds, (GREEN, BLUE), 0),
+                                (self.buz.value, 1, 100), (self.buz.value, 0, 0),
+                                (self.forward, None, 1000)]
+                               + self.SEQ_SHOOT
+                               + [(self.stop, None, 0), (self._start_goal_timer, None, 0)])
+        self.SEQ_CELEBRATE = self.celebration_steps(2000) + [(self._leds, (OFF, OFF), 0)]
+
+        # --- Continuous steering (Auto_Camera CONTROL_MODE = "continuous") ---
+        # TRACK frames carry the blob's offset and size every camera frame; a PI
+        # controller on the offset turns, and the forward duty drops from CRUISE
+        # to APPROACH as the blob grows to NEAR_AREA. Integer math throughout
+        # (offsets in permille), and one preallocated duty list the sequencer applies.
+        self.STEER_KP = 800          # duty per full half-width of offset
+        self.STEER_KI = 150          # duty per (half-width x second)
+        self.STEER_I_MAX = 1000000   # integral clamp (permille x ms)
+        self.CRUISE_DUTY = self.SPEED  # same top speed as the discrete FORWARD
+        self.APPROACH_DUTY = 300
+        self.CENTER_PERMILLE = 60    # LED green inside this band (the camera's DEADBAND_PCT)
+        self.TRACK_GAP_MS = 300      # longer without TRACK frames restarts the integral
+        self.OP_TRACK = OPCODES["TRACK"]
+        self.steer_i = 0
+        self.track_last = time.ticks_ms()
+        self.track_centered = None
+        self.track_duties = [0, 0, 0, 0]
+        self.SEQ_TRACK = [(self.apply, (self.track_duties, None), 0)]
+
+        # --- Command dispatch: no decoding or string matching per command ---
+        # LinkReceiver turns frames and text lines alike into an opcode (the
+        # index in camlink.COMMANDS); by_opcode maps it to a (name, steps, is_goal) entry.
+        self.ECHO_COMMANDS = False  # print every command (slow)
+        self.by_opcode = []
+        for name in COMMANDS:
+            if name == "GOAL_FOUND":
+                entry = (name, self.SEQ_GOAL_FOUND, True)
+            elif name == "TRACK":
+                entry = (name, None, False)  # needs the frame's geometry: see track()
+            elif "NONE" in name:
+                # e.g., NONE_NONE, LEFT_NONE, NONE_FAR, etc.
+                entry = ("NONE", self.SEQ_NONE, False)
+            else:
+                entry = (name, getattr(self, "SEQ_" + name), False)
+            self.by_opcode.append(entry)
+
+        # --- UART latency instrumentation (arrival -> command handled) ---
+        self.STATS_PERIOD_MS = 10000
+        self.lines = 0          # commands handled
+        self.latency_total_us = 0
+        self.latency_max_us = 0
+        self.last_uart_check = time.ticks_us()
+        self.last_stats = time.ticks_ms()
 
-    # ---------- WiFi + MQTT ----------
-    def connect_wifi(self):
-        wlan = network.WLAN(network.STA_IF)
-        wlan.active(True)
-        if not wlan.isconnected():
-            print("Connecting to WiFi...")
-            wlan.connect(self.SSID, self.PASSWORD)
-            timeout = 10
-            while not wlan.isconnected() and timeout > 0:
-                time.sleep(1)
-                timeout -= 1
-        if wlan.isconnected():
-            print("WiFi Connected:", wlan.ifconfig()[0])
-            return True
-        print("WiFi failed.")
-        return False
-
-    def mqtt_connect(self):
-        try:
-            self.mqtt_client = MQTTClient(
-                client_id=self.MQTT_CLIENT_ID,
-                server=self.MQTT_BROKER,
-                port=self.MQTT_PORT,
-                user=self.MQTT_USERNAME,
-                password=self.MQTT_PASSWORD,
-                ssl=True,
-                ssl_params={'server_hostname': self.MQTT_BROKER}  # SNI
-            )
-            self.mqtt_client.set_callback(self._mqtt_cb)
-            self.mqtt_client.connect()
-            self.mqtt_client.subscribe(self.TOPIC_GOAL)
-            print("Connected to MQTT broker and subscribed to", self.TOPIC_GOAL)
-        except Exception as e:
-            print("MQTT connect failed:", e)
-            self.mqtt_client = None
+        print("RobotDevice initialized. Waiting for UART + MQTT commands...")
 
+    # ---------- MQTT ----------
     def _mqtt_cb(self, topic, msg):
         """
         MQTT callback – when we get 'GOAL' on TOPIC_GOAL,
@@ -102,81 +164,100 @@ class RobotDevice:
         if text == "GOAL":
             if self.state == "WAITING_GOAL_RESET":
                 print("GOAL ACK received – resetting to SEARCHING state.")
-                # Optional celebration
-                self.celebrate_goal(duration=2.0)
-                # Reset state so we accept UART search commands again
+                # Reset state so we accept UART search commands again;
+                # they queue behind the celebration, which ends with outputs cleared
                 self.state = "SEARCHING"
                 self.goal_found_time = None
-                # Clear outputs
-                self.set_led((0, 0, 0), (0, 0, 0))
-                self.stop()
+                print("Celebration: spinning + beeping!")
+                self.seq.start("CELEBRATE", self.SEQ_CELEBRATE, preemptible=False, on_abort=self.halt)
 
-    def celebrate_goal(self, duration=3.0):
+    def celebration_steps(self, duration_ms):
         """
         Spin in place and repeatedly beep the buzzer
-        for 'duration' seconds.
+        for duration_ms, then stop everything.
         """
-        print("Celebration: spinning + beeping!")
-        start = time.time()
-        while time.time() - start < duration:
-            # Spin (e.g., spin left) and short beep
-            self.spin_left()
-            self.buz.value(1)
-            time.sleep(0.1)
-            self.buz.value(0)
-            time.sleep(0.1)
-        # Stop everything at the end
-        self.stop()
-        self.buz.value(0)
+        steps = []
+        for _ in range(max(1, duration_ms // 200)):
+            steps += [(self.spin_left, None, 0), (self.buz.value, 1, 100), (self.buz.value, 0, 100)]
+        return steps + [(self.stop, None, 0)]
 
     # ---------- UART Command handling ----------
-    def handle_cmd(self, cmd):
-        """Interpret commands like LEFT_FAR, RIGHT_CLOSE, GOAL_FOUND, NONE_NONE."""
-        print("Received:", cmd)
+    def handle_opcode(self, op):
+        """One command from the link parser (opcode = index in camlink.COMMANDS)."""
+        if 0 <= op < len(self.by_opcode):
+            self.dispatch(self.by_opcode[op])
+        else:
+            print("Unknown opcode:", op)
+
+    def dispatch(self, entry):
+        """Run a (name, steps, is_goal) command entry; allocates nothing."""
+        name, steps, is_goal = entry
+        if self.ECHO_COMMANDS:
+            print("Received:", name)
+        if steps is None:
+            return
+        self.track_centered = None  # discrete commands set their own LEDs
 
         # If we're waiting for MQTT GOAL reset, ignore movement commands
         if self.state == "WAITING_GOAL_RESET":
-            print("Ignoring movement cmd while waiting for GOAL MQTT.")
+            if self.ECHO_COMMANDS:
+                print("Ignoring movement cmd while waiting for GOAL MQTT.")
             return
 
-        if cmd == "LEFT_FAR":
-            self.set_led((255, 0, 0), (0, 0, 0))   # red
-            self.spin_left()
-        elif cmd == "LEFT_CLOSE":
-            self.set_led((255, 0, 0), (0, 0, 255)) # red + blue
-            self.spin_left()
-        elif cmd == "RIGHT_FAR":
-            self.set_led((255, 0, 0), (0, 0, 0))   # red
-            self.spin_right()
-        elif cmd == "RIGHT_CLOSE":
-            self.set_led((255, 0, 0), (0, 0, 255)) # red + blue
-            self.spin_right()
-        elif cmd == "CENTER_FAR":
-            self.set_led((0, 255, 0), (0, 0, 0))   # green
-            self.forward()
-        elif cmd == "CENTER_CLOSE":
-            self.set_led((0, 255, 0), (0, 0, 255)) # green + blue
-            self.forward()
-            time.sleep(2)
-            self.stop()
-        elif "NONE" in cmd:
-            # e.g., NONE_NONE, LEFT_NONE, NONE_FAR, etc.
-            self.set_led((0, 0, 0), (0, 0, 0))     # off
-            self.stop()
-        elif cmd == "GOAL_FOUND":
-            # We reached the ball → stop & beep once,
-            # then enter WAITING_GOAL_RESET state and start timeout
+        if is_goal:
+            # We reached the ball → beep, drive in and shoot, then wait
+            # for the MQTT GOAL; the 20 s timeout starts when the shot is done.
+            # Movement commands are ignored from here on.
             print("GOAL_FOUND received – entering WAITING_GOAL_RESET state.")
-            self.set_led((0, 255, 0), (0, 0, 255)) # green + blue
-            self.buzzer_beep()
-            self.forward()
-            time.sleep(1)
-            self.shoot()
-            self.stop()
             self.state = "WAITING_GOAL_RESET"
-            self.goal_found_time = time.time()     # start 20s timer
+            self.goal_found_time = None
+            self.seq.start(name, steps, preemptible=False, on_abort=self.halt)
         else:
-            print("Unknown command:", cmd)
+            self.seq.start(name, steps)
+
+    # ---------- Continuous steering ----------
+    def track(self, offset, closeness):
+        """
+        PI steering toward the blob: offset in permille of the half width
+        (+ = right), closeness in permille of NEAR_AREA.
+        """
+        if self.state == "WAITING_GOAL_RESET" or self.seq.busy():
+            return  # the shot or the celebration owns the motors and LEDs until it ends
+        now = time.ticks_ms()
+        dt = time.ticks_diff(now, self.track_last)
+        self.track_last = now
+        if dt > self.TRACK_GAP_MS:
+            self.steer_i = 0  # a new approach: forget the old integral
+            dt = 0
+        self.steer_i += offset * dt
+        if self.steer_i > self.STEER_I_MAX:
+            self.steer_i = self.STEER_I_MAX
+        elif self.steer_i < -self.STEER_I_MAX:
+            self.steer_i = -self.STEER_I_MAX
+        turn = (self.STEER_KP * offset + self.STEER_KI * self.steer_i // 1000) // 1000
+
+        if closeness > 1000:
+            closeness = 1000
+        fwd = self.CRUISE_DUTY - (self.CRUISE_DUTY - self.APPROACH_DUTY) * closeness // 1000
+        fwd = fwd * (1000 - min(abs(offset), 1000)) // 1000  # far off center: mostly turn
+        # Same sense as spin_right for a blob on the right: L channel back, R channel forward
+        self._set_channel(0, fwd - turn)
+        self._set_channel(2, fwd + turn)
+
+        centered = -self.CENTER_PERMILLE <= offset <= self.CENTER_PERMILLE
+        if centered != self.track_centered:
+            self.track_centered = centered
+            self.set_led(GREEN if centered else RED, OFF)
+        self.seq.start("TRACK", self.SEQ_TRACK)
+
+    def _set_channel(self, i, duty):
+        """Signed duty into track_duties[i] (IN1) / [i + 1] (IN2), clamped to 10 bits."""
+        if duty > 1023:
+            duty = 1023
+        elif duty < -1023:
+            duty = -1023
+        self.track_duties[i] = duty if duty > 0 else 0
+        self.track_duties[i + 1] = -duty if duty < 0 else 0
 
     def set_led(self, color_1, color_2):
         """Set both NeoPixels to given RGB color tuples."""
@@ -184,98 +265,184 @@ class RobotDevice:
         self.np[1] = color_2
         self.np.write()
 
-    def buzzer_beep(self, duration=0.1):
-        self.buz.value(1)
-        time.sleep(duration)
+    # ---------- Sequence steps (called with the step's arg) ----------
+    def apply(self, action):
+        """Set the motor duties and (unless None) both LEDs from a prebuilt action tuple."""
+        duties, colors = action
+        self.L_IN1.duty(duties[0]); self.L_IN2.duty(duties[1])
+        self.R_IN1.duty(duties[2]); self.R_IN2.duty(duties[3])
+        if colors is not None:
+            self.set_led(colors[0], colors[1])
+
+    def _leds(self, colors):
+        self.set_led(colors[0], colors[1])
+
+    def _shooter(self, levels):
+        self.S_IN1.value(levels[0])
+        self.S_IN2.value(levels[1])
+
+    def _start_goal_timer(self, _=None):
+        self.goal_found_time = time.time()     # start 20s timer
+
+    def halt(self):
+        """Everything off: used when a running motion is aborted."""
+        self.stop()
         self.buz.value(0)
+        self._shooter((0, 0))
 
     # ---------- Motor controls ----------
-    def spin_left(self):
+    def spin_left(self, _=None):
         self.L_IN1.duty(self.SPEED);          self.L_IN2.duty(0)
         self.R_IN1.duty(0); self.R_IN2.duty(self.SPEED)
 
-    def spin_right(self):
+    def spin_right(self, _=None):
         self.L_IN1.duty(0); self.L_IN2.duty(self.SPEED)
         self.R_IN1.duty(self.SPEED);          self.R_IN2.duty(0)
 
-    def forward(self):
+    def forward(self, _=None):
         self.L_IN1.duty(self.SPEED); self.L_IN2.duty(0)
         self.R_IN1.duty(self.SPEED); self.R_IN2.duty(0)
 
-    def stop(self):
+    def stop(self, _=None):
         self.L_IN1.duty(0); self.L_IN2.duty(0)
         self.R_IN1.duty(0); self.R_IN2.duty(0)
-        
-    def shoot(self):
-        # spin forward
-        self.S_IN1.value(0)
-        self.S_IN2.value(1)
-        time.sleep(0.25)
-
-        # stop
-        self.S_IN1.value(0)
-        self.S_IN2.value(0)
-        time.sleep(0.5)
-
-        # spin backward
-        self.S_IN1.value(1)
-        self.S_IN2.value(0)
-        time.sleep(0.25)
-
-        # final stop
-        self.S_IN1.value(0)
-        self.S_IN2.value(0)
     
-    # ---------- Main polling loop ----------
+    # ---------- Shared by both runtimes ----------
+    def check_goal_timeout(self):
+        """AUTO RESET AFTER TIMEOUT IF NO MQTT GOAL RECEIVED."""
+        if self.state == "WAITING_GOAL_RESET" and self.goal_found_time is not None:
+            if time.time() - self.goal_found_time > self.GOAL_RESET_TIMEOUT:
+                print("Timeout expired – auto-resetting to SEARCHING.")
+                self.state = "SEARCHING"
+                self.goal_found_time = None
+                self.set_led((0, 0, 0), (0, 0, 0))
+                self.stop()
+
+    def read_link(self):
+        """Feed everything the UART holds to the link parser; True if a command is pending."""
+        while self.uart.any():
+            n = self.uart.readinto(self.rx_buf, min(self.uart.any(), len(self.rx_buf)))
+            if not n:
+                break
+            self.link.feed(self.rx_buf, n)
+        return self.link.pending
+
+    def dispatch_pending(self, arrived_us):
+        """Handle the newest command the link parser holds and record arrival -> done latency."""
+        self.link.pending = False
+        try:
+            if self.link.op == self.OP_TRACK and self.link.has_blob:
+                self.track(self.link.cx, self.link.area)
+            else:
+                self.handle_opcode(self.link.op)
+        except Exception as e:
+            print("UART command error:", e)
+        latency = time.ticks_diff(time.ticks_us(), arrived_us)
+        self.lines += 1
+        self.latency_total_us += latency
+        if latency > self.latency_max_us:
+            self.latency_max_us = latency
+
+    def print_stats(self):
+        avg = self.latency_total_us // self.lines if self.lines else 0
+        print("UART [%s]: %d commands | arrival->handled avg %d us, max %d us"
+              % (RUNTIME, self.lines, avg, self.latency_max_us))
+        self.link.print_stats()
+        self.seq.print_stats()
+
+    def maybe_print_stats(self):
+        now = time.ticks_ms()
+        if time.ticks_diff(now, self.last_stats) >= self.STATS_PERIOD_MS:
+            self.last_stats = now
+            self.print_stats()
+
+    def sleep_ticking(self, ms):
+        """The poll loop's delay, sliced so motion steps still run on time."""
+        end = time.ticks_add(time.ticks_ms(), ms)
+        while True:
+            left = time.ticks_diff(end, time.ticks_ms())
+            if left <= 0:
+                return
+            time.sleep_ms(min(left, self.seq.tick()))
+
+    # ---------- Main polling loop (RUNTIME = "poll") ----------
+    def step(self):
+        """One loop iteration: goal timeout, MQTT, newest UART command, then the loop delay."""
+        self.check_goal_timeout()
+
+        # Check MQTT (non-blocking; reconnects with backoff when the link drops)
+        self.mqtt.poll()
+        self.mqtt.check_msg()
+
+        # ---------- UART DRAIN LOGIC (Fix 1) ----------
+        # Read ALL waiting bytes; the link parser keeps only the most recent command.
+        # It could have landed any time since the last check, so that is
+        # its arrival as far as this loop can tell (worst case).
+        arrived = self.last_uart_check
+        self.last_uart_check = time.ticks_us()
+        if self.read_link():
+            self.dispatch_pending(arrived)
+        self.maybe_print_stats()
+
+        # Slow down the loop a bit (motion steps keep running meanwhile)
+        self.sleep_ticking(300)
+
     def loop(self):
         while True:
             try:
-                # --- AUTO RESET AFTER TIMEOUT IF NO MQTT GOAL RECEIVED ---
-                if self.state == "WAITING_GOAL_RESET" and self.goal_found_time is not None:
-                    if time.time() - self.goal_found_time > self.GOAL_RESET_TIMEOUT:
-                        print("Timeout expired – auto-resetting to SEARCHING.")
-                        self.state = "SEARCHING"
-                        self.goal_found_time = None
-                        self.set_led((0, 0, 0), (0, 0, 0))
-                        self.stop()
-
-                # Check MQTT (non-blocking)
-                if self.mqtt_client is not None:
-                    try:
-                        self.mqtt_client.check_msg()
-                    except Exception as e:
-                        print("MQTT error in loop:", e)
-                        time.sleep(0.1)
-
-                # ---------- UART DRAIN LOGIC (Fix 1) ----------
-                # Read ALL waiting lines and keep only the most recent one
-                last_line = None
-                while self.uart.any():
-                    line = self.uart.readline()
-                    if line:
-                        last_line = line  # overwrite each time -> newest wins
-
-                if last_line:
-                    try:
-                        cmd = last_line.decode().strip().upper()
-                        if cmd:
-                            self.handle_cmd(cmd)
-                    except Exception as e:
-                        print("UART decode error:", e)
-
-                # Slow down the loop a bit
-                time.sleep(0.3)
-
+                self.step()
             except Exception as e:
                 print("Error in loop:", e)
                 time.sleep(1)
 
-# ---------- MAIN ----------
-time.sleep(2)  # you can lower/remove this if you want faster startup
-robot = RobotDevice()
+    # ---------- uasyncio runtime (RUNTIME = "async") ----------
+    async def uart_task(self):
+        """Wake as bytes land; once a frame / line completes, handle the newest command."""
+        reader = asyncio.StreamReader(self.uart)
+        while True:
+            n = await reader.readinto(self.rx_buf)
+            arrived = time.ticks_us()  # the reader wakes as the bytes land
+            if n:
+                self.link.feed(self.rx_buf, n)
+            if self.read_link():
+                self.dispatch_pending(arrived)
+
+    async def mqtt_task(self):
+        while True:
+            try:
+                self.mqtt.poll()
+                self.mqtt.check_msg()
+            except Exception as e:
+                print("Error in MQTT task:", e)
+                await asyncio.sleep(1)
+            await asyncio.sleep_ms(self.MQTT_POLL_MS)
 
-# Connect WiFi + MQTT (if available)
-if robot.connect_wifi():
-    robot.mqtt_connect()
+    async def goal_timeout_task(self):
+        while True:
+            self.check_goal_timeout()
+            await asyncio.sleep_ms(self.GOAL_CHECK_MS)
+
+    async def motion_task(self):
+        while True:
+            await asyncio.sleep_ms(min(self.seq.tick(), self.SEQ_TICK_MS))
 
-robot.loop(
\ No newline at end of file
+    async def stats_task(self):
+        while True:
+            await asyncio.sleep_ms(self.STATS_PERIOD_MS)
+            self.print_stats()
+
+    async def main(self):
+        await asyncio.gather(self.uart_task(), self.mqtt_task(), self.motion_task(),
+                             self.goal_timeout_task(), self.stats_task())
+
+    def run(self):
+        asyncio.run(self.main())
+
+# ---------- MAIN ----------
+if __name__ == "__main__":
+    time.sleep(2)  # you can lower/remove this if you want faster startup
+    robot = RobotDevice()
+    if RUNTIME == "async":
+        robot.run()
+    else:
+        robot.loop()
@@ -50,7 +50,9 @@ last_state = 0
 # Main Loop
 # -------------------------
 
-while True:
+def step():
+    """Poll the button once; a press runs the whole dispense cycle."""
+    global last_state
     state = button.value()
 
     # Detect button press (LOW if using pull-up, HIGH if using external pull-down)
@@ -69,3 +71,8 @@ while True:
 
     last_state = state
     time.sleep_ms(20)
+
+
+if __name__ == "__main__":
+    while True:
+        step()
@@ -1,11 +1,10 @@
 import cv2
 import numpy as np
 import time
-import json
-import paho.mqtt.client as mqtt
-import secrets
 import sys  # only if you want to exit on failure
 
+USE_MASK_LUT = False  # threshold with a cached BGR lookup table instead of cvtColor+inRange
+
 # ---------------- MOUSE-DRAGGABLE BOUNDING BOX ----------------
 last_goal_time = 0
 goal_cooldown = 10
@@ -30,12 +29,22 @@ def draw_bbox(event, x, y, flags, param):
 
 # --------------------- MQTT CLASS ---------------------
 class BallDetectorMQTT:
-    def __init__(self):
+    def __init__(self, client=None):
+        self.TOPIC_PUB = "/ME35/goal"
+        self.ball_detected_last = False
+
+        if client is not None:
+            # Anything with publish(topic, payload), e.g. the replay harness sink
+            self.client = client
+            return
+
+        import paho.mqtt.client as mqtt
+        import secrets
+
         self.MQTT_BROKER = secrets.mqtt_url
         self.MQTT_PORT = 8883
         self.MQTT_USERNAME = secrets.mqtt_username
         self.MQTT_PASSWORD = secrets.mqtt_password
-        self.TOPIC_PUB = "/ME35/goal
 
         self.client = mqtt.Client(client_id="Liam_2")
         self.client.username_pw_set(self.MQTT_USERNAME, self.MQTT_PASSWORD)
@@ -50,8 +59,6 @@ class BallDetectorMQTT:
             # exit program
             sys.exit(1)
 
-        self.ball_detected_last = False
-
     def publish_goal(self):
         try:
             msg = "GOAL"
@@ -60,105 +67,292 @@ class BallDetectorMQTT:
         except Exception as e:
             print("Error publishing GOAL:", e)
 
-# --------------- INIT CAMERA + MQTT ----------------
-
-mqtt_device = BallDetectorMQTT()
-
-cap = cv2.VideoCapture(0) #adjust as necessary usually 0 or 1
-if not cap.isOpened():
-    print("Error: Could not open camera.")
-    exit()
-
-cv2.namedWindow("Camera")
-cv2.setMouseCallback("Camera", draw_bbox)
+# ---------------- BALL DETECTION ----------------
 
 # HSV range for green ball
 lower_color = np.array([66, 60, 150])
 upper_color = np.array([76, 155, 230])
+mask_lut = None
+if USE_MASK_LUT:
+    from MaskLUT import HsvMaskLUT  # MaskLUT.py is in the repo root (shared with FollowMeSender.py); needs it on sys.path
+    mask_lut = HsvMaskLUT(lower_color, upper_color)
+
+# Ball filters (full-resolution pixels)
+MIN_AREA, MAX_AREA = 300, 10000
+MIN_RADIUS, MAX_RADIUS = 10, 80
+MIN_ROUNDNESS = 0.6
+
+# Coarse-to-fine mode: 0 = full resolution, 1 = search at 1/2 scale, 2 = search at 1/4 scale
+PYRAMID_LEVELS = 0
+PYRAMID_SLACK = 0.6     # how far coarse thresholds are loosened so no real ball is dropped
+REFINE_PAD = 12         # extra full-res pixels around each candidate (covers blur + close kernels)
+
+# Reject most contours with one NumPy pass over all contour points instead of a per-contour loop
+VECTORIZED_FILTER = True
+
+
+def clean_mask(mask, scale=1):
+    """Blur + open + close, with kernels shrunk when the mask is 1/scale size."""
+    def odd(size):
+        return max(1, int(round(size / scale)) | 1)
+
+    mask = cv2.GaussianBlur(mask, (odd(9), odd(9)), 2 / scale)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((odd(5), odd(5)), np.uint8))
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((odd(7), odd(7)), np.uint8))
+    return mask
+
+
+def ball_mask(frame, scale=1):
+    """Thresholded + cleaned mask of the green ball color."""
+    if mask_lut is not None:
+        mask = mask_lut.mask(frame)
+    else:
+        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        mask = cv2.inRange(hsv, lower_color, upper_color)
+    return clean_mask(mask, scale)
+
+
+def ball_limits(scale=1, slack=0.0):
+    """(min_area, max_area, min_radius, max_radius, min_roundness) for a mask 1/scale the frame size."""
+    return (MIN_AREA * (1 - slack) / scale**2,
+            MAX_AREA * (1 + slack) / scale**2,
+            MIN_RADIUS * (1 - slack) / scale,
+            MAX_RADIUS * (1 + slack) / scale,
+            MIN_ROUNDNESS * (1 - slack))
+
+
+def check_ball(cnt, limits, scale=1, offset=(0, 0)):
+    """Apply the ball filters to one contour; returns (center, radius) in full-res pixels or None."""
+    min_area, max_area, min_radius, max_radius, min_roundness = limits
+    area = cv2.contourArea(cnt)
+    if area < min_area or area > max_area:
+        return None
+
+    (x, y), radius = cv2.minEnclosingCircle(cnt)
+    if scale == 1:
+        radius = int(radius)
 
-print("Starting ball + bounding box goal detector...")
-
-# ---------------- MAIN LOOP ----------------
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-
-    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-    mask = cv2.inRange(hsv, lower_color, upper_color)
-
-    mask = cv2.GaussianBlur(mask, (9, 9), 2)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((5, 5), np.uint8))
-    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((7, 7), np.uint8))
-
-    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if radius < min_radius or radius > max_radius:
+        return None
 
-    ball_detected = False
-    ball_center = None
+    circle_area = np.pi * radius**2
+    roundness = area / circle_area
 
-    for cnt in contours:
-        area = cv2.contourArea(cnt)
-        if area < 300 or area > 10000:
-            continue
+    if roundness < min_roundness:
+        return None
 
-        (x, y), radius = cv2.minEnclosingCircle(cnt)
-        center = (int(x), int(y))
-        radius = int(radius)
+    center = (int(x * scale) + offset[0], int(y * scale) + offset[1])
+    return center, int(radius * scale)
 
-        if radius < 10 or radius > 80:
-            continue
 
-        circle_area = np.pi * radius**2
-        roundness = area / circle_area
+def find_balls(mask, scale=1, slack=0.0, offset=(0, 0)):
+    """
+    Contours of `mask` that pass the ball filters, as [(center, radius)] in full-res pixels.
 
-        if roundness < 0.6:
-            continue
+    `scale` is how much smaller the mask is than the frame; area/radius limits
+    shrink with it. `slack` loosens every limit (used for coarse candidates).
+    """
+    if VECTORIZED_FILTER:
+        return find_balls_vectorized(mask, scale, slack, offset)
 
-        # Ball passes filters
-        ball_detected = True
-        ball_center = center
+    limits = ball_limits(scale, slack)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    balls = []
+    for cnt in contours:
+        ball = check_ball(cnt, limits, scale, offset)
+        if ball is not None:
+            balls.append(ball)
+    return balls
+
+
+def contour_stats(contours):
+    """
+    Area and bounding-box extents of every contour at once.
+
+    All contour points go into one array; shoelace sums and min/max are
+    reduced per contour with np.*.reduceat. The area is exactly what
+    cv2.contourArea returns. Returns (area, width, height) arrays.
+    """
+    lengths = np.fromiter((len(c) for c in contours), np.intp, len(contours))
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    pts = np.concatenate(contours).reshape(-1, 2).astype(np.float64)
+    x, y = pts[:, 0], pts[:, 1]
+
+    # Index of the next vertex, wrapping to the first vertex of the same contour
+    nxt = np.arange(1, len(pts) + 1)
+    nxt[ends - 1] = starts
+    area = np.abs(np.add.reduceat(x * y[nxt] - x[nxt] * y, starts)) / 2
+
+    width = np.maximum.reduceat(x, starts) - np.minimum.reduceat(x, starts)
+    height = np.maximum.reduceat(y, starts) - np.minimum.reduceat(y, starts)
+    return area, width, height
+
+
+def candidate_mask(area, width, height, limits):
+    """
+    One vectorized pass over contour_stats output.
+
+    Area is exact. The minEnclosingCircle radius is bracketed by the box:
+    at least half the longer side, at most half the diagonal (+-1 for the
+    int() truncation), which also bounds roundness from above. Only contours
+    that could still pass survive, so no real ball is ever dropped.
+    """
+    min_area, max_area, min_radius, max_radius, min_roundness = limits
+    radius_min = np.maximum(width, height) / 2 - 1
+    radius_max = np.sqrt(width ** 2 + height ** 2) / 2 + 1
+    roundness_max = area / (np.pi * np.maximum(radius_min, max(min_radius, 1e-6)) ** 2)
+
+    return ((area >= min_area) & (area <= max_area)
+            & (radius_max >= min_radius) & (radius_min <= max_radius)
+            & (roundness_max >= min_roundness))
+
+
+def find_balls_vectorized(mask, scale=1, slack=0.0, offset=(0, 0)):
+    """Same result and order as the contour loop; only the few survivors of candidate_mask() get minEnclosingCircle."""
+    limits = ball_limits(scale, slack)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return []
+
+    keep = candidate_mask(*contour_stats(contours), limits)
+    balls = []
+    for i in np.flatnonzero(keep):
+        ball = check_ball(contours[i], limits, scale, offset)
+        if ball is not None:
+            balls.append(ball)
+    return balls
+
+
+def merge_windows(windows):
+    """Union overlapping (x0, y0, x1, y1) windows so each ball is refined once."""
+    merged = []
+    for w in sorted(windows):
+        for i, m in enumerate(merged):
+            if w[0] <= m[2] and m[0] <= w[2] and w[1] <= m[3] and m[1] <= w[3]:
+                merged[i] = (min(m[0], w[0]), min(m[1], w[1]), max(m[2], w[2]), max(m[3], w[3]))
+                break
+        else:
+            merged.append(w)
+    if len(merged) < len(windows):
+        return merge_windows(merged)
+    return merged
+
+
+def detect_balls(frame, pyramid=None):
+    """
+    Return ([(center, radius)], mask) for every ball in a BGR frame.
+
+    With pyramid levels > 0, candidates are found on a 2x/4x downscaled frame
+    and each candidate neighborhood is re-checked at full resolution with the
+    normal filters, so the accepted balls match the full-resolution path.
+    """
+    levels = PYRAMID_LEVELS if pyramid is None else pyramid
+    if levels <= 0:
+        mask = ball_mask(frame)
+        return find_balls(mask), mask
+
+    scale = 2 ** levels
+    h, w = frame.shape[:2]
+    small = cv2.resize(frame, (w // scale, h // scale), interpolation=cv2.INTER_AREA)
+    coarse_mask = ball_mask(small, scale)
+
+    windows = []
+    for (cx, cy), radius in find_balls(coarse_mask, scale, slack=PYRAMID_SLACK):
+        reach = int(radius * (1 + PYRAMID_SLACK)) + scale + REFINE_PAD
+        windows.append((max(0, cx - reach), max(0, cy - reach), min(w, cx + reach), min(h, cy + reach)))
+
+    balls = []
+    for x0, y0, x1, y1 in merge_windows(windows):
+        balls.extend(find_balls(ball_mask(frame[y0:y1, x0:x1]), offset=(x0, y0)))
+    return balls, coarse_mask
 
-        cv2.circle(frame, center, radius, (255, 0, 0), 2)
 
-    # ---------------- CHECK IF BALL IS IN BOUNDING BOX ----------------
 # ---------------- STATE MACHINE FOR GOAL DETECTION ----------------
+def normalized_box(box):
+    """(x_min, y_min, x_max, y_max) from two corners dragged in any direction."""
+    x1, y1, x2, y2 = box
+    x_min, x_max = sorted([x1, x2])
+    y_min, y_max = sorted([y1, y2])
+    return x_min, y_min, x_max, y_max
 
-    ball_inside_box_now = False
 
-# ALWAYS draw bounding box if one exists
-    if bbox is not None:
-        x1, y1, x2, y2 = bbox
-        x_min, x_max = sorted([x1, x2])
-        y_min, y_max = sorted([y1, y2])
-        cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 255, 255), 3)
+def ball_in_box(ball_center, box):
+    if ball_center is None or box is None:
+        return False
+    x_min, y_min, x_max, y_max = normalized_box(box)
+    bx, by = ball_center
+    return x_min <= bx <= x_max and y_min <= by <= y_max
 
-    # Check if ball center is inside the box
-    if ball_center is not None:
-        bx, by = ball_center
-        if x_min <= bx <= x_max and y_min <= by <= y_max:
-            ball_inside_box_now = True
-            cv2.putText(frame, "GOAL!", (bx - 30, by - 20),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
 
-# ------------- MQTT SEND ON FIRST ENTRY ONLY -------------
-    current_time = time.time()
+def check_goal(mqtt_device, ball_inside_box_now, current_time):
+    """MQTT send on first entry only (with cooldown); returns True when GOAL was published."""
+    global last_goal_time
 
+    published = False
     if ball_inside_box_now:
         if (not mqtt_device.ball_detected_last) and (current_time - last_goal_time > goal_cooldown):
             mqtt_device.publish_goal()
             last_goal_time = current_time
+            published = True
 
-# Update last state
+    # Update last state
     mqtt_device.ball_detected_last = ball_inside_box_now
+    return published
+
+
+# ---------------- MAIN LOOP ----------------
+def main():
+    # --------------- INIT CAMERA + MQTT ----------------
+    mqtt_device = BallDetectorMQTT()
+
+    cap = cv2.VideoCapture(0) #adjust as necessary usually 0 or 1
+    if not cap.isOpened():
+        print("Error: Could not open camera.")
+        exit()
+
+    cv2.namedWindow("Camera")
+    cv2.setMouseCallback("Camera", draw_bbox)
+
+    print("Starting ball + bounding box goal detector...")
+
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        balls, mask = detect_balls(frame)
+
+        ball_center = balls[-1][0] if balls else None
+
+        for center, radius in balls:
+            cv2.circle(frame, center, radius, (255, 0, 0), 2)
+
+        # ALWAYS draw bounding box if one exists
+        if bbox is not None:
+            x_min, y_min, x_max, y_max = normalized_box(bbox)
+            cv2.rectangle(frame, (x_min, y_min), (x_max, y_max), (0, 255, 255), 3)
+
+        # Check if ball center is inside the box
+        ball_inside_box_now = ball_in_box(ball_center, bbox)
+        if ball_inside_box_now:
+            bx, by = ball_center
+            cv2.putText(frame, "GOAL!", (bx - 30, by - 20),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+
+        check_goal(mqtt_device, ball_inside_box_now, time.time())
+
+        # -------- SHOW WINDOWS --------
+        cv2.imshow("Camera", frame)
+        cv2.imshow("Mask", mask)
 
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
 
-    # -------- SHOW WINDOWS --------
-    cv2.imshow("Camera", frame)
-    cv2.imshow("Mask", mask)
+    cap.release()
+    cv2.destroyAllWindows()
+    print("Program terminated.")
 
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
 
-cap.release()
-cv2.destroyAllWindows()
-print("Program terminated.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 import pygame
 import socket
-import json
 import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from me35codec import Encoder
 # Configuration
 PI_IP = "10.247.137.191"
 PI_PORT = 5005
@@ -9,6 +11,7 @@ MAX_LINEAR_SPEED = 0.5  # m/s
 MAX_ANGULAR_SPEED = 2.0  # rad/s
 DEADZONE = 0.1  # Ignore stick movements smaller than this
 UPDATE_RATE = 20  # Hz
+WIRE_FORMAT = "json"  # "binary" sends 13-byte me35codec frames; ros2_bridge.py must decode them first
 class PS5Controller:
     def __init__(self):
         pygame.init()
@@ -19,6 +22,7 @@ class PS5Controller:
         self.joystick = pygame.joystick.Joystick(0)
         self.joystick.init()
         print(f"Connected to: {self.joystick.get_name()}")
+        self.encoder = Encoder(WIRE_FORMAT)
         # Setup TCP socket
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
@@ -55,8 +59,10 @@ class PS5Controller:
     def send_command(self, twist_msg):
         """Send twist command to Pi"""
         try:
-            data = json.dumps(twist_msg) + '\n'  # Add newline delimiter
-            self.sock.sendall(data.encode('utf-8'))
+            data = self.encoder.twist(twist_msg["linear"]["x"], twist_msg["angular"]["z"])
+            if isinstance(data, str):
+                data = (data + '\n').encode('utf-8')  # Add newline delimiter
+            self.sock.sendall(data)  # binary frames are fixed length, no delimiter needed
         except BrokenPipeError:
             print("\nConnection lost to Pi!")
             return False
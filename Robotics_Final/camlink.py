@@ -0,0 +1,416 @@
+"""
+Camera -> robot UART link, shared by Auto_Camera and Auto_ESP.
+
+Auto_Camera sends "<DIRECTION>_<DISTANCE>" commands (or GOAL_FOUND), or
+in its continuous mode TRACK frames with the blob geometry.
+COMMANDS lists every command it can produce; a command's index is its
+one-byte opcode (new commands go at the end). Upload next to both scripts.
+
+Two wire formats:
+
+- text (the original): "LEFT_FAR\\n". No way to tell a corrupted, lost or
+  stale line from a good one.
+- binary frames, little-endian:
+
+      0xA5 | op (| 0x80: blob follows) | seq | camera ticks_ms u32
+      [ | cx i16 | cy i16 | area u32 ] | CRC8 (poly 0x07) over op..area
+
+  8 bytes, or 16 with the blob. seq counts frames mod 256. TRACK frames
+  carry normalized geometry instead of pixels: cx / cy = offset from the
+  image center in permille of the half width / height (+ = right / down),
+  area = blob area in permille of the camera's NEAR_AREA (1000 = CLOSE).
+
+Text is pure ASCII and SYNC is not, so LinkReceiver takes either from the
+same byte stream, a byte at a time from the caller's fixed buffer. It
+keeps only the newest good command (pending / op / blob fields) and drops
+frames that fail the CRC, repeat or go back in sequence, or are older than
+stale_ms. Link latency is the receive time minus the camera timestamp,
+measured above the fastest frame of the last OFFSET_WINDOW_MS or two (the
+two clocks are not synced; the window lets that floor follow a few tens of
+ppm of drift between them instead of slowly aging every frame into
+"stale"). Clock differences are taken modulo the boards' 30-bit ticks, so
+either clock wrapping does not matter.
+
+python camlink.py runs a host self-test: a frame stream with corruption,
+loss and reordering through LinkReceiver.
+"""
+import struct
+import time
+
+if hasattr(time, "ticks_ms"):
+    ticks_ms = time.ticks_ms
+else:  # host
+    def ticks_ms():
+        return int(time.monotonic() * 1000)
+
+DIRECTIONS = ("LEFT", "CENTER", "RIGHT", "NONE")
+DISTANCES = ("FAR", "CLOSE", "NONE")
+
+COMMANDS = tuple(d + "_" + r for d in DIRECTIONS for r in DISTANCES) + ("GOAL_FOUND", "TRACK")
+OPCODES = dict((name, op) for op, name in enumerate(COMMANDS))
+
+SYNC = 0xA5
+FLAG_BLOB = 0x80
+FRAME_LEN = 8
+BLOB_FRAME_LEN = 16
+MAX_FRAME = BLOB_FRAME_LEN
+MAX_LINE = 32
+RESYNC_AFTER = 3  # this many frames in a row "from the past" means the camera restarted
+OFFSET_WINDOW_MS = 10000  # the latency floor is the fastest frame of this window and the one before
+TICKS_PERIOD = 1 << 30    # ticks_ms() wraps here on the ESP32 and the OpenMV
+
+
+def ticks_delta(d):
+    """A difference of two ticks_ms() values (either clock, any wrap) as a signed ms count."""
+    return ((d + TICKS_PERIOD // 2) & (TICKS_PERIOD - 1)) - TICKS_PERIOD // 2
+
+
+def line_hash(buf, n):
+    """Small-int hash of the first n bytes of buf; allocates nothing on MicroPython."""
+    h = 0
+    for i in range(n):
+        h = (h * 31 + buf[i]) & 0xFFFFFF
+    return h
+
+
+def _crc_table():
+    table = bytearray(256)
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table[i] = crc
+    return bytes(table)
+
+
+CRC_TABLE = _crc_table()
+
+
+def crc8(buf, start, end):
+    crc = 0
+    for i in range(start, end):
+        crc = CRC_TABLE[crc ^ buf[i]]
+    return crc
+
+
+# ---------------- Camera side ----------------
+def encode_into(buf, op, seq, ts_ms, cx=None, cy=None, area=None):
+    """Write one frame into buf (at least MAX_FRAME bytes); returns its length."""
+    has_blob = cx is not None
+    struct.pack_into("<BBBI", buf, 0, SYNC, op | (FLAG_BLOB if has_blob else 0), seq & 0xFF, ts_ms & 0xFFFFFFFF)
+    n = FRAME_LEN - 1
+    if has_blob:
+        struct.pack_into("<hhI", buf, n, cx, cy, area)
+        n = BLOB_FRAME_LEN - 1
+    buf[n] = crc8(buf, 1, n)
+    return n + 1
+
+
+def decode(frame):
+    """(op, seq, ts_ms, (cx, cy, area) or None) from one whole frame, or None if it is not a valid frame."""
+    n = len(frame)
+    if n < FRAME_LEN or frame[0] != SYNC:
+        return None
+    length = BLOB_FRAME_LEN if frame[1] & FLAG_BLOB else FRAME_LEN
+    if n < length or crc8(frame, 1, length - 1) != frame[length - 1]:
+        return None
+    _, op, seq, ts = struct.unpack_from("<BBBI", frame, 0)
+    blob = struct.unpack_from("<hhI", frame, FRAME_LEN - 1) if length == BLOB_FRAME_LEN else None
+    return op & 0x7F, seq, ts, blob
+
+
+# ---------------- Robot side ----------------
+class LinkReceiver:
+    """Incremental frame / text-line parser; see the module docstring."""
+
+    def __init__(self, stale_ms=250, clock=ticks_ms):
+        self.stale_ms = stale_ms
+        self.clock = clock    # receive-side ticks_ms (the self-test swaps in a simulated one)
+        self.frame = bytearray(MAX_FRAME)
+        self.flen = 0
+        self.need = MAX_FRAME
+        self.line = bytearray(MAX_LINE)
+        self.llen = 0
+        # Text lines are looked up by a hash of the line buffer, then compared
+        # byte by byte, so a good line allocates nothing
+        self.text_names = [name.encode() for name in COMMANDS]
+        self.text_ops = {}
+        for op, name in enumerate(self.text_names):
+            self.text_ops.setdefault(line_hash(name, len(name)), op)
+
+        # Newest good command, until the caller clears pending
+        self.pending = False
+        self.op = 0
+        self.seq = None       # None for a text line
+        self.has_blob = False
+        self.cx = self.cy = self.area = 0
+        self.age_ms = 0
+
+        self.last_seq = None
+        self.behind = 0
+        self.offset = None    # latency floor: fastest (receive - camera timestamp) lately
+        self.win_min = None   # fastest delay in the current window
+        self.prev_min = None  # ... and in the previous one
+        self.win_start = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.frames = 0        # good frames
+        self.lines = 0         # good text lines
+        self.superseded = 0    # good commands replaced before the caller took them
+        self.crc_errors = 0
+        self.skipped = 0       # bytes outside any frame or line
+        self.lost = 0          # sequence gaps
+        self.out_of_order = 0  # repeated or older sequence numbers
+        self.stale = 0
+        self.unknown = 0
+        self.latency_total = 0
+        self.latency_max = 0
+
+    def feed(self, buf, n):
+        """Parse the first n bytes of buf; returns True if a new command is pending."""
+        frame = self.frame
+        for i in range(n):
+            b = buf[i]
+            if self.flen:
+                frame[self.flen] = b
+                self.flen += 1
+                if self.flen == 2:
+                    self.need = BLOB_FRAME_LEN if b & FLAG_BLOB else FRAME_LEN
+                elif self.flen == self.need:
+                    self._frame_done()
+            elif b == SYNC:
+                frame[0] = b
+                self.flen = 1
+                self.need = MAX_FRAME
+                self.llen = 0
+            elif b == 0x0A:
+                if self.llen:
+                    self._line_done()
+            elif b < 0x80:
+                if self.llen < MAX_LINE:
+                    self.line[self.llen] = b
+                    self.llen += 1
+                else:
+                    self.skipped += 1
+            else:
+                self.skipped += 1
+        return self.pending
+
+    def _frame_done(self):
+        f = self.frame
+        n = self.need
+        self.flen = 0
+        if crc8(f, 1, n - 1) != f[n - 1]:
+            self.crc_errors += 1
+            self._resync(n)
+            return
+        seq = f[2]
+        ts = f[3] | (f[4] << 8) | (f[5] << 16) | (f[6] << 24)
+        if self.last_seq is not None:
+            step = (seq - self.last_seq) & 0xFF
+            if step == 0 or step >= 128:
+                self.behind += 1
+                if self.behind < RESYNC_AFTER:
+                    self.out_of_order += 1
+                    return
+                self.offset = None  # the camera restarted: its clock did too
+            elif step > 1:
+                self.lost += step - 1
+        self.behind = 0
+        self.last_seq = seq
+        self.frames += 1
+
+        age = self._age(ts)
+        self.latency_total += age
+        if age > self.latency_max:
+            self.latency_max = age
+        if age > self.stale_ms:
+            self.stale += 1
+            return
+        op = f[1] & 0x7F
+        if op >= len(COMMANDS):
+            self.unknown += 1
+            return
+        self._accept(op, seq, age)
+        self.has_blob = n == BLOB_FRAME_LEN
+        if self.has_blob:
+            cx = f[7] | (f[8] << 8)
+            cy = f[9] | (f[10] << 8)
+            self.cx = cx - 65536 if cx & 0x8000 else cx
+            self.cy = cy - 65536 if cy & 0x8000 else cy
+            self.area = f[11] | (f[12] << 8) | (f[13] << 16) | (f[14] << 24)
+
+    def _age(self, ts):
+        """ms this frame spent above the latency floor, updating the floor's windows."""
+        now = self.clock()
+        delay = ticks_delta(now - ts)
+        if self.offset is None or ticks_delta(delay - self.offset) > 60000:
+            # First frame, or a jump no link delay explains (a clock restarted)
+            self.offset = self.win_min = self.prev_min = delay
+            self.win_start = now
+        if ticks_delta(delay - self.win_min) < 0:
+            self.win_min = delay
+        if ticks_delta(now - self.win_start) >= OFFSET_WINDOW_MS:
+            self.prev_min = self.win_min
+            self.win_min = delay
+            self.win_start = now
+        # min of the two windows: follows drift, but one late frame never raises the floor
+        self.offset = self.win_min if ticks_delta(self.win_min - self.prev_min) < 0 else self.prev_min
+        return ticks_delta(delay - self.offset)
+
+    def _resync(self, n):
+        """After a bad CRC, restart from the next SYNC inside the rejected bytes (if any)."""
+        f = self.frame
+        for j in range(1, n):
+            if f[j] == SYNC:
+                rest = f[j:n]
+                self.flen = 0
+                self.skipped += j
+                self.feed(rest, len(rest))
+                return
+        self.skipped += n
+
+    def _line_done(self):
+        n = self.llen
+        self.llen = 0
+        if self.line[n - 1] == 0x0D:
+            n -= 1
+        op = self.text_ops.get(line_hash(self.line, n))
+        if op is not None and not self._line_is(self.text_names[op], n):
+            op = None
+        if op is None:
+            # Hand-typed or odd lines: the forgiving match handle_cmd used to do
+            line = bytes(self.line[:n])
+            text = line.strip().upper()
+            if text in self.text_names:
+                op = self.text_names.index(text)
+            elif b"NONE" in text:
+                op = OPCODES["NONE_NONE"]
+            else:
+                if text:
+                    self.unknown += 1
+                    print("Unknown command:", line)
+                return
+        self.lines += 1
+        self._accept(op, None, 0)
+        self.has_blob = False
+
+    def _line_is(self, name, n):
+        """True if the first n bytes of the line buffer are exactly name."""
+        if len(name) != n:
+            return False
+        line = self.line
+        for i in range(n):
+            if line[i] != name[i]:
+                return False
+        return True
+
+    def _accept(self, op, seq, age):
+        if self.pending:
+            self.superseded += 1
+        self.pending = True
+        self.op = op
+        self.seq = seq
+        self.age_ms = age
+
+    def error_rate(self):
+        """Bad or missing frames / everything the camera sent."""
+        bad = self.crc_errors + self.lost + self.out_of_order + self.stale + self.unknown
+        total = self.frames + self.lines + self.crc_errors + self.lost + self.out_of_order
+        return bad / total if total else 0.0
+
+    def print_stats(self):
+        avg = self.latency_total // self.frames if self.frames else 0
+        print("link: %d frames, %d text lines, %d superseded | lost %d, out of order %d, stale %d, "
+              "CRC errors %d, unknown %d, skipped bytes %d | error rate %.1f%% | latency avg %d ms, max %d ms"
+              % (self.frames, self.lines, self.superseded, self.lost, self.out_of_order, self.stale,
+                 self.crc_errors, self.unknown, self.skipped, 100 * self.error_rate(), avg, self.latency_max))
+
+
+# ---------------- Self-test ----------------
+def main(count=5000, seed=35):
+    """
+    Send frames through a noisy wire (drops, bit flips, swapped pairs, the
+    odd text line), fed to LinkReceiver in randomly split pieces, and check
+    that every command it delivers is one that was sent under that seq.
+    """
+    import random
+    rng = random.Random(seed)
+    buf = bytearray(MAX_FRAME)
+    rx = LinkReceiver()
+    sent = {}  # seq -> op
+    held = None
+    delivered = 0
+    parse_s = 0.0
+    wire_bytes = 0
+    for seq in range(count):
+        op = rng.randrange(len(COMMANDS))
+        blob = (rng.randrange(-50, 200), rng.randrange(120), rng.randrange(20000)) if rng.random() < 0.7 else (None,) * 3
+        ts = ticks_ms()
+        n = encode_into(buf, op, seq, ts, *blob)
+        wire = bytearray(buf[:n])
+        assert decode(wire) == (op, seq & 0xFF, ts, None if blob[0] is None else blob)
+        sent[seq & 0xFF] = op
+
+        roll = rng.random()
+        if roll < 0.01:
+            continue  # lost
+        if roll < 0.02:
+            wire[rng.randrange(1, n)] ^= 1 << rng.randrange(8)  # bit flip
+        elif roll < 0.03 and held is None:
+            held = wire  # goes out after the next frame
+            continue
+        elif roll > 0.99:
+            wire = COMMANDS[op].lower().encode() + b"\r\n"
+        if held is not None:
+            wire += held
+            held = None
+
+        wire_bytes += len(wire)
+        cut = rng.randrange(len(wire) + 1)
+        t0 = time.perf_counter()
+        rx.feed(wire, cut)
+        rx.feed(wire[cut:], len(wire) - cut)
+        parse_s += time.perf_counter() - t0
+        if rx.pending:
+            rx.pending = False
+            delivered += 1
+            assert rx.seq is None or sent[rx.seq] == rx.op, "corrupted command delivered"
+
+    rx.print_stats()
+    print("%d frames sent, %d commands delivered, none corrupted; %.2f us per wire byte"
+          % (count, delivered, 1e6 * parse_s / wire_bytes))
+    drift_test(rng)
+
+
+def drift_test(rng, hours=2, fps=10, ppm=60):
+    """
+    Two hours of frames from a camera whose clock runs ppm slow, with 2-30 ms
+    of jitter and both clocks wrapping: nothing may go stale, and a frame
+    held back by 400 ms still must.
+    """
+    robot_start = TICKS_PERIOD - 600000  # the ESP wraps 10 minutes in
+    robot = [robot_start]
+    clock = lambda: robot[0]  # noqa: E731
+    rx = LinkReceiver(clock=clock)
+    buf = bytearray(MAX_FRAME)
+    cam_start = TICKS_PERIOD - 3000000  # ... the camera after 50
+    frames = int(hours * 3600 * fps)
+    for seq in range(frames):
+        sent = seq * 1000 // fps
+        cam_ts = (cam_start + sent - sent * ppm // 1000000) & (TICKS_PERIOD - 1)
+        late = 400 if seq == frames - 10 else rng.randrange(2, 30)
+        robot[0] = (robot_start + 5000 + sent + late) & (TICKS_PERIOD - 1)
+        n = encode_into(buf, 0, seq, cam_ts)
+        rx.feed(buf, n)
+        if rx.pending:
+            rx.pending = False
+    print("drift %d ppm over %d h: %d frames, %d stale, latency max %d ms"
+          % (ppm, hours, rx.frames, rx.stale, rx.latency_max))
+    assert robot[0] < robot_start and cam_ts < cam_start, "the clocks never wrapped"
+    assert rx.frames == frames and rx.stale == 1, "drift aged frames into stale"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Micro-benchmark: Auto_ESP command dispatch, old if/elif chain vs the link parser + table.
+
+Runs on the ESP32 (`mpremote run dispatch_bench.py` with Auto_ESP.py and its
+modules on the board) or on the host against the HAL fakes
+(`python Robotics_Final/dispatch_bench.py`).
+The same mix of camera lines goes through three paths, all ending in the
+same sequencer calls:
+
+    chain   decode().strip().upper() + the if/elif chain handle_cmd used to be
+    link    the line through RobotDevice.link (camlink.LinkReceiver.feed) and
+            RobotDevice.handle_opcode, as the robot's UART task runs it
+    opcode  RobotDevice.handle_opcode: list index by one-byte opcode
+
+and each reports commands/s, mean/max per-command latency and, on the
+board, heap bytes allocated per command (gc.mem_alloc). A second pass swaps
+in a sequencer that does nothing, to time the dispatch alone (on the host
+the recorded PWM / NeoPixel writes otherwise dominate).
+"""
+import gc
+import time
+
+if not hasattr(time, "ticks_us"):  # host: run against the HAL fakes
+    import os
+    import sys
+    HERE = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, HERE)
+    sys.path.insert(0, os.path.dirname(HERE))
+    import hal
+    hal.install()
+
+import Auto_ESP
+from camlink import COMMANDS, OPCODES
+
+if hasattr(time, "perf_counter"):  # host: real clock (the HAL's ticks are virtual)
+    def now_us():
+        return time.perf_counter() * 1000000
+
+    def elapsed_us(start):
+        return now_us() - start
+else:
+    now_us = time.ticks_us
+
+    def elapsed_us(start):
+        return time.ticks_diff(time.ticks_us(), start)
+
+
+def link_dispatch(robot, line):
+    """What read_link / dispatch_pending do with one text line from the UART."""
+    link = robot.link
+    if link.feed(line, len(line)):
+        link.pending = False
+        robot.handle_opcode(link.op)
+
+
+def chain_dispatch(robot, line):
+    """handle_cmd before the dispatch table (same sequencer calls, same state check)."""
+    cmd = line.decode().strip().upper()
+    if not cmd:
+        return
+    if robot.state == "WAITING_GOAL_RESET":
+        return
+    if cmd == "LEFT_FAR":
+        robot.seq.start(cmd, robot.SEQ_LEFT_FAR)
+    elif cmd == "LEFT_CLOSE":
+        robot.seq.start(cmd, robot.SEQ_LEFT_CLOSE)
+    elif cmd == "RIGHT_FAR":
+        robot.seq.start(cmd, robot.SEQ_RIGHT_FAR)
+    elif cmd == "RIGHT_CLOSE":
+        robot.seq.start(cmd, robot.SEQ_RIGHT_CLOSE)
+    elif cmd == "CENTER_FAR":
+        robot.seq.start(cmd, robot.SEQ_CENTER_FAR)
+    elif cmd == "CENTER_CLOSE":
+        robot.seq.start(cmd, robot.SEQ_CENTER_CLOSE)
+    elif "NONE" in cmd:
+        robot.seq.start("NONE", robot.SEQ_NONE)
+    else:
+        print("Unknown command:", cmd)
+
+
+class NullSequencer:
+    def start(self, name, steps, preemptible=True, on_abort=None):
+        return True
+
+
+def measure(label, fn, robot, inputs, rounds):
+    """Call fn(robot, x) for every input, `rounds` times; print rate, latency and allocation."""
+    gc.collect()
+    alloc0 = gc.mem_alloc() if hasattr(gc, "mem_alloc") else None
+    total = 0
+    worst = 0
+    n = 0
+    for _ in range(rounds):
+        for x in inputs:
+            t0 = now_us()
+            fn(robot, x)
+            dt = elapsed_us(t0)
+            total += dt
+            if dt > worst:
+                worst = dt
+            n += 1
+    alloc = "%.1f B/cmd" % ((gc.mem_alloc() - alloc0) / n) if alloc0 is not None else "alloc n/a on host"
+    print("%-7s %6d cmds  %9.0f cmds/s  mean %7.2f us  max %7.1f us  %s"
+          % (label, n, 1000000.0 * n / total, total / n, worst, alloc))
+    return total / n
+
+
+def main(rounds=50):
+    robot = Auto_ESP.RobotDevice()
+    robot.seq.log = False  # preempting CENTER_CLOSE would print every time
+    # The discrete commands the camera sends while searching (GOAL_FOUND would park the robot
+    # in WAITING_GOAL_RESET; TRACK carries geometry the chain never had)
+    names = [name for name in COMMANDS if name not in ("GOAL_FOUND", "TRACK")]
+    lines = [name.encode() + b"\n" for name in names]
+    opcodes = [OPCODES[name] for name in names]
+
+    for label, seq in (("with actuation", robot.seq), ("dispatch only", NullSequencer())):
+        robot.seq = seq
+        print("--", label)
+        chain = measure("chain", chain_dispatch, robot, lines, rounds)
+        link = measure("link", link_dispatch, robot, lines, rounds)
+        opcode = measure("opcode", Auto_ESP.RobotDevice.handle_opcode, robot, opcodes, rounds)
+        print("link %.2fx, opcode %.2fx the chain's throughput" % (chain / link, chain / opcode))
+
+
+if __name__ == "__main__":
+    main()
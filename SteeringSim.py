@@ -0,0 +1,218 @@
+"""
+Closed-loop host simulation of the ball -> goal run: Auto_Camera and
+Auto_ESP run unchanged on the HAL with their UARTs linked, and a small
+differential-drive model moves the robot from the motor PWM duties and
+renders the ball / goal blobs the camera sees.
+
+    python SteeringSim.py                       # both modes on the default tracks
+    python SteeringSim.py --tracks 20 --record tracks.json
+    python SteeringSim.py --load tracks.json --modes continuous -v
+
+A track is a start layout: the robot pose plus where the ball (FIRST_COLOR)
+and the goal (SECOND_COLOR) are. It is generated from --seed or loaded
+from a --record'ed JSON file, so both modes replay exactly the same tracks.
+The tracks are synthetic: there are no recorded blob tracks from the robot
+yet, so results say how the two controllers compare on this model, not
+what gains the real robot needs.
+Each run reports
+    frames to center  camera frames from the start until the camera first
+                      calls the ball CENTER (decide_direction), and until it
+                      first sits inside the DEADBAND_PCT band around the middle
+    crossings         times the ball crossed the image center before the
+                      robot reached it (oscillation)
+    ball / goal time  virtual seconds until the camera switched to the goal
+                      color, and until the robot got GOAL_FOUND
+for the discrete mode (LEFT/CENTER/RIGHT x FAR/CLOSE, fixed SPEED) and the
+continuous mode (TRACK frames, PI steering).
+"""
+import argparse
+import importlib
+import json
+import math
+import os
+import random
+import sys
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "Robotics_Final"))
+sys.path.insert(0, ROOT)
+
+import hal  # noqa: E402
+
+# ---------------- World model ----------------
+VMAX_CM_S = 60.0       # wheel speed at duty 1023
+WHEEL_BASE_CM = 15.0
+FOV_DEG = 60.0         # horizontal field of view
+BALL_RADIUS_CM = 3.5
+GOAL_RADIUS_CM = 10.0
+
+
+def load(name):
+    sys.modules.pop(name, None)
+    return importlib.import_module(name)
+
+
+def make_tracks(count, seed):
+    """Ball 40-100 cm away and 8-28 deg off the heading (in view); goal 100-200 cm beyond it."""
+    rng = random.Random(seed)
+    tracks = []
+    for _ in range(count):
+        bearing = math.radians(rng.uniform(8, 28) * rng.choice((-1, 1)))
+        dist = rng.uniform(40, 100)
+        ball = [dist * math.cos(bearing), dist * math.sin(bearing)]
+        heading = rng.uniform(0, 2 * math.pi)
+        gdist = rng.uniform(100, 200)
+        goal = [ball[0] + gdist * math.cos(heading), ball[1] + gdist * math.sin(heading)]
+        tracks.append({"robot": [0.0, 0.0, 0.0], "ball": ball, "goal": goal})
+    return tracks
+
+
+class World:
+    """Robot pose (cm, rad, CCW positive) and what the camera renders from it."""
+
+    def __init__(self, track, width, height):
+        self.x, self.y, heading = track["robot"]
+        self.heading = math.radians(heading)
+        self.ball = track["ball"]
+        self.goal = track["goal"]
+        self.width = width
+        self.height = height
+        self.focal = (width / 2.0) / math.tan(math.radians(FOV_DEG) / 2)
+
+    def blob(self, target, radius):
+        """The target as a sensor.Blob, or None when it is out of view."""
+        from hal import sensor
+        dx, dy = target[0] - self.x, target[1] - self.y
+        dist = max(math.hypot(dx, dy), radius)
+        bearing = math.atan2(dy, dx) - self.heading
+        bearing = math.atan2(math.sin(bearing), math.cos(bearing))  # left of heading is positive
+        if abs(bearing) > math.radians(FOV_DEG) / 2:
+            return None
+        cx = self.width / 2.0 - self.focal * math.tan(bearing)
+        r_px = self.focal * radius / dist
+        area = math.pi * r_px * r_px
+        return sensor.Blob(max(0, min(self.width - 1, cx)), self.height * 2 // 3, area)
+
+    def move(self, robot, dt):
+        """
+        Integrate dt seconds at the robot's current duties. The channel names
+        do not say which wheel is which; the L_* channel drives the wheel that
+        makes spin_right turn the robot right, as the RIGHT_* commands need.
+        """
+        l_ch = (robot.L_IN1.duty() - robot.L_IN2.duty()) / 1023.0 * VMAX_CM_S
+        r_ch = (robot.R_IN1.duty() - robot.R_IN2.duty()) / 1023.0 * VMAX_CM_S
+        right_wheel, left_wheel = l_ch, r_ch
+        v = (left_wheel + right_wheel) / 2
+        omega = (right_wheel - left_wheel) / WHEEL_BASE_CM
+        self.heading += omega * dt
+        self.x += v * math.cos(self.heading) * dt
+        self.y += v * math.sin(self.heading) * dt
+
+
+# ---------------- One run ----------------
+def run_track(track, mode, args):
+    """Returns frames_to_center, frames_to_deadband, crossings, ball_s, goal_s (None where not reached)."""
+    from hal import machine, sensor, uasyncio, utime
+    hal.reset()
+    sensor.FPS = 1000000  # the camera's frame time is spent in the loop below, with the robot running
+    cam = load("Auto_Camera")
+    cam.CONTROL_MODE = mode
+    robot = load("Auto_ESP").RobotDevice()
+    robot.seq.log = False
+    machine.link(machine.uart(3), machine.uart(1))
+    uasyncio.create_task(robot.main())
+
+    width, height = sensor.width(), sensor.height()
+    world = World(track, width, height)
+    first = cam.COLOR_THRESHOLDS[cam.FIRST_COLOR]
+    second = cam.COLOR_THRESHOLDS[cam.SECOND_COLOR]
+    frame_ms = 1000.0 / args.fps
+    substeps = 4
+    start = utime.now_us()
+    frames_to_center = frames_to_deadband = crossings = ball_s = goal_s = None
+    last_side = 0
+    deadband = cam.DEADBAND_PCT * width
+
+    for frame in range(int(args.timeout_s * args.fps)):
+        ball = world.blob(world.ball, BALL_RADIUS_CM)
+        goal = world.blob(world.goal, GOAL_RADIUS_CM)
+        sensor.set_blobs(first, [ball] if ball is not None else [])
+        sensor.set_blobs(second, [goal] if goal is not None else [])
+
+        if ball_s is None and ball is not None:
+            offset = ball.cx() - width / 2.0
+            if frames_to_center is None and cam.decide_direction(ball.cx(), width) == "CENTER":
+                frames_to_center = frame
+            if frames_to_deadband is None and abs(offset) <= deadband:
+                frames_to_deadband = frame
+            side = (offset > deadband) - (offset < -deadband)
+            if side and last_side and side != last_side:
+                crossings = (crossings or 0) + 1
+            last_side = side or last_side
+
+        cam.step()
+        if ball_s is None and cam.tracking_color == cam.SECOND_COLOR:
+            ball_s = (utime.now_us() - start) / 1e6
+        for _ in range(substeps):
+            uasyncio.run_for(frame_ms / substeps)
+            world.move(robot, frame_ms / substeps / 1000.0)
+        if robot.state == "WAITING_GOAL_RESET":
+            goal_s = (utime.now_us() - start) / 1e6
+            break
+    return frames_to_center, frames_to_deadband, crossings or 0, ball_s, goal_s
+
+
+def summarize(values):
+    done = [v for v in values if v is not None]
+    if not done:
+        return "-", len(values)
+    return "%.2f" % (sum(done) / len(done)), len(values) - len(done)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Discrete vs continuous steering, closed loop on the HAL")
+    parser.add_argument("--tracks", type=int, default=10, help="generated tracks (ignored with --load)")
+    parser.add_argument("--seed", type=int, default=35)
+    parser.add_argument("--load", help="JSON file of tracks (from --record)")
+    parser.add_argument("--record", help="write the tracks used to this JSON file")
+    parser.add_argument("--modes", default="discrete,continuous")
+    parser.add_argument("--fps", type=float, default=30.0, help="camera frame rate")
+    parser.add_argument("--timeout-s", type=float, default=60.0, help="give up on a track after this long")
+    parser.add_argument("-v", "--verbose", action="store_true", help="per-track results and the scripts' prints")
+    args = parser.parse_args()
+
+    if args.load:
+        with open(args.load) as f:
+            tracks = json.load(f)["tracks"]
+    else:
+        tracks = make_tracks(args.tracks, args.seed)
+    if args.record:
+        with open(args.record, "w") as f:
+            json.dump({"tracks": tracks}, f, indent=1)
+        print("Wrote %d tracks to %s" % (len(tracks), args.record))
+
+    hal.install()
+    print("%-11s %6s %17s %10s %10s %8s %8s  %s"
+          % ("mode", "tracks", "frames to center", "deadband", "crossings", "ball s", "goal s",
+             "not reached (center/deadband/ball/goal)"))
+    for mode in args.modes.split(","):
+        results = []
+        for i, track in enumerate(tracks):
+            with open(os.devnull, "w") as devnull, redirect_stdout(sys.stdout if args.verbose else devnull):
+                result = run_track(track, mode, args)
+            results.append(result)
+            if args.verbose:
+                print("  %s track %d: frames to center %s, to deadband %s, crossings %d, ball %s s, goal %s s"
+                      % ((mode, i) + result))
+        center, center_miss = summarize([r[0] for r in results])
+        band, band_miss = summarize([r[1] for r in results])
+        crossings = sum(r[2] for r in results) / float(len(results))
+        ball, ball_miss = summarize([r[3] for r in results])
+        goal, goal_miss = summarize([r[4] for r in results])
+        print("%-11s %6d %17s %10s %10.1f %8s %8s  %d/%d/%d/%d"
+              % (mode, len(results), center, band, crossings, ball, goal, center_miss, band_miss, ball_miss, goal_miss))
+
+
+if __name__ == "__main__":
+    main()
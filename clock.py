@@ -91,10 +91,10 @@ def update_clock_servo():
             current_hours = (current_hours + 1) % 24
 
 # ---- Main Loop ----
-print("Starting... initial mode:", mode)
-fetch_world_time()  # Initial sync
+def step():
+    """One pass of the main loop: button check, then one clock tick or one temp-mode wait."""
+    global mode, last_button
 
-while True:
     # --- Button Handling for Mode Toggle ---
     button_state = button.value()
     if button_state == 0 and last_button == 1:
@@ -118,4 +118,11 @@ while True:
         if update_temp_servo_nonblocking():
             mode = "clock"
             print("Mode changed to:", mode)
-            fetch_world_time()
\ No newline at end of file
+            fetch_world_time()
+
+if __name__ == "__main__":
+    print("Starting... initial mode:", mode)
+    fetch_world_time()  # Initial sync
+
+    while True:
+        step()
\ No newline at end of file
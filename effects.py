@@ -0,0 +1,116 @@
+"""
+Cooperative scheduler for timed LED / buzzer effects.
+
+MQTT callbacks used to time.sleep(0.5) between "on" and "off", which froze
+message handling (and the motors' last command) for half a second. Here an
+effect does its "on" step immediately and queues the "off" step; the main
+loop calls EffectScheduler.poll() and due steps run there.
+
+Entries have a key: scheduling a key that is already pending replaces it,
+so a second flash while the first is still lit just extends it instead of
+having the first one's "off" cut the second short.
+
+MicroPython and CPython compatible (tests/test_effects.py drives it through
+MissionControl_Receiver on the host HAL).
+"""
+import time
+
+# Timestamps are ticks_ms() on the board; fall back to a monotonic ms clock on the host
+if hasattr(time, "ticks_ms"):
+    ticks_ms = time.ticks_ms
+    ticks_add = time.ticks_add
+    ticks_diff = time.ticks_diff
+else:
+    def ticks_ms():
+        return int(time.monotonic() * 1000)
+
+    def ticks_add(t, delta):
+        return t + delta
+
+    def ticks_diff(a, b):
+        return a - b
+
+
+class EffectScheduler:
+    """Fixed number of pending (key, due, fn, arg) slots, run from the main loop by poll()."""
+
+    def __init__(self, capacity=8):
+        self.keys = [None] * capacity
+        self.due = [0] * capacity
+        self.fns = [None] * capacity
+        self.args = [None] * capacity
+        self.pending = 0
+        self.dropped = 0
+
+    def after(self, key, delay_ms, fn, arg=None):
+        """Run fn(arg) delay_ms from now, replacing anything pending under the same key."""
+        free = -1
+        for i in range(len(self.keys)):
+            if self.keys[i] == key:
+                free = i
+                self.pending -= 1
+                break
+            if free < 0 and self.keys[i] is None:
+                free = i
+        if free < 0:
+            self.dropped += 1
+            return False
+        self.keys[free] = key
+        self.due[free] = ticks_add(ticks_ms(), delay_ms)
+        self.fns[free] = fn
+        self.args[free] = arg
+        self.pending += 1
+        return True
+
+    def cancel(self, key):
+        for i in range(len(self.keys)):
+            if self.keys[i] == key:
+                self.keys[i] = None
+                self.fns[i] = self.args[i] = None
+                self.pending -= 1
+
+    def poll(self):
+        """Run every step that is due; returns how many ran."""
+        if not self.pending:
+            return 0
+        now = ticks_ms()
+        ran = 0
+        for i in range(len(self.keys)):
+            if self.keys[i] is not None and ticks_diff(now, self.due[i]) >= 0:
+                fn, arg = self.fns[i], self.args[i]
+                self.keys[i] = None
+                self.fns[i] = self.args[i] = None
+                self.pending -= 1
+                fn(arg)
+                ran += 1
+        return ran
+
+
+# ---------------- LED / buzzer effects ----------------
+OFF = (0, 0, 0)
+
+
+class Effects:
+    """NeoPixel flashes and buzzer beeps as scheduled on/off steps."""
+
+    def __init__(self, scheduler, np=None, buzzer=None):
+        self.scheduler = scheduler
+        self.np = np
+        self.buzzer = buzzer
+
+    def _pixel_off(self, index):
+        self.np[index] = OFF
+        self.np.write()
+
+    def _buzzer_off(self, _):
+        self.buzzer.duty(0)
+
+    def flash(self, color, duration_ms=500, index=0):
+        """Light pixel `index` now and turn it off after duration_ms."""
+        self.np[index] = color
+        self.np.write()
+        self.scheduler.after(("led", index), duration_ms, self._pixel_off, index)
+
+    def beep(self, duration_ms=500, duty=512):
+        self.buzzer.duty(duty)
+        self.scheduler.after("buzzer", duration_ms, self._buzzer_off)
@@ -0,0 +1,358 @@
+"""
+Low-allocation decoder for the small JSON messages the ESP32 receivers get.
+
+json.loads builds a dict (plus keys, strings and lists) for every message and
+msg.decode() copies the payload again; at 20-100 messages/s that garbage is
+what triggers the GC pauses behind motor stutter. FastDecoder scans the bytes
+payload in place for the keys we know about and writes the values into
+preallocated fields, so the only allocation per message is the float it
+returns (MicroPython boxes floats; ints stay small ints).
+
+Known shapes:
+    {"distance_error": 0.01, "position_error": -42}
+    {"accel": {"x": 0.12, "y": ..., "z": ...}}
+    {"accel": {...newest...}, "batch": [[x, y, z], ...], "period_ms": 20}
+    {"color": [0, 0, 225]}
+    {"Buzzer": true}
+
+Binary me35codec messages (first byte me35codec.MAGIC) are unpacked into the
+same fields, so receivers handle both formats through one decode() call.
+
+Runs unchanged on MicroPython and CPython (python fastmsg.py benchmarks it).
+"""
+import gc
+import json
+import time
+
+import me35codec
+
+try:
+    from micropython import const
+except ImportError:
+    def const(x):
+        return x
+
+# decode() returns a bitmask of the fields found in the message
+FIELD_DIST = const(1)
+FIELD_POS = const(2)
+FIELD_ACCEL_X = const(4)
+FIELD_COLOR = const(8)
+FIELD_BUZZER = const(16)
+FIELD_BLOB = const(32)
+FIELD_TWIST = const(64)
+
+_SPACE = const(32)
+_COLON = const(58)
+_MINUS = const(45)
+_PLUS = const(43)
+_DOT = const(46)
+_ZERO = const(48)
+_NINE = const(57)
+_LOWER_E = const(101)
+_UPPER_E = const(69)
+_LOWER_T = const(116)
+_LBRACKET = const(91)
+_RBRACKET = const(93)
+_COMMA = const(44)
+
+
+class FastDecoder:
+    """
+    Parse known keys straight out of a bytes payload.
+
+    The scan is key-based (bytes.find), not a full JSON parser: a key name
+    appearing inside a string value would confuse it, which none of our
+    publishers do. Anything it cannot parse is simply reported as absent.
+    """
+
+    def __init__(self):
+        self.dist_e = 0.0
+        self.pos_e = 0.0
+        self.accel_x = 0.0
+        self.batch_count = 0  # samples in the last accel message (the newest one lands in accel_x)
+        self.color = [0, 0, 0]  # filled in place; hand it straight to NeoPixel
+        self.buzzer = False
+        self.cx = self.cy = self.area = self.width = self.height = 0
+        self.linear_x = self.angular_z = 0.0
+        self.end = 0  # index just past the last parsed value
+
+        # Binary messages carry a sequence number; count what went missing
+        self.seq = -1
+        self.seq_gaps = 0
+
+    def _value_start(self, msg, key, start=0):
+        """Index of the first byte of key's value, or -1."""
+        i = msg.find(key, start)
+        if i < 0:
+            return -1
+        i += len(key)
+        n = len(msg)
+        while i < n and (msg[i] == _SPACE or msg[i] == _COLON):
+            i += 1
+        return i if i < n else -1
+
+    def _number(self, msg, i):
+        """Parse an int/float starting at i; sets self.end. Returns None when there is no number."""
+        n = len(msg)
+        neg = False
+        if i < n and msg[i] == _MINUS:
+            neg = True
+            i += 1
+        start = i
+        mant = 0
+        while i < n and _ZERO <= msg[i] <= _NINE:
+            mant = mant * 10 + msg[i] - _ZERO
+            i += 1
+        scale = 0
+        if i < n and msg[i] == _DOT:
+            i += 1
+            while i < n and _ZERO <= msg[i] <= _NINE:
+                # Past ~9 digits the mantissa would leave small-int range; drop the extra precision
+                if mant < 100000000:
+                    mant = mant * 10 + msg[i] - _ZERO
+                    scale -= 1
+                i += 1
+        if i == start:
+            return None
+        if i < n and (msg[i] == _LOWER_E or msg[i] == _UPPER_E):
+            i += 1
+            exp_neg = False
+            if i < n and (msg[i] == _MINUS or msg[i] == _PLUS):
+                exp_neg = msg[i] == _MINUS
+                i += 1
+            exp = 0
+            while i < n and _ZERO <= msg[i] <= _NINE:
+                exp = exp * 10 + msg[i] - _ZERO
+                i += 1
+            scale += -exp if exp_neg else exp
+        self.end = i
+        if neg:
+            mant = -mant
+        if scale == 0:
+            return mant
+        if scale > 0:
+            return mant * 10 ** scale
+        return mant / 10 ** -scale
+
+    def _int_list(self, msg, i, out):
+        """Parse [a, b, c] of ints into out; returns how many were stored."""
+        if msg[i] != _LBRACKET:
+            return 0
+        i += 1
+        count = 0
+        n = len(msg)
+        while i < n and count < len(out):
+            while i < n and msg[i] == _SPACE:
+                i += 1
+            if i < n and msg[i] == _RBRACKET:
+                break
+            value = self._number(msg, i)
+            if value is None:
+                return 0
+            out[count] = int(value)
+            count += 1
+            i = self.end
+            while i < n and msg[i] == _SPACE:
+                i += 1
+            if i < n and msg[i] == _COMMA:
+                i += 1
+        return count
+
+    def _decode_binary(self, msg):
+        decoded = me35codec.decode(msg)
+        if decoded is None:
+            return 0
+        msg_type, seq, values = decoded
+        if self.seq >= 0 and seq != (self.seq + 1) & 0xFFFF:
+            self.seq_gaps += 1
+        self.seq = seq
+        if msg_type == me35codec.TYPE_ERRORS:
+            self.dist_e, self.pos_e = values
+            return FIELD_DIST | FIELD_POS
+        if msg_type == me35codec.TYPE_ACCEL:
+            self.accel_x = values[0]
+            self.batch_count = 1
+            return FIELD_ACCEL_X
+        if msg_type == me35codec.TYPE_ACCEL_BATCH:
+            count = values[0]
+            if count == 0:
+                return 0
+            # values = (count, period_ms, x0, y0, z0, ...); drive from the newest sample
+            self.accel_x = values[2 + 3 * (count - 1)] / 1000
+            self.batch_count = count
+            return FIELD_ACCEL_X
+        if msg_type == me35codec.TYPE_COLOR:
+            self.color[0], self.color[1], self.color[2] = values
+            return FIELD_COLOR
+        if msg_type == me35codec.TYPE_BUZZER:
+            self.buzzer = values[0] != 0
+            return FIELD_BUZZER
+        if msg_type == me35codec.TYPE_BLOB:
+            self.cx, self.cy, self.area, self.width, self.height = values
+            return FIELD_BLOB
+        if msg_type == me35codec.TYPE_TWIST:
+            self.linear_x, self.angular_z = values
+            return FIELD_TWIST
+        return 0
+
+    def decode(self, msg):
+        """Parse a bytes payload (JSON or me35codec binary); returns the FIELD_* mask of what was found."""
+        if me35codec.is_binary(msg):
+            return self._decode_binary(msg)
+        found = 0
+        i = self._value_start(msg, b'"distance_error"')
+        if i >= 0:
+            value = self._number(msg, i)
+            if value is not None:
+                self.dist_e = value
+                found |= FIELD_DIST
+        i = self._value_start(msg, b'"position_error"')
+        if i >= 0:
+            value = self._number(msg, i)
+            if value is not None:
+                self.pos_e = value
+                found |= FIELD_POS
+        i = msg.find(b'"accel"')
+        if i >= 0:
+            i = self._value_start(msg, b'"x"', i)
+            if i >= 0:
+                value = self._number(msg, i)
+                if value is not None:
+                    self.accel_x = value
+                    self.batch_count = 1
+                    found |= FIELD_ACCEL_X
+        i = self._value_start(msg, b'"color"')
+        if i >= 0 and self._int_list(msg, i, self.color) == 3:
+            found |= FIELD_COLOR
+        i = self._value_start(msg, b'"Buzzer"')
+        if i >= 0:
+            self.buzzer = msg[i] == _LOWER_T
+            found |= FIELD_BUZZER
+        return found
+
+
+# ---------------- Memory reporting ----------------
+def mem_free():
+    """Free heap bytes (gc.mem_free on MicroPython, -1 where it does not exist)."""
+    return gc.mem_free() if hasattr(gc, "mem_free") else -1
+
+
+def mem_report(label=""):
+    print("%s mem_free %d B" % (label, mem_free()))
+
+
+# ---------------- Benchmark ----------------
+SAMPLES = (
+    b'{"distance_error": 0.0123, "position_error": -42.5}',
+    b'{"distance_error": -3.2e-05, "position_error": 118}',
+    b'{"accel": {"x": 0.41, "y": -0.02, "z": 0.98}}',
+    b'{"color":[0,0,225]}',
+    b'{"Buzzer":true}',
+)
+
+
+def _ticks_us():
+    if hasattr(time, "ticks_us"):
+        return time.ticks_us()
+    return int(time.perf_counter() * 1000000)
+
+
+def _ticks_diff(a, b):
+    if hasattr(time, "ticks_diff"):
+        return time.ticks_diff(a, b)
+    return a - b
+
+
+def json_path(msg):
+    """What the receivers did before: decode + json.loads + dict lookups."""
+    data = json.loads(msg.decode())
+    found = 0
+    if "distance_error" in data:
+        found |= FIELD_DIST
+    if "position_error" in data:
+        found |= FIELD_POS
+    if "accel" in data:
+        found |= FIELD_ACCEL_X
+    if "color" in data:
+        found |= FIELD_COLOR
+    if "Buzzer" in data:
+        found |= FIELD_BUZZER
+    return found
+
+
+def _allocated(fn, rounds, samples=SAMPLES):
+    """
+    Heap bytes fn allocates over rounds passes of SAMPLES.
+
+    MicroPython: gc.mem_alloc() delta with the collector disabled, i.e. what
+    the GC would eventually have to reclaim. CPython frees most of it right
+    away, so sum the per-call tracemalloc peak instead.
+    """
+    if hasattr(gc, "mem_alloc"):
+        gc.collect()
+        gc.disable()
+        before = gc.mem_alloc()
+        for _ in range(rounds):
+            for msg in samples:
+                fn(msg)
+        allocated = gc.mem_alloc() - before
+        gc.enable()
+        return allocated
+
+    import tracemalloc
+    tracemalloc.start()
+    allocated = 0
+    for _ in range(rounds):
+        for msg in samples:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            fn(msg)
+            allocated += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return allocated
+
+
+def measure(name, fn, rounds, samples=SAMPLES):
+    """Time fn over every sample; report heap use and GC activity around the run."""
+    collections = [0]
+    if hasattr(gc, "callbacks"):
+        def on_gc(phase, info):
+            if phase == "start":
+                collections[0] += 1
+        gc.callbacks.append(on_gc)
+    gc.collect()
+    free_before = mem_free()
+    t0 = _ticks_us()
+    for _ in range(rounds):
+        for msg in samples:
+            fn(msg)
+    elapsed = _ticks_diff(_ticks_us(), t0)
+    free_after = mem_free()
+    if hasattr(gc, "callbacks"):
+        gc.callbacks.remove(on_gc)
+
+    allocated = _allocated(fn, max(1, rounds // 10), samples)
+    per_msg = allocated / (max(1, rounds // 10) * len(samples))
+    count = rounds * len(samples)
+    print("%-8s %7.2f us/msg  %7.1f B allocated/msg  mem_free %d -> %d  collections %d"
+          % (name, elapsed / count, per_msg, free_before, free_after, collections[0]))
+    gc.collect()
+
+
+def main(rounds=2000):
+    decoder = FastDecoder()
+    for msg in SAMPLES:
+        if decoder.decode(msg) != json_path(msg):
+            print("Field mismatch on", msg)
+    print("Decoding %d messages per path" % (rounds * len(SAMPLES)))
+    measure("json", json_path, rounds)
+    measure("fastmsg", decoder.decode, rounds)
+
+    enc = me35codec.Encoder("binary")
+    binary = (enc.errors(0.0123, -42.5), enc.errors(-3.2e-05, 118), enc.accel(0.41, -0.02, 0.98),
+              enc.color(0, 0, 225), enc.buzzer(True))
+    measure("binary", decoder.decode, rounds, binary)
+
+
+if __name__ == "__main__":
+    main()
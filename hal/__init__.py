@@ -0,0 +1,100 @@
+"""
+Host-side stand-ins for the MicroPython / OpenMV modules the device scripts import.
+
+    import hal
+    hal.install()              # before importing any device script
+    import LineFollower        # module-level setup runs against the fakes
+    LineFollower.step()        # one main-loop iteration
+
+install() puts the fakes into sys.modules under the device names (machine,
+network, neopixel, sensor, pyb, time/utime, micropython, umqtt.simple,
+uasyncio, the driver libraries the scripts load from the board, and
+placeholder secrets / secrets_CS), so the scripts import them unchanged.
+
+Time is virtual: time.sleep*() advances hal.utime's clock instead of
+waiting, ticks_* read it, and callbacks registered with hal.utime.at() fire
+when the clock passes them (that is how tests inject a button press in the
+middle of a sleep). Every actuator write (Pin, PWM, NeoPixel, UART tx,
+servo, MQTT publish, HTTP request) is appended to hal.events as
+(t_us, source, action, value) with the virtual timestamp, so reaction
+latency is "first matching event after the stimulus" minus the stimulus time.
+
+python -m hal.bench drives every script this way.
+"""
+import sys
+
+events = []  # (t_us, source, action, value)
+
+
+def record(source, action, value=None):
+    from hal import utime
+    events.append((utime.now_us(), source, action, value))
+
+
+def find(source=None, action=None, since_us=0):
+    """Events from `source` / `action` (None: any) recorded at or after since_us."""
+    return [e for e in events
+            if e[0] >= since_us and (source is None or e[1] == source) and (action is None or e[2] == action)]
+
+
+# Device module name -> hal submodule
+MODULES = {
+    "time": "utime",
+    "utime": "utime",
+    "machine": "machine",
+    "network": "network",
+    "neopixel": "neopixel",
+    "micropython": "micropython",
+    "sensor": "sensor",
+    "pyb": "pyb",
+    "umqtt": "umqtt",
+    "umqtt.simple": "umqtt",
+    "uasyncio": "uasyncio",
+    "urequests": "urequests",
+    "veml6040": "drivers",
+    "lis3dh": "drivers",
+    "servo": "drivers",
+    "secrets": "credentials",
+    "secrets_CS": "credentials",
+}
+
+_saved = None
+
+
+def install():
+    """Register the fakes under their device module names (idempotent)."""
+    global _saved
+    if _saved is not None:
+        return
+    import importlib
+
+    _saved = {name: sys.modules.get(name) for name in MODULES}
+    for name, sub in MODULES.items():
+        sys.modules[name] = importlib.import_module("hal." + sub)
+
+
+def uninstall():
+    """Put back whatever the device module names referred to before install()."""
+    global _saved
+    if _saved is None:
+        return
+    for name, module in _saved.items():
+        if module is None:
+            sys.modules.pop(name, None)
+        else:
+            sys.modules[name] = module
+    _saved = None
+
+
+def reset():
+    """Fresh clock, empty event log and hardware state, for the next run."""
+    from hal import utime, machine, network, sensor, umqtt, urequests, drivers, uasyncio
+    del events[:]
+    utime.reset()
+    machine.reset_state()
+    network.reset_state()
+    sensor.reset_state()
+    umqtt.reset_state()
+    urequests.reset_state()
+    drivers.reset_state()
+    uasyncio.reset_state()
@@ -0,0 +1,312 @@
+"""
+Drive every device script step by step under the HAL and report
+per-iteration cost and reaction latency.
+
+    python -m hal.bench                    # all scenarios
+    python -m hal.bench robot camera -v    # some, with the scripts' prints
+
+Each scenario loads a script against the fakes, runs its step() (for a
+uasyncio runtime: 10 ms of the event loop, hal.uasyncio.run_for) until a
+stimulus (line lost, button press, UART command, MQTT message, blob in
+view) fires at --at-ms virtual time, and keeps stepping until the expected
+actuator write shows up (or --timeout-ms passes).
+
+    cost      host wall time per step() (sleeps are virtual, so this is the
+              loop's own work; ESP32s are ~50-100x slower)
+    period    virtual time per step(), i.e. the loop period the sleeps give
+    reaction  virtual time from the stimulus to the first matching write,
+              mean and max over --trials stimulus phases
+"""
+import argparse
+import importlib
+import os
+import random
+import sys
+import time
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "Robotics_Final"))
+sys.path.insert(0, ROOT)
+
+from FramePipeline import percentile  # noqa: E402
+import hal  # noqa: E402
+
+
+def load(name):
+    """Import a device script fresh, so its module-level setup runs against the current HAL state."""
+    sys.modules.pop(name, None)
+    return importlib.import_module(name)
+
+
+class Scenario:
+    """step(): one loop iteration; stimulus(): the event; response: (source, action, match)."""
+
+    def __init__(self, step, stimulus=None, response=None, what=""):
+        self.step = step
+        self.stimulus = stimulus
+        self.response = response
+        self.what = what
+
+
+CHANGED = None  # response match: any value that differs from the last one written before the stimulus
+
+
+# ---------------- Scenarios ----------------
+def linefollower():
+    from hal import drivers
+    drivers.set_color(0, 0, 0, 100)  # on the line
+    mod = load("LineFollower")
+    return Scenario(mod.step, lambda: drivers.set_color(0, 0, 0, 400),
+                    ("PWM(13)", "duty", CHANGED), "line lost -> left motor slows")
+
+
+def artattack():
+    mod = load("ArtAttack")
+    return Scenario(mod.step, what="one pass over the path")
+
+
+def ballthrower():
+    mod = load("BallThrower")
+    return Scenario(lambda: mod.throw(30), what="predict + run the motor for 30 in")
+
+
+def clock():
+    from hal import machine
+    machine.set_input(35, 1)
+    mod = load("clock")
+    mod.fetch_world_time()
+
+    def press():
+        machine.set_input(35, 0)
+        hal.utime.after_ms(100, lambda: machine.set_input(35, 1))
+    return Scenario(mod.step, press, ("urequests", "get", lambda url: "open-meteo" in url),
+                    "100 ms button press -> temperature mode request")
+
+
+def dispenser():
+    from hal import machine
+    machine.set_input(34, 0)
+    mod = load("Ball_Dispenser")
+
+    def press():
+        machine.set_input(34, 1)
+        hal.utime.after_ms(100, lambda: machine.set_input(34, 0))
+    return Scenario(mod.step, press, ("PWM(19)", "duty", CHANGED), "button -> servo moves")
+
+
+def camera():
+    from hal import sensor
+    mod = load("Auto_Camera")
+    from camlink import OPCODES, decode
+    blob = sensor.Blob(20, 60, 800)  # left third, far
+
+    def is_left(data):
+        frame = decode(data)
+        if frame is not None and frame[0] == OPCODES["TRACK"]:
+            return frame[3][0] < 0  # continuous mode: offset to the left
+        return data == b"LEFT_FAR\n" or (frame is not None and frame[0] == OPCODES["LEFT_FAR"])
+    return Scenario(mod.step, lambda: sensor.set_blobs(mod.COLOR_THRESHOLDS[mod.FIRST_COLOR], [blob]),
+                    ("UART(3)", "write", is_left), "blob appears -> LEFT_FAR / TRACK left sent")
+
+
+def robot():
+    from hal import machine
+    mod = load("Auto_ESP")
+    device = mod.RobotDevice()
+    return Scenario(device.step, lambda: machine.uart(1).feed(b"LEFT_FAR\n"),
+                    ("PWM(12)", "duty", CHANGED), "UART LEFT_FAR -> spin left")
+
+
+def robot_async():
+    from hal import machine, uasyncio
+    mod = load("Auto_ESP")
+    device = mod.RobotDevice()
+    uasyncio.create_task(device.main())
+    return Scenario(lambda: uasyncio.run_for(10), lambda: machine.uart(1).feed(b"LEFT_FAR\n"),
+                    ("PWM(12)", "duty", CHANGED), "UART LEFT_FAR -> spin left (uasyncio runtime)")
+
+
+def _robot_busy(runtime):
+    """CENTER_CLOSE (drive 2 s) lands at 2.5 s, so the stimulus at the default --at-ms finds the robot mid-move."""
+    from hal import machine, uasyncio
+    mod = load("Auto_ESP")
+    device = mod.RobotDevice()
+    hal.utime.at(2500000, lambda: machine.uart(1).feed(b"CENTER_CLOSE\n"))
+    if runtime == "async":
+        uasyncio.create_task(device.main())
+        step = lambda: uasyncio.run_for(10)  # noqa: E731
+    else:
+        step = device.step
+    return Scenario(step, lambda: machine.uart(1).feed(b"LEFT_FAR\n"), ("PWM(14)", "duty", lambda duty: duty > 0),
+                    "LEFT_FAR during CENTER_CLOSE -> spin left (%s runtime)" % runtime)
+
+
+def motor():
+    from hal import umqtt
+    from me35codec import Encoder
+    receiver = load("MissionControl_Receiver").MotorReceiver()
+    msg = Encoder("binary").accel(0.5, 0.0, 1.0)
+    return Scenario(receiver.step, lambda: umqtt.inject("/ME35/17", msg),
+                    ("PWM(12)", "duty", CHANGED), "MQTT tilt -> motors")
+
+
+def controller():
+    from hal import machine
+    from me35codec import decode, TYPE_COLOR
+    machine.set_input(35, 1)
+    device = load("MissionControl_Controller").MQTTDevice()
+
+    def press():
+        machine.set_input(35, 0)
+        hal.utime.after_ms(30, lambda: machine.set_input(35, 1))  # IRQ fires on the release
+
+    def is_color(value):
+        unpacked = decode(value[1])
+        return unpacked is not None and unpacked[0] == TYPE_COLOR
+    return Scenario(device.step, press, ("mqtt", "publish", is_color), "button -> color message published")
+
+
+def followme():
+    from hal import umqtt
+    from me35codec import Encoder
+    follower = load("FollowMeeReceiver").Follower()
+    follower.start()
+    msg = Encoder("binary").errors(0.01, -40.0)
+    return Scenario(follower.step, lambda: umqtt.inject("/ME35/1", msg),
+                    ("PWM(27)", "duty_u16", CHANGED), "MQTT error sample -> left motor")
+
+
+SCENARIOS = {
+    "linefollower": linefollower,
+    "artattack": artattack,
+    "ballthrower": ballthrower,
+    "clock": clock,
+    "dispenser": dispenser,
+    "camera": camera,
+    "robot": robot,
+    "robot_async": robot_async,
+    "robot_busy": lambda: _robot_busy("poll"),
+    "robot_busy_async": lambda: _robot_busy("async"),
+    "motor": motor,
+    "controller": controller,
+    "followme": followme,
+}
+
+
+# ---------------- Runner ----------------
+def first_response(response, stimulus_us):
+    source, action, match = response
+    before = [e for e in hal.find(source, action) if e[0] < stimulus_us]
+    baseline = before[-1][3] if before else None
+    for event in hal.find(source, action, stimulus_us):
+        if (match is None and event[3] != baseline) or (match is not None and match(event[3])):
+            return event
+    return None
+
+
+def run_once(name, args, at_us):
+    """One trial: returns (step costs s, step periods us, reaction us or None, stimulus or not)."""
+    hal.reset()
+    with open(os.devnull, "w") as devnull, redirect_stdout(sys.stdout if args.verbose else devnull):
+        scenario = SCENARIOS[name]()
+        fired = []
+        if scenario.stimulus is not None:
+            def fire():
+                fired.append(hal.utime.now_us())
+                scenario.stimulus()
+            hal.utime.at(hal.utime.now_us() + at_us, fire)
+
+        costs, periods = [], []
+        response = None
+        while len(costs) < args.max_steps:
+            v0 = hal.utime.now_us()
+            t0 = time.perf_counter()
+            scenario.step()
+            costs.append(time.perf_counter() - t0)
+            periods.append(hal.utime.now_us() - v0)
+
+            if len(costs) < args.steps:
+                continue
+            if scenario.stimulus is None:
+                break
+            if fired:
+                response = first_response(scenario.response, fired[0])
+                if response is not None or hal.utime.now_us() - fired[0] > args.timeout_ms * 1000:
+                    break
+
+    reaction = response[0] - fired[0] if response is not None else None
+    return scenario, costs, periods, reaction
+
+
+def run(name, args):
+    """
+    Run --trials trials, each with the stimulus at --at-ms plus a random phase
+    within one second, so it does not always land on a loop boundary.
+    """
+    rng = random.Random(args.seed)
+    costs, periods, reactions = [], [], []
+    missed = 0
+    for _ in range(args.trials):
+        at_us = args.at_ms * 1000 + rng.randrange(1000000)
+        scenario, c, p, reaction = run_once(name, args, at_us)
+        costs += c
+        periods += p
+        if reaction is not None:
+            reactions.append(reaction / 1000.0)
+        elif scenario.stimulus is not None:
+            missed += 1
+        if scenario.stimulus is None:
+            break  # nothing phase-dependent to repeat
+
+    costs.sort()
+    return {
+        "scenario": name,
+        "what": scenario.what,
+        "steps": len(costs),
+        "cost_mean_us": 1e6 * sum(costs) / len(costs),
+        "cost_p99_us": 1e6 * percentile(costs, 99),
+        "period_ms": sum(periods) / len(periods) / 1000.0,
+        "has_stimulus": scenario.stimulus is not None,
+        "reaction_mean_ms": sum(reactions) / len(reactions) if reactions else None,
+        "reaction_max_ms": max(reactions) if reactions else None,
+        "missed": missed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Step the device scripts under the host HAL")
+    parser.add_argument("scenarios", nargs="*", help="some of: %s (default: all)" % ", ".join(SCENARIOS))
+    parser.add_argument("--steps", type=int, default=200, help="minimum steps per scenario")
+    parser.add_argument("--max-steps", type=int, default=100000)
+    parser.add_argument("--at-ms", type=int, default=3000, help="virtual time of the stimulus (after Wi-Fi/MQTT are up)")
+    parser.add_argument("--trials", type=int, default=5, help="stimulus phases tried per scenario")
+    parser.add_argument("--seed", type=int, default=35)
+    parser.add_argument("--timeout-ms", type=int, default=120000, help="give up on a reaction after this much virtual time")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show the scripts' prints")
+    args = parser.parse_args()
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error("unknown scenario(s): %s" % ", ".join(unknown))
+
+    hal.install()
+    print("%-17s %7s %10s %10s %10s %13s %13s  %s"
+          % ("scenario", "steps", "cost us", "p99 us", "period ms", "react avg ms", "react max ms",
+             "stimulus -> response"))
+    for name in args.scenarios or SCENARIOS:
+        r = run(name, args)
+        if not r["has_stimulus"]:
+            avg = worst = "-"
+        elif r["reaction_mean_ms"] is None:
+            avg = worst = "none"
+        else:
+            avg = "%.1f" % r["reaction_mean_ms"]
+            worst = "%.1f" % r["reaction_max_ms"]
+        note = " (%d trial(s) without a response)" % r["missed"] if r["missed"] else ""
+        print("%-17s %7d %10.1f %10.1f %10.2f %13s %13s  %s%s"
+              % (name, r["steps"], r["cost_mean_us"], r["cost_p99_us"], r["period_ms"], avg, worst,
+                 r["what"], note))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""Placeholder secrets / secrets_CS: the fake umqtt and WLAN accept anything."""
+SSID = "sim-ssid"
+PWD = "sim-password"
+mqtt_url = "sim-broker.local"
+mqtt_username = "sim"
+mqtt_password = "sim"
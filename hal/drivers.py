@@ -0,0 +1,70 @@
+"""
+The board-side driver libraries the scripts import (veml6040, lis3dh, servo).
+
+Sensor readings come from module state the test sets (set_color, set_accel);
+the Cytron Servo drives a hal PWM, so its writes are recorded like any other.
+"""
+import math
+
+from hal.machine import PWM
+
+COLOR = [0, 0, 0, 0]          # VEML6040 r, g, b, c
+ACCEL = {"x": 0.0, "y": 0.0, "z": 1.0}  # H3LIS331DL g
+
+
+def reset_state():
+    COLOR[:] = [0, 0, 0, 0]
+    ACCEL.update(x=0.0, y=0.0, z=1.0)
+
+
+def set_color(r, g, b, c):
+    COLOR[:] = [r, g, b, c]
+
+
+def set_accel(x, y, z):
+    ACCEL.update(x=x, y=y, z=z)
+
+
+# ---------------- veml6040 ----------------
+class VEML6040:
+    def __init__(self, i2c, address=0x10):
+        self.i2c = i2c
+        self.integration_time = 0
+
+    def set_integration_time(self, it):
+        self.integration_time = it
+
+    def read(self):
+        return tuple(COLOR)
+
+
+# ---------------- lis3dh ----------------
+class H3LIS331DL:
+    def __init__(self, sda_pin=21, scl_pin=22, address=0x18):
+        pass
+
+    def read_accl_g(self):
+        return dict(ACCEL)
+
+
+# ---------------- servo (Cytron) ----------------
+class Servo:
+    def __init__(self, pin, freq=50, min_us=600, max_us=2400, angle=180):
+        self.min_us = min_us
+        self.max_us = max_us
+        self.freq = freq
+        self.angle = angle
+        self.pwm = PWM(pin, freq=freq, duty=0)
+
+    def write_us(self, us):
+        if us == 0:
+            self.pwm.duty(0)
+            return
+        us = min(self.max_us, max(self.min_us, us))
+        self.pwm.duty(us * 1024 * self.freq // 1000000)
+
+    def write_angle(self, degrees=None, radians=None):
+        if degrees is None:
+            degrees = math.degrees(radians)
+        degrees = degrees % 360
+        self.write_us(self.min_us + (self.max_us - self.min_us) * degrees // self.angle)
@@ -0,0 +1,269 @@
+"""
+machine.Pin / PWM / I2C / UART with recorded writes.
+
+Inputs are driven from the test side: set_input(pin_id, value) changes what
+Pin.value() reads and fires matching IRQ handlers; uart(id).feed(data)
+queues received bytes. Outputs land in hal.events.
+"""
+from hal import record
+
+INPUTS = {}   # pin id -> level read by input pins
+IRQS = {}     # pin id -> [(pin, handler, trigger)]
+UARTS = {}    # uart id -> newest UART on that id
+I2C_MEMORY = {}  # addr -> bytearray register file
+
+
+def reset_state():
+    INPUTS.clear()
+    IRQS.clear()
+    UARTS.clear()
+    I2C_MEMORY.clear()
+
+
+def _pin_id(pin):
+    return pin.id() if isinstance(pin, Pin) else pin
+
+
+# ---------------- Pin ----------------
+class Pin:
+    IN = 1
+    OUT = 3
+    OPEN_DRAIN = 7
+    PULL_UP = 2
+    PULL_DOWN = 1
+    IRQ_RISING = 1
+    IRQ_FALLING = 2
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self._id = id
+        self.mode = mode
+        self.pull = pull
+        self.level = 0
+        if value is not None:
+            self.value(value)
+
+    def id(self):
+        return self._id
+
+    def value(self, v=None):
+        if v is None:
+            if self.mode == Pin.OUT:
+                return self.level
+            return INPUTS.get(self._id, 1 if self.pull == Pin.PULL_UP else 0)
+        self.level = 1 if v else 0
+        record("Pin(%s)" % self._id, "value", self.level)
+
+    __call__ = value
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def init(self, mode=-1, pull=-1, value=None):
+        self.mode = mode
+        self.pull = pull
+        if value is not None:
+            self.value(value)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING):
+        IRQS[self._id] = [(p, h, t) for p, h, t in IRQS.get(self._id, []) if p is not self]
+        if handler is not None:
+            IRQS[self._id].append((self, handler, trigger))
+
+    def __repr__(self):
+        return "Pin(%s)" % self._id
+
+
+def set_input(pin_id, value):
+    """Drive an input pin from the outside world; fires IRQs on the edge."""
+    old = INPUTS.get(pin_id)
+    value = 1 if value else 0
+    INPUTS[pin_id] = value
+    record("Pin(%s)" % pin_id, "input", value)
+    if old is None or old == value:
+        return
+    edge = Pin.IRQ_RISING if value else Pin.IRQ_FALLING
+    for pin, handler, trigger in list(IRQS.get(pin_id, [])):
+        if trigger & edge:
+            handler(pin)
+
+
+# ---------------- PWM ----------------
+class PWM:
+    def __init__(self, pin, freq=None, duty=None, duty_u16=None, duty_ns=None):
+        self.name = "PWM(%s)" % _pin_id(pin)
+        self._freq = 5000
+        self._duty_u16 = 0
+        self.init(freq=freq, duty=duty, duty_u16=duty_u16, duty_ns=duty_ns)
+
+    def init(self, freq=None, duty=None, duty_u16=None, duty_ns=None):
+        if freq is not None:
+            self.freq(freq)
+        if duty is not None:
+            self.duty(duty)
+        if duty_u16 is not None:
+            self.duty_u16(duty_u16)
+        if duty_ns is not None:
+            self.duty_ns(duty_ns)
+
+    def freq(self, value=None):
+        if value is None:
+            return self._freq
+        self._freq = value
+        record(self.name, "freq", value)
+
+    def duty(self, value=None):
+        """10-bit duty (ESP32 port)."""
+        if value is None:
+            return self._duty_u16 >> 6
+        value = max(0, min(1023, int(value)))
+        self._duty_u16 = value << 6
+        record(self.name, "duty", value)
+
+    def duty_u16(self, value=None):
+        if value is None:
+            return self._duty_u16
+        self._duty_u16 = max(0, min(65535, int(value)))
+        record(self.name, "duty_u16", self._duty_u16)
+
+    def duty_ns(self, value=None):
+        period_ns = 1000000000 // self._freq
+        if value is None:
+            return self._duty_u16 * period_ns // 65535
+        self.duty_u16(value * 65535 // period_ns)
+
+    def deinit(self):
+        self._duty_u16 = 0
+        record(self.name, "deinit")
+
+
+# ---------------- I2C ----------------
+class I2C:
+    """Register-file I2C bus: every address in I2C_MEMORY answers."""
+
+    def __init__(self, id=0, scl=None, sda=None, freq=400000):
+        self.name = "I2C(%s)" % id
+
+    def scan(self):
+        return sorted(I2C_MEMORY)
+
+    def _mem(self, addr):
+        if addr not in I2C_MEMORY:
+            I2C_MEMORY[addr] = bytearray(256)
+        return I2C_MEMORY[addr]
+
+    def readfrom_mem(self, addr, reg, n, addrsize=8):
+        mem = self._mem(addr)
+        return bytes(mem[(reg + i) & 0xFF] for i in range(n))
+
+    def readfrom_mem_into(self, addr, reg, buf, addrsize=8):
+        buf[:] = self.readfrom_mem(addr, reg, len(buf))
+
+    def writeto_mem(self, addr, reg, data, addrsize=8):
+        mem = self._mem(addr)
+        for i, b in enumerate(bytes(data)):
+            mem[(reg + i) & 0xFF] = b
+        record(self.name, "write", (addr, reg, bytes(data)))
+
+    def readfrom(self, addr, n, stop=True):
+        return self.readfrom_mem(addr, 0, n)
+
+    def readfrom_into(self, addr, buf, stop=True):
+        self.readfrom_mem_into(addr, 0, buf)
+
+    def writeto(self, addr, data, stop=True):
+        data = bytes(data)
+        if data:
+            self.writeto_mem(addr, data[0], data[1:])
+        return len(data)
+
+
+SoftI2C = I2C
+
+
+# ---------------- UART ----------------
+class UART:
+    """Byte queues: feed() is what the wire delivers, writes are recorded (and forwarded to a linked UART)."""
+
+    def __init__(self, id, baudrate=115200, bits=8, parity=None, stop=1, **kwargs):
+        self._id = id
+        self.name = "UART(%s)" % id
+        self.baudrate = baudrate
+        self.rx = bytearray()
+        self.peer = None
+        UARTS[id] = self
+
+    def init(self, baudrate=115200, **kwargs):
+        self.baudrate = baudrate
+
+    def feed(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        self.rx += data
+
+    def any(self):
+        return len(self.rx)
+
+    def read(self, n=None):
+        if not self.rx:
+            return None
+        n = len(self.rx) if n is None else min(n, len(self.rx))
+        data = bytes(self.rx[:n])
+        del self.rx[:n]
+        return data
+
+    def readinto(self, buf, n=None):
+        data = self.read(len(buf) if n is None else n)
+        if not data:
+            return None
+        buf[:len(data)] = data
+        return len(data)
+
+    def readline(self):
+        if not self.rx:
+            return None
+        end = self.rx.find(b"\n")
+        return self.read(len(self.rx) if end < 0 else end + 1)
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        data = bytes(data)
+        record(self.name, "write", data)
+        if self.peer is not None:
+            self.peer.feed(data)
+        return len(data)
+
+    def deinit(self):
+        pass
+
+
+def uart(id):
+    """The UART a script opened on `id`."""
+    return UARTS[id]
+
+
+def link(a, b):
+    """Wire two UARTs together (a's tx into b's rx and back), e.g. camera -> robot."""
+    a.peer = b
+    b.peer = a
+
+
+# ---------------- Misc ----------------
+def freq(value=None):
+    return 240000000
+
+
+def unique_id():
+    return b"\x24\x0a\xc4\x00\x00\x01"
+
+
+def reset():
+    record("machine", "reset")
+    raise SystemExit("machine.reset()")
+
+
+def idle():
+    pass
@@ -0,0 +1,28 @@
+"""micropython module: const, schedule (runs immediately), emitter decorators as no-ops."""
+
+
+def const(x):
+    return x
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def schedule(fn, arg):
+    fn(arg)
+
+
+def mem_info(verbose=False):
+    print("mem: (host)")
+
+
+def opt_level(level=None):
+    return 0
+
+
+def native(fn):
+    return fn
+
+
+viper = native
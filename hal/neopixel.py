@@ -0,0 +1,25 @@
+"""neopixel.NeoPixel; write() records the whole strip."""
+from hal import record
+
+
+class NeoPixel:
+    def __init__(self, pin, n, bpp=3, timing=1):
+        self.name = "NeoPixel(%s)" % (pin.id() if hasattr(pin, "id") else pin)
+        self.n = n
+        self.bpp = bpp
+        self.pixels = [(0,) * bpp] * n
+
+    def __len__(self):
+        return self.n
+
+    def __setitem__(self, index, color):
+        self.pixels[index] = tuple(color)
+
+    def __getitem__(self, index):
+        return self.pixels[index]
+
+    def fill(self, color):
+        self.pixels = [tuple(color)] * self.n
+
+    def write(self):
+        record(self.name, "write", tuple(self.pixels))
@@ -0,0 +1,53 @@
+"""network.WLAN: connects CONNECT_MS (virtual) after connect() while AVAILABLE is True."""
+from hal import record, utime
+
+STA_IF = 0
+AP_IF = 1
+STAT_IDLE = 1000
+STAT_CONNECTING = 1001
+STAT_GOT_IP = 1010
+
+AVAILABLE = True
+CONNECT_MS = 1500
+
+_links = {}
+
+
+def reset_state():
+    global AVAILABLE
+    AVAILABLE = True
+    _links.clear()
+
+
+class WLAN:
+    def __init__(self, interface=STA_IF):
+        self.interface = interface
+        self._active = False
+        self._connect_started = None
+
+    def active(self, value=None):
+        if value is None:
+            return self._active
+        self._active = bool(value)
+
+    def connect(self, ssid=None, key=None):
+        record("WLAN", "connect", ssid)
+        self._connect_started = utime.now_us()
+
+    def disconnect(self):
+        self._connect_started = None
+
+    def isconnected(self):
+        return (AVAILABLE and self._connect_started is not None
+                and utime.now_us() - self._connect_started >= CONNECT_MS * 1000)
+
+    def status(self, param=None):
+        if self.isconnected():
+            return STAT_GOT_IP
+        return STAT_IDLE if self._connect_started is None else STAT_CONNECTING
+
+    def ifconfig(self, config=None):
+        return ("192.168.4.2", "255.255.255.0", "192.168.4.1", "192.168.4.1")
+
+    def config(self, *args, **kwargs):
+        return None
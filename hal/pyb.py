@@ -0,0 +1,42 @@
+"""pyb (OpenMV / pyboard): UART, LED and the delay helpers."""
+from hal import record, utime
+from hal.machine import UART as _UART
+
+
+class UART(_UART):
+    def __init__(self, id, baudrate=115200, bits=8, parity=None, stop=1, timeout=0, timeout_char=0, **kwargs):
+        _UART.__init__(self, id, baudrate, bits, parity, stop)
+
+
+class LED:
+    def __init__(self, id):
+        self.name = "LED(%d)" % id
+
+    def on(self):
+        record(self.name, "value", 1)
+
+    def off(self):
+        record(self.name, "value", 0)
+
+    def toggle(self):
+        record(self.name, "toggle")
+
+
+def delay(ms):
+    utime.sleep_ms(ms)
+
+
+def udelay(us):
+    utime.sleep_us(us)
+
+
+def millis():
+    return utime.ticks_ms()
+
+
+def micros():
+    return utime.ticks_us()
+
+
+def elapsed_millis(start):
+    return utime.ticks_diff(utime.ticks_ms(), start)
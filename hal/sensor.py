@@ -0,0 +1,115 @@
+"""
+OpenMV sensor module with scripted scenes.
+
+set_blobs(threshold, [Blob(...), ...]) decides what find_blobs() returns
+for that color threshold (None: every threshold); snapshot() costs one
+frame of virtual time at FPS.
+"""
+from hal import record, utime
+
+RGB565 = 2
+GRAYSCALE = 1
+FRAMESIZES = {"QQVGA": (160, 120), "QVGA": (320, 240), "VGA": (640, 480), "HQVGA": (240, 160)}
+QQVGA, QVGA, VGA, HQVGA = "QQVGA", "QVGA", "VGA", "HQVGA"
+
+FPS = 60
+_state = {"size": FRAMESIZES[QQVGA], "frames": 0}
+_blobs = {}  # threshold tuple (or None) -> [Blob]
+
+
+def reset_state():
+    _state.update(size=FRAMESIZES[QQVGA], frames=0)
+    _blobs.clear()
+
+
+def set_blobs(threshold, blobs):
+    _blobs[tuple(threshold) if threshold is not None else None] = list(blobs)
+
+
+class Blob:
+    def __init__(self, cx, cy, pixels, w=None, h=None):
+        self._cx, self._cy, self._pixels = int(cx), int(cy), int(pixels)
+        side = int(pixels ** 0.5)
+        self._w = w if w is not None else side
+        self._h = h if h is not None else side
+
+    def cx(self):
+        return self._cx
+
+    def cy(self):
+        return self._cy
+
+    def pixels(self):
+        return self._pixels
+
+    def area(self):
+        return self._w * self._h
+
+    def w(self):
+        return self._w
+
+    def h(self):
+        return self._h
+
+    def x(self):
+        return self._cx - self._w // 2
+
+    def y(self):
+        return self._cy - self._h // 2
+
+    def rect(self):
+        return (self.x(), self.y(), self._w, self._h)
+
+
+class Image:
+    def __init__(self, width, height):
+        self._width = width
+        self._height = height
+
+    def width(self):
+        return self._width
+
+    def height(self):
+        return self._height
+
+    def find_blobs(self, thresholds, pixels_threshold=10, area_threshold=10, merge=False, **kwargs):
+        found = []
+        for threshold in thresholds:
+            found += _blobs.get(tuple(threshold), [])
+        found += _blobs.get(None, [])
+        return [b for b in found if b.pixels() >= pixels_threshold and b.area() >= area_threshold]
+
+    def _draw(self, *args, **kwargs):
+        return self
+
+    draw_rectangle = draw_cross = draw_string = draw_circle = draw_line = _draw
+
+
+def reset():
+    record("sensor", "reset")
+
+
+def set_pixformat(fmt):
+    pass
+
+
+def set_framesize(size):
+    _state["size"] = FRAMESIZES[size]
+
+
+def skip_frames(n=None, time=None):
+    utime.sleep_ms(time if time is not None else (n or 10) * 1000 // FPS)
+
+
+def snapshot():
+    utime.sleep_us(1000000 // FPS)
+    _state["frames"] += 1
+    return Image(*_state["size"])
+
+
+def width():
+    return _state["size"][0]
+
+
+def height():
+    return _state["size"][1]
@@ -0,0 +1,286 @@
+"""
+uasyncio on the virtual clock.
+
+The subset the device scripts use: create_task, run, sleep / sleep_ms,
+gather, Event, StreamReader / StreamWriter over a hal UART, Task.cancel.
+When no task is ready the scheduler advances hal.utime straight to the next
+wake-up (a sleeper, or an at() callback such as UART bytes arriving), so a
+task waiting on a stream resumes at the virtual time the data came in.
+
+run_for(ms) is host-only: run whatever tasks exist for ms of virtual time,
+which is how hal.bench steps an asyncio program.
+"""
+from collections import deque
+
+from hal import utime
+
+_ready = deque()   # (task, exception to throw or None)
+_sleepers = []     # sorted [(due_us, order, task)]
+_readers = []      # [(stream, task)]
+_order = [0]
+
+
+class CancelledError(BaseException):
+    pass
+
+
+class TimeoutError(Exception):
+    pass
+
+
+def reset_state():
+    _ready.clear()
+    del _sleepers[:]
+    del _readers[:]
+
+
+class _Wait:
+    """What a task yields to the scheduler: ("sleep", due_us) / ("read", stream) / ("task", task) / ("event", event)."""
+
+    def __init__(self, kind, arg=None):
+        self.kind = kind
+        self.arg = arg
+
+    def __await__(self):
+        yield self
+
+
+class Task:
+    def __init__(self, coro):
+        self.coro = coro
+        self.done_ = False
+        self.result = None
+        self.exc = None
+        self.waiters = []
+
+    def done(self):
+        return self.done_
+
+    def cancel(self):
+        if self.done_:
+            return False
+        _unpark(self)
+        _ready.append((self, CancelledError()))
+        return True
+
+    def __await__(self):
+        while not self.done_:
+            yield _Wait("task", self)
+        if self.exc is not None:
+            raise self.exc
+        return self.result
+
+
+def _unpark(task):
+    for i in range(len(_sleepers) - 1, -1, -1):
+        if _sleepers[i][2] is task:
+            del _sleepers[i]
+    for i in range(len(_readers) - 1, -1, -1):
+        if _readers[i][1] is task:
+            del _readers[i]
+    for i in range(len(_ready) - 1, -1, -1):
+        if _ready[i][0] is task:
+            del _ready[i]
+
+
+def create_task(coro):
+    task = Task(coro)
+    _ready.append((task, None))
+    return task
+
+
+_current = [None]
+
+
+def current_task():
+    return _current[0]
+
+
+def _finish(task, result=None, exc=None):
+    task.done_ = True
+    task.result = result
+    task.exc = exc
+    if exc is not None and not isinstance(exc, CancelledError) and not task.waiters:
+        print("Task exception wasn't retrieved:", repr(exc))
+    for waiter in task.waiters:
+        _ready.append((waiter, None))
+    task.waiters = []
+
+
+def _run_task(task, exc):
+    _current[0] = task
+    try:
+        wait = task.coro.throw(exc) if exc is not None else task.coro.send(None)
+    except StopIteration as e:
+        _finish(task, e.value)
+        return
+    except CancelledError as e:
+        _finish(task, exc=e)
+        return
+    except Exception as e:
+        _finish(task, exc=e)
+        return
+    finally:
+        _current[0] = None
+
+    if wait.kind == "sleep":
+        _order[0] += 1
+        _sleepers.append((wait.arg, _order[0], task))
+        _sleepers.sort(key=lambda s: (s[0], s[1]))
+    elif wait.kind == "read":
+        _readers.append((wait.arg, task))
+    elif wait.kind in ("task", "event"):
+        wait.arg.waiters.append(task)
+    else:  # sleep(0): back of the queue
+        _ready.append((task, None))
+
+
+def _run_once(limit_us):
+    """Wake what is due, run every ready task one step; advance the clock if nothing was ready."""
+    now = utime.now_us()
+    for entry in list(_readers):
+        if entry[0].s.any():
+            _readers.remove(entry)
+            _ready.append((entry[1], None))
+    while _sleepers and _sleepers[0][0] <= now:
+        _ready.append((_sleepers.pop(0)[2], None))
+
+    if _ready:
+        for _ in range(len(_ready)):
+            task, exc = _ready.popleft()
+            if not task.done_:
+                _run_task(task, exc)
+        return True
+
+    wakeups = [limit_us]
+    if _sleepers:
+        wakeups.append(_sleepers[0][0])
+    if utime.next_timer() is not None:
+        wakeups.append(utime.next_timer())
+    target = min(wakeups)
+    if target <= now:
+        return False  # nothing left to happen before the limit
+    utime.advance(target - now)
+    return True
+
+
+def run_for(ms):
+    """Host-only: run the scheduled tasks for ms of virtual time."""
+    limit = utime.now_us() + int(ms * 1000)
+    while utime.now_us() < limit:
+        if not _run_once(limit):
+            utime.advance(limit - utime.now_us())
+
+
+def run(coro):
+    main = create_task(coro)
+    forever = 1 << 62
+    while not main.done_:
+        if not _run_once(forever):
+            raise RuntimeError("deadlock: every task waits and nothing is scheduled")
+    if main.exc is not None:
+        raise main.exc
+    return main.result
+
+
+# ---------------- Awaitables ----------------
+def sleep_ms(ms):
+    if ms <= 0:
+        return _Wait("yield")
+    return _Wait("sleep", utime.now_us() + int(ms * 1000))
+
+
+def sleep(seconds):
+    return sleep_ms(seconds * 1000)
+
+
+async def gather(*aws, return_exceptions=False):
+    tasks = [aw if isinstance(aw, Task) else create_task(aw) for aw in aws]
+    results = []
+    for task in tasks:
+        try:
+            results.append(await task)
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            results.append(e)
+    return results
+
+
+async def wait_for_ms(aw, timeout_ms):
+    task = aw if isinstance(aw, Task) else create_task(aw)
+    deadline = utime.now_us() + timeout_ms * 1000
+    while not task.done_:
+        if utime.now_us() >= deadline:
+            task.cancel()
+            raise TimeoutError()
+        await sleep_ms(min(10, (deadline - utime.now_us()) / 1000))
+    return await task
+
+
+async def wait_for(aw, timeout):
+    return await wait_for_ms(aw, timeout * 1000)
+
+
+class Event:
+    def __init__(self):
+        self.state = False
+        self.waiters = []
+
+    def is_set(self):
+        return self.state
+
+    def set(self):
+        self.state = True
+        for task in self.waiters:
+            _ready.append((task, None))
+        self.waiters = []
+
+    def clear(self):
+        self.state = False
+
+    async def wait(self):
+        while not self.state:
+            await _Wait("event", self)
+        return True
+
+
+# ---------------- Streams ----------------
+class StreamReader:
+    """Line / byte reads from a hal UART; waits until the UART has data, like the poll-based original."""
+
+    def __init__(self, s, e=None):
+        self.s = s
+
+    async def read(self, n=-1):
+        while not self.s.any():
+            await _Wait("read", self)
+        return self.s.read(None if n < 0 else n)
+
+    async def readinto(self, buf):
+        while not self.s.any():
+            await _Wait("read", self)
+        return self.s.readinto(buf)
+
+    async def readline(self):
+        line = b""
+        while True:
+            while not self.s.any():
+                await _Wait("read", self)
+            line += self.s.readline()
+            if line.endswith(b"\n"):
+                return line
+
+
+class StreamWriter:
+    def __init__(self, s, e=None):
+        self.s = s
+        self.out = b""
+
+    def write(self, data):
+        self.out += data.encode() if isinstance(data, str) else bytes(data)
+
+    async def drain(self):
+        if self.out:
+            self.s.write(self.out)
+            self.out = b""
@@ -0,0 +1,119 @@
+"""
+umqtt.simple.MQTTClient on an in-process bus.
+
+Fake clients that connect while BROKER_UP is True see each other's
+publishes; inject() delivers a message as if another device sent it.
+check_msg() hands at most one queued message to the callback, like umqtt.
+"""
+import sys
+
+from hal import record
+
+BROKER_UP = True
+_clients = []
+
+
+def reset_state():
+    global BROKER_UP
+    BROKER_UP = True
+    del _clients[:]
+
+
+def _b(value):
+    return value.encode() if isinstance(value, str) else bytes(value)
+
+
+def _matches(pattern, topic):
+    p_parts = pattern.split(b"/")
+    t_parts = topic.split(b"/")
+    for i, part in enumerate(p_parts):
+        if part == b"#":
+            return True
+        if i >= len(t_parts) or (part != b"+" and part != t_parts[i]):
+            return False
+    return len(p_parts) == len(t_parts)
+
+
+def inject(topic, msg):
+    """Deliver msg on topic to every connected subscriber."""
+    topic, msg = _b(topic), _b(msg)
+    for client in _clients:
+        if any(_matches(f, topic) for f in client.filters):
+            client.inbox.append((topic, msg))
+
+
+class MQTTException(Exception):
+    pass
+
+
+class _Sock:
+    def __init__(self, client):
+        self.client = client
+
+    def close(self):
+        self.client._drop()
+
+    def setblocking(self, flag):
+        pass
+
+
+class MQTTClient:
+    def __init__(self, client_id, server, port=0, user=None, password=None, keepalive=0,
+                 ssl=False, ssl_params=None):
+        self.client_id = _b(client_id)
+        self.server = server
+        self.cb = None
+        self.filters = []
+        self.inbox = []
+        self.sock = None
+
+    def set_callback(self, f):
+        self.cb = f
+
+    def connect(self, clean_session=True):
+        if not BROKER_UP:
+            raise OSError(113)  # EHOSTUNREACH
+        self.sock = _Sock(self)
+        _clients.append(self)
+        record("mqtt", "connect", self.client_id)
+        return False
+
+    def _drop(self):
+        if self in _clients:
+            _clients.remove(self)
+        self.sock = None
+
+    def disconnect(self):
+        self._drop()
+
+    def _check(self):
+        if self.sock is None or not BROKER_UP:
+            self._drop()
+            raise OSError(104)  # ECONNRESET
+
+    def subscribe(self, topic, qos=0):
+        self._check()
+        self.filters.append(_b(topic))
+
+    def publish(self, topic, msg, retain=False, qos=0):
+        self._check()
+        record("mqtt", "publish", (_b(topic), _b(msg)))
+        for client in _clients:
+            if client is not self and any(_matches(f, _b(topic)) for f in client.filters):
+                client.inbox.append((_b(topic), _b(msg)))
+
+    def ping(self):
+        self._check()
+
+    def check_msg(self):
+        self._check()
+        if self.inbox:
+            topic, msg = self.inbox.pop(0)
+            if self.cb is not None:
+                self.cb(topic, msg)
+
+    def wait_msg(self):
+        self.check_msg()
+
+
+simple = sys.modules[__name__]  # "from umqtt.simple import MQTTClient" resolves here too
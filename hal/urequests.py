@@ -0,0 +1,56 @@
+"""
+urequests with canned responses.
+
+ROUTES maps a URL prefix to a JSON-able payload or a callable(url) returning
+one; every request costs LATENCY_MS of virtual time, like a blocking HTTP call.
+"""
+import json
+
+from hal import record, utime
+
+LATENCY_MS = 250
+ROUTES = {}
+
+
+def _world_time(url):
+    h, m, s = utime.localtime()[3:6]
+    return {"datetime": "2026-01-01T%02d:%02d:%02d.000000-05:00" % (h, m, s)}
+
+
+def reset_state():
+    ROUTES.clear()
+    ROUTES["http://worldtimeapi.org/"] = _world_time
+    ROUTES["http://api.open-meteo.com/"] = {"current_weather": {"temperature": 18.5}}
+
+
+reset_state()
+
+
+class Response:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self.text = json.dumps(payload) if payload is not None else ""
+        self.content = self.text.encode()
+
+    def json(self):
+        return json.loads(self.text)
+
+    def close(self):
+        pass
+
+
+def request(method, url, data=None, json=None, headers=None, timeout=None):
+    record("urequests", method.lower(), url)
+    utime.sleep_ms(LATENCY_MS)
+    for prefix, payload in ROUTES.items():
+        if url.startswith(prefix):
+            return Response(200, payload(url) if callable(payload) else payload)
+    raise OSError(-202)  # lwIP: host not found
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
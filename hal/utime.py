@@ -0,0 +1,141 @@
+"""
+MicroPython `time` on a virtual clock.
+
+sleep*() advance the clock (firing due at() callbacks on the way) and
+return immediately; ticks_* wrap like the board's 30-bit ticks. Anything
+MicroPython's time does not have falls through to CPython's time module.
+"""
+import time as _real_time
+
+TICKS_PERIOD = 1 << 30
+TICKS_MAX = TICKS_PERIOD - 1
+TICKS_HALF = TICKS_PERIOD // 2
+EPOCH = 1767225600  # time() at boot: 2026-01-01 00:00:00 UTC
+
+_now_us = 0
+_timers = []  # sorted [(due_us, order, fn)]
+_order = 0
+
+
+def reset():
+    global _now_us, _order
+    _now_us = 0
+    _order = 0
+    del _timers[:]
+
+
+def now_us():
+    """Virtual microseconds since reset (not wrapped)."""
+    return _now_us
+
+
+def at(due_us, fn):
+    """Call fn() when the virtual clock reaches due_us (absolute, as now_us())."""
+    global _order
+    _order += 1
+    _timers.append((due_us, _order, fn))
+    _timers.sort()
+
+
+def next_timer():
+    """Due time of the earliest pending at() callback, or None."""
+    return _timers[0][0] if _timers else None
+
+
+def after_ms(delay_ms, fn):
+    at(_now_us + int(delay_ms * 1000), fn)
+
+
+def advance(us):
+    """Move the clock forward, running every at() callback that falls due on the way."""
+    global _now_us
+    end = _now_us + max(0, int(us))
+    while _timers and _timers[0][0] <= end:
+        due, _, fn = _timers.pop(0)
+        _now_us = max(_now_us, due)
+        fn()
+    _now_us = end
+
+
+# ---------------- MicroPython API ----------------
+def ticks_us():
+    return _now_us & TICKS_MAX
+
+
+def ticks_ms():
+    return (_now_us // 1000) & TICKS_MAX
+
+
+ticks_cpu = ticks_us
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & TICKS_MAX
+
+
+def ticks_diff(end, start):
+    return ((end - start + TICKS_HALF) & TICKS_MAX) - TICKS_HALF
+
+
+def sleep(seconds):
+    advance(seconds * 1000000)
+
+
+def sleep_ms(ms):
+    advance(ms * 1000)
+
+
+def sleep_us(us):
+    advance(us)
+
+
+def time():
+    return EPOCH + _now_us // 1000000
+
+
+def time_ns():
+    return EPOCH * 1000000000 + _now_us * 1000
+
+
+def localtime(secs=None):
+    return _real_time.gmtime(time() if secs is None else secs)[:8]
+
+
+gmtime = localtime
+
+
+def mktime(t):
+    return int(_real_time.mktime(tuple(t[:8]) + (0,)) - _real_time.timezone)
+
+
+# ---------------- OpenMV time.clock() ----------------
+class Clock:
+    """time.clock(): tick() at the top of the loop, fps() at the bottom."""
+
+    def __init__(self):
+        self.started = None
+        self.frames = 0
+        self.first = None
+
+    def tick(self):
+        if self.first is None:
+            self.first = _now_us
+        self.started = _now_us
+        self.frames += 1
+
+    def avg(self):
+        if self.first is None or not self.frames:
+            return 0.0
+        return (_now_us - self.first) / 1000.0 / self.frames
+
+    def fps(self):
+        avg_ms = self.avg()
+        return 1000.0 / avg_ms if avg_ms else 0.0
+
+
+def clock():
+    return Clock()
+
+
+def __getattr__(name):
+    return getattr(_real_time, name)
@@ -0,0 +1,191 @@
+"""
+Versioned binary codec for the /ME35 topics, with JSON as the fallback.
+
+Every binary message is a 5-byte header followed by a fixed struct layout:
+
+    magic (0xB5) | version | type | seq (uint16, little-endian) | payload
+
+0xB5 can never start a JSON document, so receivers accept both formats on
+the same topic and tell them apart by the first byte. Each sender's format
+is a fixed setting (Encoder(fmt=...)), chosen for the consumers it has;
+there is no handshake, so a sender only goes binary once every consumer of
+its topic decodes it. Messages with an unknown version are rejected rather
+than misread.
+
+Shared by the CPython senders and the MicroPython receivers (only struct and
+json are used). python me35codec.py benchmarks it against the JSON messages.
+"""
+import json
+import struct
+
+try:
+    from micropython import const
+except ImportError:
+    def const(x):
+        return x
+
+MAGIC = const(0xB5)
+VERSION = const(1)
+HEADER = "<BBBH"
+HEADER_SIZE = const(5)
+
+# Message types and their payload layouts
+TYPE_ERRORS = const(1)   # FollowMe controller input: distance_error, position_error
+TYPE_BLOB = const(2)     # FollowMeSender detection: center x, center y, area, width, height
+TYPE_ACCEL = const(3)    # accelerometer g: x, y, z
+TYPE_COLOR = const(4)    # NeoPixel r, g, b
+TYPE_BUZZER = const(5)   # on/off
+TYPE_TWIST = const(6)    # PS5 remote: linear x (m/s), angular z (rad/s)
+TYPE_ACCEL_BATCH = const(7)  # count, sample period ms, then count x (x, y, z) in milli-g, oldest first
+
+LAYOUTS = {
+    TYPE_ERRORS: "<ff",
+    TYPE_BLOB: "<hhIHH",
+    TYPE_ACCEL: "<fff",
+    TYPE_COLOR: "<BBB",
+    TYPE_BUZZER: "<B",
+    TYPE_TWIST: "<ff",
+}
+
+# TYPE_ACCEL_BATCH is variable length: BATCH_HEAD (count, period_ms) then 3 * count int16
+BATCH_HEAD = "<BH"
+BATCH_HEAD_SIZE = const(3)
+MAX_BATCH = const(64)
+
+
+def is_binary(msg):
+    return len(msg) >= HEADER_SIZE and msg[0] == MAGIC
+
+
+def encode(msg_type, seq, *values):
+    return struct.pack(HEADER, MAGIC, VERSION, msg_type, seq & 0xFFFF) + struct.pack(LAYOUTS[msg_type], *values)
+
+
+def decode(msg):
+    """Return (type, seq, values) for a binary message, or None if it is not one this version understands."""
+    if not is_binary(msg):
+        return None
+    _, version, msg_type, seq = struct.unpack_from(HEADER, msg, 0)
+    if msg_type == TYPE_ACCEL_BATCH and version == VERSION and len(msg) >= HEADER_SIZE + BATCH_HEAD_SIZE:
+        count = msg[HEADER_SIZE]
+        layout = BATCH_HEAD + "%dh" % (3 * count)
+    else:
+        layout = LAYOUTS.get(msg_type)
+    if version != VERSION or layout is None or len(msg) < HEADER_SIZE + struct.calcsize(layout):
+        return None
+    return msg_type, seq, struct.unpack_from(layout, msg, HEADER_SIZE)
+
+
+class Encoder:
+    """
+    Builds the payloads for one sender, numbering binary messages in sequence.
+
+    fmt="json" produces exactly the JSON each publisher sent before, so a
+    sender can be switched between formats without touching the call sites.
+    """
+
+    def __init__(self, fmt="binary"):
+        if fmt not in ("binary", "json"):
+            raise ValueError("fmt must be 'binary' or 'json'")
+        self.binary = fmt == "binary"
+        self.seq = 0
+
+    def _pack(self, msg_type, *values):
+        msg = encode(msg_type, self.seq, *values)
+        self.seq = (self.seq + 1) & 0xFFFF
+        return msg
+
+    def errors(self, distance_error, position_error):
+        if self.binary:
+            return self._pack(TYPE_ERRORS, distance_error, position_error)
+        return json.dumps({"distance_error": distance_error, "position_error": position_error})
+
+    def blob(self, data):
+        """data: the dict FollowMeSender.biggest_blob() returns."""
+        if self.binary:
+            cx, cy = data["center"]
+            return self._pack(TYPE_BLOB, cx, cy, data["area"], data["width"], data["height"])
+        return json.dumps(data)
+
+    def accel(self, x, y, z):
+        if self.binary:
+            return self._pack(TYPE_ACCEL, x, y, z)
+        return json.dumps({"accel": {"x": x, "y": y, "z": z}})
+
+    def accel_batch(self, samples_mg, period_ms):
+        """
+        samples_mg: flat x, y, z, x, y, z, ... in milli-g, oldest first (at most MAX_BATCH samples).
+
+        The JSON form also carries the newest sample as "accel" in g, so a
+        receiver that only knows single samples still drives from it.
+        """
+        count = len(samples_mg) // 3
+        if self.binary:
+            return self._pack_batch(count, period_ms, samples_mg)
+        newest = samples_mg[-3:]
+        return json.dumps({
+            "accel": {"x": newest[0] / 1000, "y": newest[1] / 1000, "z": newest[2] / 1000},
+            "batch": [[v / 1000 for v in samples_mg[i:i + 3]] for i in range(0, 3 * count, 3)],
+            "period_ms": period_ms,
+        })
+
+    def _pack_batch(self, count, period_ms, samples_mg):
+        msg = (struct.pack(HEADER, MAGIC, VERSION, TYPE_ACCEL_BATCH, self.seq)
+               + struct.pack(BATCH_HEAD + "%dh" % (3 * count), count, period_ms, *samples_mg))
+        self.seq = (self.seq + 1) & 0xFFFF
+        return msg
+
+    def color(self, r, g, b):
+        if self.binary:
+            return self._pack(TYPE_COLOR, r, g, b)
+        return json.dumps({"color": [r, g, b]})
+
+    def buzzer(self, on=True):
+        if self.binary:
+            return self._pack(TYPE_BUZZER, 1 if on else 0)
+        return json.dumps({"Buzzer": bool(on)})
+
+    def twist(self, linear_x, angular_z):
+        if self.binary:
+            return self._pack(TYPE_TWIST, linear_x, angular_z)
+        return json.dumps({
+            "linear": {"x": linear_x, "y": 0.0, "z": 0.0},
+            "angular": {"x": 0.0, "y": 0.0, "z": angular_z}
+        })
+
+
+# ---------------- Benchmark ----------------
+def main(rounds=20000):
+    import time
+
+    blob = {"center": [412, 233], "area": 5310, "width": 81, "height": 72}
+    cases = [
+        ("errors", lambda e: e.errors(0.0123, -42.5)),
+        ("blob", lambda e: e.blob(blob)),
+        ("accel", lambda e: e.accel(0.412, -0.021, 0.981)),
+        ("color", lambda e: e.color(0, 0, 225)),
+        ("buzzer", lambda e: e.buzzer(True)),
+        ("twist", lambda e: e.twist(0.35, -1.2)),
+        ("batch10", lambda e: e.accel_batch([412, -21, 981] * 10, 20)),
+    ]
+
+    def per_call_us(fn):
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            fn()
+        return (time.perf_counter() - t0) / rounds * 1e6
+
+    print("%-7s %11s %11s %12s %12s %12s %12s"
+          % ("type", "json bytes", "bin bytes", "json enc us", "bin enc us", "json dec us", "bin dec us"))
+    for name, build in cases:
+        js, bn = Encoder("json"), Encoder("binary")
+        js_msg = build(js).encode()
+        bn_msg = build(bn)
+        print("%-7s %11d %11d %12.2f %12.2f %12.2f %12.2f" % (
+            name, len(js_msg), len(bn_msg),
+            per_call_us(lambda: build(js)), per_call_us(lambda: build(bn)),
+            per_call_us(lambda: json.loads(js_msg)), per_call_us(lambda: decode(bn_msg))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Shared Wi-Fi + MQTT connection manager for the ESP32 devices.
+
+Every device used to block in connect_wifi()/mqtt_connect() once at boot and
+never reconnect. MQTTConnection is polled from the main loop instead:
+
+- Wi-Fi and broker (re)connects are retried with exponential backoff, one
+  attempt per poll, so a missing broker never freezes the control loop
+  (the umqtt TLS handshake itself still blocks for the length of one attempt);
+- subscriptions are remembered and re-sent after every reconnect;
+- publish() only queues; poll() sends the queue while connected. The queue is
+  bounded and drops its oldest message when full (or refuses new ones with
+  drop_oldest=False), so a dead link costs memory only up to queue_size;
+- a PINGREQ goes out whenever nothing was sent for keepalive / 2 seconds;
+- metrics() reports reconnect time and queue depth.
+"""
+import time
+
+try:
+    import network
+except ImportError:  # host tests
+    network = None
+
+
+class MQTTConnection:
+    def __init__(self, client_id, server, port=8883, user=None, password=None, ssl=True,
+                 ssid=None, wifi_password=None, callback=None, keepalive=30,
+                 backoff_min_ms=500, backoff_max_ms=30000, wifi_timeout_ms=10000,
+                 queue_size=16, drop_oldest=True, flush_max=8, client_factory=None):
+        self.client_id = client_id
+        self.server = server
+        self.port = port
+        self.user = user
+        self.password = password
+        self.ssl = ssl
+        self.ssid = ssid
+        self.wifi_password = wifi_password
+        self.callback = callback
+        self.keepalive = keepalive
+        self.backoff_min_ms = backoff_min_ms
+        self.backoff_max_ms = backoff_max_ms
+        self.wifi_timeout_ms = wifi_timeout_ms
+        self.queue_size = queue_size
+        self.drop_oldest = drop_oldest
+        self.flush_max = flush_max  # messages sent per poll, so a long backlog can't stall the loop
+        if client_factory is None:
+            from umqtt.simple import MQTTClient
+            client_factory = MQTTClient
+        self.client_factory = client_factory
+
+        self.wlan = network.WLAN(network.STA_IF) if (network is not None and ssid) else None
+        self.wifi_started = None  # ticks_ms when wlan.connect() was issued
+        self.client = None
+        self.connected = False
+        self.topics = []
+        self.queue = []
+
+        self.backoff_ms = backoff_min_ms
+        self.next_attempt = time.ticks_ms()
+        self.down_since = time.ticks_ms()
+        self.last_send = time.ticks_ms()
+
+        # Metrics
+        self.connects = 0
+        self.failures = 0
+        self.disconnects = 0
+        self.last_reconnect_ms = 0
+        self.max_reconnect_ms = 0
+        self.published = 0
+        self.dropped = 0
+        self.max_queue_depth = 0
+
+    # ---------- Public API ----------
+    def subscribe(self, topic):
+        """Subscribe now if connected; either way re-subscribe after every reconnect."""
+        if topic not in self.topics:
+            self.topics.append(topic)
+        if self.connected:
+            try:
+                self.client.subscribe(topic)
+            except OSError as e:
+                self._lost(e)
+
+    def publish(self, topic, msg, retain=False):
+        """Queue a message; returns False if it was refused because the queue is full."""
+        if len(self.queue) >= self.queue_size:
+            self.dropped += 1
+            if not self.drop_oldest:
+                return False
+            self.queue.pop(0)
+        self.queue.append((topic, msg, retain))
+        if len(self.queue) > self.max_queue_depth:
+            self.max_queue_depth = len(self.queue)
+        return True
+
+    def check_msg(self):
+        """Handle at most one incoming message (non-blocking). Returns False when not connected."""
+        if not self.connected:
+            return False
+        try:
+            self.client.check_msg()
+        except OSError as e:
+            self._lost(e)
+            return False
+        return True
+
+    def poll(self):
+        """Advance the connection state machine, send queued messages, keep the session alive."""
+        if not self.connected:
+            self._try_connect()
+            if not self.connected:
+                return False
+        try:
+            self._flush()
+            if time.ticks_diff(time.ticks_ms(), self.last_send) >= self.keepalive * 500:
+                self.client.ping()
+                self.last_send = time.ticks_ms()
+        except OSError as e:
+            self._lost(e)
+        return self.connected
+
+    def metrics(self):
+        return {
+            "connected": self.connected,
+            "connects": self.connects,
+            "failures": self.failures,
+            "disconnects": self.disconnects,
+            "last_reconnect_ms": self.last_reconnect_ms,
+            "max_reconnect_ms": self.max_reconnect_ms,
+            "queue_depth": len(self.queue),
+            "max_queue_depth": self.max_queue_depth,
+            "published": self.published,
+            "dropped": self.dropped,
+            "backoff_ms": self.backoff_ms,
+        }
+
+    def print_metrics(self):
+        m = self.metrics()
+        print("MQTT: %s | connects %d, failures %d, drops of link %d | reconnect last %d ms max %d ms | "
+              "queue %d (max %d), published %d, dropped %d"
+              % ("up" if m["connected"] else "down", m["connects"], m["failures"], m["disconnects"],
+                 m["last_reconnect_ms"], m["max_reconnect_ms"], m["queue_depth"], m["max_queue_depth"],
+                 m["published"], m["dropped"]))
+
+    # ---------- Internals ----------
+    def _flush(self):
+        sent = 0
+        while self.queue and sent < self.flush_max:
+            topic, msg, retain = self.queue[0]
+            self.client.publish(topic, msg, retain)
+            self.queue.pop(0)
+            self.published += 1
+            sent += 1
+            self.last_send = time.ticks_ms()
+
+    def _wifi_ready(self):
+        """Non-blocking Wi-Fi bring-up; True once the station is connected."""
+        if self.wlan is None:
+            return True
+        if self.wlan.isconnected():
+            self.wifi_started = None
+            return True
+        now = time.ticks_ms()
+        if self.wifi_started is None:
+            self.wlan.active(True)
+            self.wlan.connect(self.ssid, self.wifi_password)
+            self.wifi_started = now
+            print("Connecting to WiFi...")
+        elif time.ticks_diff(now, self.wifi_started) > self.wifi_timeout_ms:
+            print("WiFi connection timed out")
+            self.wifi_started = None
+            self._failed()
+        return False
+
+    def _try_connect(self):
+        now = time.ticks_ms()
+        if time.ticks_diff(now, self.next_attempt) < 0:
+            return
+        if not self._wifi_ready():
+            return
+        try:
+            kwargs = {"port": self.port, "user": self.user, "password": self.password,
+                      "keepalive": self.keepalive, "ssl": self.ssl}
+            if self.ssl:
+                kwargs["ssl_params"] = {"server_hostname": self.server}
+            self.client = self.client_factory(self.client_id, self.server, **kwargs)
+            if self.callback is not None:
+                self.client.set_callback(self.callback)
+            self.client.connect()
+            for topic in self.topics:
+                self.client.subscribe(topic)
+        except Exception as e:  # OSError, or umqtt's MQTTException for a refused CONNACK
+            print("MQTT connect failed:", e)
+            self._close()
+            self._failed()
+            return
+
+        self.connected = True
+        self.connects += 1
+        self.backoff_ms = self.backoff_min_ms
+        self.last_send = time.ticks_ms()
+        self.last_reconnect_ms = time.ticks_diff(self.last_send, self.down_since)
+        if self.last_reconnect_ms > self.max_reconnect_ms:
+            self.max_reconnect_ms = self.last_reconnect_ms
+        print("MQTT connected to %s after %d ms, %d topic(s) subscribed"
+              % (self.server, self.last_reconnect_ms, len(self.topics)))
+
+    def _failed(self):
+        self.failures += 1
+        self.next_attempt = time.ticks_add(time.ticks_ms(), self.backoff_ms)
+        self.backoff_ms = min(self.backoff_ms * 2, self.backoff_max_ms)
+
+    def _lost(self, error):
+        print("MQTT connection lost:", error)
+        self.connected = False
+        self.disconnects += 1
+        self.down_since = time.ticks_ms()
+        self._close()
+        self.next_attempt = time.ticks_ms()  # first retry right away, backoff after that
+
+    def _close(self):
+        if self.client is not None:
+            try:
+                self.client.sock.close()
+            except Exception:
+                pass
+        self.client = None
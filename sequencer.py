@@ -0,0 +1,191 @@
+"""
+Non-blocking action sequencer for timed robot motions.
+
+Auto_ESP's motions (drive 2 s on CENTER_CLOSE, beep + drive + shoot on
+GOAL_FOUND, the goal celebration) were chains of time.sleep() inside
+handle_cmd / the MQTT callback, so UART lines piled up and MQTT keepalives
+were missed for seconds at a time. Here a motion is a list of
+(fn, arg, hold_ms) steps: fn(arg) runs, then the sequence holds for hold_ms
+before the next step. Sequencer.tick() runs every step that is due and
+returns how long until the next one, so the caller's loop (or a uasyncio
+task) knows how long it may sleep.
+
+One sequence runs at a time. start() on a busy sequencer:
+
+- preempts the running sequence if it was started preemptible (its
+  on_abort() runs first, e.g. to stop the shooter mid-stroke);
+- otherwise queues behind it. Preemptible entries (motion commands) are
+  bounded by queue_size and the oldest of them is dropped when full, so a
+  burst of commands keeps only the newest. Non-preemptible entries (one-shot
+  sequences such as a celebration) are never dropped to make room.
+
+Every finished or aborted sequence is timed (actual vs planned duration and
+the worst step lateness) and reported by print_stats().
+
+MicroPython and CPython compatible (python sequencer.py runs a host demo).
+"""
+import time
+
+# Timestamps are ticks_ms() on the board; fall back to a monotonic ms clock on the host
+if hasattr(time, "ticks_ms"):
+    ticks_ms = time.ticks_ms
+    ticks_add = time.ticks_add
+    ticks_diff = time.ticks_diff
+else:
+    def ticks_ms():
+        return int(time.monotonic() * 1000)
+
+    def ticks_add(t, delta):
+        return t + delta
+
+    def ticks_diff(a, b):
+        return a - b
+
+IDLE_MS = 1000  # tick() return value when nothing is running
+
+
+def planned_ms(steps):
+    total = 0
+    for step in steps:
+        total += step[2]
+    return total
+
+
+class Sequencer:
+    """Runs one step list at a time from tick(); see the module docstring."""
+
+    def __init__(self, queue_size=2, log=True):
+        self.queue_size = queue_size
+        self.queue = []  # [(name, steps, preemptible, on_abort)]
+        self.log = log
+        self.name = None
+        self.steps = None
+        self.preemptible = True
+        self.on_abort = None
+        self.index = 0
+        self.due = 0
+        self.started = 0
+        self.worst_late = 0
+        self.dropped = 0
+        self.stats = {}  # name -> [runs, aborted, total_ms, max_ms, worst_late_ms]
+
+    def busy(self):
+        return self.steps is not None
+
+    def start(self, name, steps, preemptible=True, on_abort=None):
+        """Run `steps` now, or queue them behind a running sequence that is not preemptible."""
+        if self.steps is not None and not self.preemptible:
+            if preemptible:
+                waiting = 0
+                for entry in self.queue:
+                    waiting += 1 if entry[2] else 0
+                if waiting >= self.queue_size:
+                    for i in range(len(self.queue)):
+                        if self.queue[i][2]:
+                            del self.queue[i]  # oldest motion command; one-shots stay
+                            break
+                    self.dropped += 1
+            self.queue.append((name, steps, preemptible, on_abort))
+            return False
+        self._abort()
+        self._begin(name, steps, preemptible, on_abort)
+        self.tick()
+        return True
+
+    def cancel(self):
+        """Abort the running sequence and forget the queue."""
+        self.queue = []
+        self._abort()
+
+    def tick(self):
+        """Run every due step; returns ms until the next one (IDLE_MS when idle)."""
+        while self.steps is not None:
+            now = ticks_ms()
+            wait = ticks_diff(self.due, now)
+            if self.queue and self.preemptible:
+                self._abort()
+                self._begin(*self.queue.pop(0))
+                continue
+            if wait > 0:
+                return wait
+            if self.index >= len(self.steps):
+                self._finish(False)
+                if self.queue:
+                    self._begin(*self.queue.pop(0))
+                continue
+            if -wait > self.worst_late:
+                self.worst_late = -wait
+            fn, arg, hold_ms = self.steps[self.index]
+            self.index += 1
+            # Hold from now: a late step still gets its full duration (a drive covers the same distance)
+            self.due = ticks_add(now, hold_ms)
+            fn(arg)
+        return IDLE_MS
+
+    def _begin(self, name, steps, preemptible, on_abort):
+        self.name = name
+        self.steps = steps
+        self.preemptible = preemptible
+        self.on_abort = on_abort
+        self.index = 0
+        self.started = self.due = ticks_ms()
+        self.worst_late = 0
+
+    def _abort(self):
+        if self.steps is None:
+            return
+        if self.on_abort is not None:
+            self.on_abort()
+        self._finish(True)
+
+    def _finish(self, aborted):
+        took = ticks_diff(ticks_ms(), self.started)
+        s = self.stats.get(self.name)
+        if s is None:
+            s = self.stats[self.name] = [0, 0, 0, 0, 0]
+        s[0] += 1
+        s[1] += 1 if aborted else 0
+        s[2] += took
+        s[3] = max(s[3], took)
+        s[4] = max(s[4], self.worst_late)
+        planned = planned_ms(self.steps)
+        if self.log and (planned or aborted):
+            print("seq %s %s after %d ms (planned %d ms, worst step %d ms late)"
+                  % (self.name, "aborted" if aborted else "done", took, planned, self.worst_late))
+        self.steps = None
+        self.on_abort = None
+
+    def print_stats(self):
+        for name in sorted(self.stats):
+            runs, aborted, total, worst, late = self.stats[name]
+            print("seq %-12s runs %3d  aborted %3d  avg %5d ms  max %5d ms  worst step late %3d ms"
+                  % (name, runs, aborted, total // runs, worst, late))
+        if self.dropped:
+            print("seq queue dropped", self.dropped)
+
+
+# ---------------- Demo ----------------
+def main():
+    """Queue and preempt a few short motions on the host and show the timing log."""
+    log = []
+
+    def act(what):
+        log.append((ticks_ms(), what))
+
+    seq = Sequencer()
+    t0 = ticks_ms()
+    drive = [(act, "forward", 200), (act, "stop", 0)]
+    shoot = [(act, "beep", 50), (act, "shoot", 100), (act, "retract", 100), (act, "rest", 0)]
+
+    seq.start("CENTER_CLOSE", drive)
+    seq.start("GOAL_FOUND", shoot, preemptible=False, on_abort=lambda: act("abort"))  # preempts the drive
+    seq.start("LEFT_FAR", [(act, "spin left", 0)])  # queues behind the shot
+    while seq.busy():
+        time.sleep(min(seq.tick(), 5) / 1000.0)
+    for t, what in log:
+        print("%5d ms  %s" % (ticks_diff(t, t0), what))
+    seq.print_stats()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import sys
+
+import pytest
+
+import hal
+
+DEVICE_MODULES = ("Auto_ESP", "sequencer", "mqttconn", "camlink")
+
+
+@pytest.fixture
+def robot():
+    """Auto_ESP's RobotDevice on its uasyncio tasks, with the HAL fakes, MQTT connected."""
+    hal.install()
+    hal.reset()
+    for name in DEVICE_MODULES:
+        sys.modules.pop(name, None)
+    from hal import uasyncio
+    import Auto_ESP
+    device = Auto_ESP.RobotDevice()
+    device.seq.log = False
+    uasyncio.create_task(device.main())
+    uasyncio.run_for(3000)
+    yield device
+    hal.uninstall()
+    for name in DEVICE_MODULES:
+        sys.modules.pop(name, None)
+
+
+def test_goal_ack_during_the_shot_still_celebrates(robot):
+    from hal import machine, umqtt, uasyncio
+    machine.uart(1).feed(b"GOAL_FOUND\n")
+    uasyncio.run_for(50)
+    assert robot.seq.name == "GOAL_FOUND" and robot.seq.busy()
+
+    umqtt.inject(robot.TOPIC_GOAL, b"GOAL")  # acknowledged while the shot is still running
+    uasyncio.run_for(50)
+    machine.uart(1).feed(b"LEFT_FAR\n")      # ... and the camera already sends the next commands
+    uasyncio.run_for(50)
+    machine.uart(1).feed(b"RIGHT_FAR\n")
+    uasyncio.run_for(6000)
+
+    celebrate = robot.seq.stats.get("CELEBRATE")
+    assert celebrate is not None and celebrate[0] == 1 and celebrate[1] == 0  # ran, not aborted
+    assert "RIGHT_FAR" in robot.seq.stats and robot.seq.dropped == 1  # newest movement command kept
+
+
+def test_track_leaves_the_celebration_alone(robot):
+    from hal import umqtt, uasyncio
+    robot.state = "WAITING_GOAL_RESET"
+    umqtt.inject(robot.TOPIC_GOAL, b"GOAL")
+    uasyncio.run_for(50)
+    assert robot.seq.name == "CELEBRATE"
+    pixels = list(robot.np.pixels)
+    duties = [pwm.duty() for pwm in (robot.L_IN1, robot.L_IN2, robot.R_IN1, robot.R_IN2)]
+    robot.track(800, 200)
+    assert list(robot.np.pixels) == pixels
+    assert [pwm.duty() for pwm in (robot.L_IN1, robot.L_IN2, robot.R_IN1, robot.R_IN2)] == duties
+    assert robot.seq.name == "CELEBRATE"
@@ -0,0 +1,44 @@
+import json
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from CartoonBatch import MANIFEST, collect_inputs, run_batch
+from Cartoonify import DEFAULT_PARAMS
+
+
+def write_image(path, value):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    cv2.imwrite(str(path), np.full((24, 32, 3), value, np.uint8))
+
+
+def test_recursive_glob_keeps_subfolders(tmp_path):
+    write_image(tmp_path / "in" / "a" / "img.png", 50)
+    write_image(tmp_path / "in" / "b" / "img.png", 200)
+    inputs = collect_inputs([str(tmp_path / "in" / "**" / "*.png")])
+    assert sorted(rel for _, rel in inputs) == [os.path.join("a", "img.png"), os.path.join("b", "img.png")]
+
+
+def test_same_output_name_is_rejected(tmp_path):
+    write_image(tmp_path / "a" / "img.png", 50)
+    write_image(tmp_path / "b" / "img.png", 200)
+    with pytest.raises(ValueError):
+        collect_inputs([str(tmp_path / "a" / "img.png"), str(tmp_path / "b" / "img.png")])
+
+
+def test_bad_params_fail_per_image_and_keep_manifest(tmp_path):
+    write_image(tmp_path / "in" / "one.png", 50)
+    write_image(tmp_path / "in" / "two.png", 200)
+    out = tmp_path / "out"
+    params = dict(DEFAULT_PARAMS, block_size=8)  # adaptiveThreshold needs an odd block size
+    stats = run_batch([str(tmp_path / "in")], str(out), params, workers=1)
+    assert stats["failed"] == 2 and stats["processed"] == 0
+    with open(out / MANIFEST) as f:
+        assert json.load(f) == {}
+
+    stats = run_batch([str(tmp_path / "in")], str(out), DEFAULT_PARAMS, workers=1)
+    assert stats["processed"] == 2
+    with open(out / MANIFEST) as f:
+        assert sorted(json.load(f)) == ["one.png", "two.png"]
@@ -0,0 +1,23 @@
+import numpy as np
+
+from CartoonCache import CachedCartoonifier
+from Cartoonify import cartoonify
+
+
+def test_same_pixels_hit_the_cache():
+    img = np.random.default_rng(35).integers(0, 255, (48, 64, 3), dtype=np.uint8)
+    cartoonifier = CachedCartoonifier()
+    first = cartoonifier.cartoonify(img)
+    again = cartoonifier.cartoonify(img.copy())
+    assert np.array_equal(first, again)
+    assert cartoonifier.computed["bilateral"] == 1
+
+
+def test_in_place_edit_misses_the_cache():
+    img = np.random.default_rng(35).integers(0, 255, (48, 64, 3), dtype=np.uint8)
+    cartoonifier = CachedCartoonifier()
+    cartoonifier.cartoonify(img)
+    img[:, :32] = 255 - img[:, :32]  # e.g. cap.read(frame) refilling the same buffer
+    result = cartoonifier.cartoonify(img)
+    assert cartoonifier.computed["bilateral"] == 2
+    assert np.array_equal(result, cartoonify(img))
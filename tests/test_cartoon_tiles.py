@@ -0,0 +1,27 @@
+import cv2
+import numpy as np
+import pytest
+
+from CartoonTiles import PnmReader, cartoonify_tiled
+from Cartoonify import cartoonify
+
+
+@pytest.mark.parametrize("params", [None, {"d": 9, "median_ksize": 5, "block_size": 15}])
+def test_tiled_output_matches_whole_image(tmp_path, params):
+    img = np.random.default_rng(35).integers(0, 255, (101, 64, 3), dtype=np.uint8)
+    img = cv2.GaussianBlur(img, (7, 7), 0)  # some structure for the edges to find
+    src = str(tmp_path / "in.ppm")
+    assert cv2.imwrite(src, img)
+    dst = str(tmp_path / "out.png")
+
+    width, height, strips = cartoonify_tiled(src, dst, params, tile_rows=16)
+    assert (width, height, strips) == (64, 101, 7)
+    assert np.array_equal(cv2.imread(dst), cartoonify(img, **(params or {})))
+
+
+@pytest.mark.parametrize("header", [b"P6\n64 48\n255", b"P6\n64", b"P6\n# comment without end", b"P6\n" + b"6" * 600])
+def test_bad_pnm_header_raises(tmp_path, header):
+    path = tmp_path / "bad.ppm"
+    path.write_bytes(header)
+    with pytest.raises(ValueError):
+        PnmReader(str(path))
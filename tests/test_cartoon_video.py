@@ -0,0 +1,60 @@
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from CartoonVideo import CartoonVideo
+
+
+def write_clip(path, frames=12, size=(64, 48)):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 10.0, size)
+    assert writer.isOpened()
+    rng = np.random.default_rng(35)
+    for _ in range(frames):
+        writer.write(rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8))
+    writer.release()
+
+
+def run_with_timeout(video, timeout_s=20):
+    result = {}
+
+    def target():
+        try:
+            result["report"] = video.run()
+        except Exception as e:
+            result["error"] = e
+    t = threading.Thread(target=target, daemon=True)
+    t.start()
+    t.join(timeout_s)
+    assert not t.is_alive(), "pipeline hung"
+    return result
+
+
+def test_writes_every_frame(tmp_path):
+    src = tmp_path / "in.avi"
+    write_clip(src)
+    result = run_with_timeout(CartoonVideo(str(src), str(tmp_path / "out.avi"), fourcc="MJPG"))
+    assert "error" not in result
+    assert result["report"]["frames_written"] == 12
+
+
+def test_bad_output_path_raises_instead_of_hanging(tmp_path):
+    src = tmp_path / "in.avi"
+    write_clip(src, frames=60)  # more frames than the queues hold
+    video = CartoonVideo(str(src), str(tmp_path / "missing" / "out.avi"), fourcc="MJPG", queue_size=1)
+    result = run_with_timeout(video)
+    assert isinstance(result.get("error"), IOError)
+    assert not video.running()
+
+
+def test_stage_error_is_reraised(tmp_path):
+    src = tmp_path / "in.avi"
+    write_clip(src, frames=30)
+
+    def boom(seq, frame):
+        raise ValueError("preview failed")
+    video = CartoonVideo(str(src), on_frame=boom, queue_size=1)
+    result = run_with_timeout(video)
+    with pytest.raises(ValueError):
+        raise result["error"]
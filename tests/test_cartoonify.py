@@ -0,0 +1,19 @@
+import cv2
+import numpy as np
+
+from Cartoonify import fast_bilateral
+
+
+def test_fast_bilateral_keeps_hard_edges():
+    img = np.full((120, 160, 3), 30, np.uint8)
+    img[:, 81:] = 220  # vertical step between odd columns, so the half-size copy blurs it
+    exact = cv2.bilateralFilter(img, d=9, sigmaColor=100, sigmaSpace=100)
+    fast = fast_bilateral(img, d=9, sigma_color=100, sigma_space=100, scale=0.5)
+    assert fast.shape == img.shape
+    edge = slice(78, 84)
+    assert np.abs(fast[:, edge].astype(int) - exact[:, edge].astype(int)).max() <= 20
+
+
+def test_fast_bilateral_full_scale_is_exact():
+    img = np.random.default_rng(35).integers(0, 255, (40, 50, 3), dtype=np.uint8)
+    assert np.array_equal(fast_bilateral(img, 5, 75, 75, scale=1.0), cv2.bilateralFilter(img, 5, 75, 75))
@@ -0,0 +1,70 @@
+import sys
+
+import pytest
+
+import hal
+
+DEVICE_MODULES = ("effects", "fastmsg", "mqttconn", "MissionControl_Receiver")
+
+
+@pytest.fixture
+def receiver():
+    """The real MotorReceiver on the HAL fakes, connected to the fake broker."""
+    hal.install()
+    hal.reset()
+    for name in DEVICE_MODULES:
+        sys.modules.pop(name, None)  # import fresh, bound to the virtual clock
+    from MissionControl_Receiver import MotorReceiver
+    device = MotorReceiver()
+    for _ in range(500):
+        device.step()
+        if device.mqtt.connected:
+            break
+    assert device.mqtt.connected
+    yield device
+    hal.uninstall()
+    for name in DEVICE_MODULES:
+        sys.modules.pop(name, None)
+
+
+def off_time_us(source, since_us, is_off):
+    for t, _, _, value in hal.find(source, since_us=since_us):
+        if is_off(value):
+            return t
+    return None
+
+
+def test_burst_schedules_effects_without_blocking(receiver):
+    from hal import umqtt, utime
+    from me35codec import Encoder
+
+    enc = Encoder("binary")
+    mix = [enc.accel(0.3, 0.0, 1.0), enc.color(0, 0, 225), enc.accel(-0.2, 0.0, 1.0),
+           enc.buzzer(True), b'{"color":[255,0,0]}', b'{"accel": {"x": 0.1}}']
+    burst = [mix[k % len(mix)] for k in range(24)]  # fits in one drain (MAX_DRAIN)
+    for msg in burst:
+        umqtt.inject(receiver.TOPIC_SUB, msg)
+
+    tick_us = 10000  # step() sleeps 10 ms
+    start = utime.now_us()
+    receiver.step()
+    assert utime.now_us() - start <= tick_us + 1000, "step blocked on the burst"
+    assert receiver.received == len(burst)
+
+    # Everything was applied within the burst's step; the "off" steps are due 500 ms later
+    handled = [t for t, _, _, _ in hal.find("NeoPixel(15)", "write", since_us=start)]
+    assert handled and max(handled) < start + tick_us
+    assert receiver.buzzer.duty() == 512
+
+    while receiver.scheduler.pending:
+        t0 = utime.now_us()
+        receiver.step()
+        assert utime.now_us() - t0 <= tick_us + 1000
+        assert utime.now_us() - start < 2000000
+
+    led_off = off_time_us("NeoPixel(15)", start, lambda value: value[0] == (0, 0, 0))
+    buzzer_off = off_time_us("PWM(23)", start, lambda value: value == 0)
+    for off in (led_off, buzzer_off):
+        assert off is not None
+        # The last flash / beep in the burst set the deadline; poll() runs once per tick
+        assert start + 500000 <= off <= start + 500000 + 2 * tick_us
@@ -0,0 +1,45 @@
+import cv2
+import numpy as np
+import pytest
+
+import MQTT_Goal
+
+
+def synthetic_mask(seed):
+    """Balls, ellipses, bars and speckle, some cut by the frame edge, cleaned like a real mask."""
+    rng = np.random.default_rng(seed)
+    h, w = 480, 640
+    mask = np.zeros((h, w), np.uint8)
+    for _ in range(8):  # around the radius / area limits, some half off the frame
+        center = (int(rng.integers(-10, w + 10)), int(rng.integers(-10, h + 10)))
+        cv2.circle(mask, center, int(rng.integers(8, 62)), 255, -1)
+    for _ in range(4):
+        center = (int(rng.integers(0, w)), int(rng.integers(0, h)))
+        axes = (int(rng.integers(3, 60)), int(rng.integers(3, 60)))
+        cv2.ellipse(mask, center, axes, float(rng.uniform(0, 180)), 0, 360, 255, -1)
+    for _ in range(4):
+        x, y = int(rng.integers(0, w)), int(rng.integers(0, h))
+        cv2.rectangle(mask, (x, y), (x + int(rng.integers(2, 120)), y + int(rng.integers(2, 12))), 255, -1)
+    mask[rng.random((h, w)) < 0.0005] = 255
+    mask[rng.random((h, w)) < 0.005] = 0
+    return MQTT_Goal.clean_mask(mask)
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("scale, slack", [(1, 0.0), (2, 0.6), (4, 0.6)])
+def test_vectorized_filter_matches_the_loop(monkeypatch, seed, scale, slack):
+    mask = synthetic_mask(seed)
+    if scale > 1:
+        mask = cv2.resize(mask, (mask.shape[1] // scale, mask.shape[0] // scale), interpolation=cv2.INTER_AREA)
+    results = []
+    for vectorized in (True, False):
+        monkeypatch.setattr(MQTT_Goal, "VECTORIZED_FILTER", vectorized)
+        results.append(MQTT_Goal.find_balls(mask, scale, slack, offset=(5, 7)))
+    assert results[0] == results[1]
+
+
+def test_synthetic_masks_have_balls_and_rejects():
+    found = sum(len(MQTT_Goal.find_balls(synthetic_mask(seed))) for seed in range(20))
+    contours = sum(len(cv2.findContours(synthetic_mask(seed), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0])
+                   for seed in range(20))
+    assert 0 < found < contours
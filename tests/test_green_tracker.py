@@ -0,0 +1,34 @@
+import numpy as np
+
+from FollowMeSender import GreenTracker, detect_green
+
+GREEN = (0, 200, 0)  # BGR
+
+
+def frame_with_box(x, y, w, h, size=(240, 320)):
+    frame = np.zeros(size + (3,), np.uint8)
+    frame[y:y + h, x:x + w] = GREEN
+    return frame
+
+
+def test_blob_cut_by_the_window_is_rescanned():
+    tracker = GreenTracker(margin=0.5, min_pad=4)
+    data, _ = tracker.detect(frame_with_box(140, 100, 20, 20))
+    assert data["area"] > 0 and tracker.full_scans == 1
+
+    # The marker jumps closer: it now overflows the 40x40 window around the old box
+    grown = frame_with_box(120, 80, 80, 60)
+    data, _ = tracker.detect(grown)
+    expected, _ = detect_green(grown)
+    assert data == expected
+    assert tracker.roi_clipped == 1 and tracker.full_scans == 2
+
+
+def test_track_loss_resets_to_full_scans():
+    tracker = GreenTracker()
+    tracker.detect(frame_with_box(140, 100, 20, 20))
+    assert tracker.last is not None
+    data, _ = tracker.detect(np.zeros((240, 320, 3), np.uint8))
+    assert data is None and tracker.last is None and tracker.velocity == (0.0, 0.0)
+    tracker.detect(frame_with_box(10, 10, 20, 20))
+    assert tracker.roi_scans == 1  # only the frame right after the first lock used a window
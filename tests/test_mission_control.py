@@ -0,0 +1,44 @@
+import sys
+
+import pytest
+
+import hal
+
+DEVICE_MODULES = ("MissionControl_Controller", "mqttconn", "effects")
+
+
+@pytest.fixture
+def controller():
+    """MissionControl_Controller's MQTTDevice with the HAL fakes, LED button released."""
+    hal.install()
+    hal.reset()
+    for name in DEVICE_MODULES:
+        sys.modules.pop(name, None)
+    from hal import machine
+    machine.set_input(35, 1)
+    import MissionControl_Controller
+    yield MissionControl_Controller.MQTTDevice()
+    hal.uninstall()
+    for name in DEVICE_MODULES:
+        sys.modules.pop(name, None)
+
+
+def press(device):
+    from hal import machine
+    machine.set_input(35, 0)
+    machine.set_input(35, 1)  # IRQ fires on the release
+    device.drain_events()
+
+
+def test_press_after_a_long_idle_is_not_bounce(controller):
+    press(controller)
+    hal.utime.advance(600 * 1000000)  # past half the ticks_us period
+    press(controller)
+    assert controller.events_published == 2 and controller.events_debounced == 0
+
+
+def test_bounce_is_still_dropped(controller):
+    press(controller)
+    hal.utime.advance(50 * 1000)
+    press(controller)
+    assert controller.events_published == 1 and controller.events_debounced == 1